@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Correctness check and throughput benchmark for the aggregate store
+Replays synthetic events with idle gaps (several buckets, and longer than a
+ring lap) and late events into ecosmart.aggregates.AggregateStore, and
+compares every window and series with sums over the raw events. Then times
+add() on in-order batches.
+
+Run: python3 benchmarks/bench_aggregates.py [--events 1000000] [--check]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart.aggregates import RESOLUTIONS, AggregateStore  # noqa: E402
+
+DEPARTMENTS = 4
+METRICS = ('prompts', 'carbon_kg')
+
+
+def gapped_events(seed=7, batches=60):
+    """Batches of (codes, timestamps, values): bursts separated by idle gaps of minutes to weeks."""
+    rng = np.random.default_rng(seed)
+    now = 1_750_000_000
+    result = []
+    for _ in range(batches):
+        now += int(rng.choice([120, 3 * 3600, 2 * 86400, 3 * 86400, 9 * 86400]))   # idle gap
+        count = int(rng.integers(1, 200))
+        times = now + np.sort(rng.integers(0, 4 * 3600, count))
+        if rng.random() < 0.2:
+            times = times - int(rng.integers(3600, 5 * 86400))                    # late batch
+        values = np.column_stack([np.ones(count), rng.random(count)])
+        result.append((rng.integers(0, DEPARTMENTS, count), times, values))
+        now = max(now, int(times.max()))
+    return result
+
+
+def check_windows(seed=7):
+    """Return a list of mismatches between the store and sums over the raw events."""
+    store = AggregateStore(METRICS)
+    codes = [store.department_code(f'dept{i}') for i in range(DEPARTMENTS)]
+    seen = []
+    mismatches = []
+    for batch, (departments, times, values) in enumerate(gapped_events(seed)):
+        store.add(departments, times, values)
+        seen.append((departments, times, values))
+        every_code = np.concatenate([d for d, _, _ in seen])
+        every_time = np.concatenate([t for _, t, _ in seen])
+        every_value = np.concatenate([v for _, _, v in seen])
+        for name, _, slots in RESOLUTIONS:
+            buckets = store._bucket(every_time, name)
+            head = store.current_bucket(name)
+            for length in (1, 2, 7, 30):
+                for end in (head, head - 1, head - 5):
+                    if end - length <= head - slots:
+                        continue    # older than the ring
+                    for code in codes:
+                        key = f'dept{code}'
+                        inside = (every_code == code) & (buckets > end - length) & (buckets <= end)
+                        expected = every_value[inside].sum(axis=0)
+                        window = store.window(key, name, length, end)
+                        actual = np.array([window[metric] for metric in METRICS])
+                        if not np.allclose(expected, actual, atol=1e-9):
+                            mismatches.append(f"batch {batch} {name} window({key}, {length}, end={end}): "
+                                              f"{actual.tolist()} != {expected.tolist()}")
+                        if length == 7:
+                            series = store.series(key, name, length, end)[:, :len(METRICS)]
+                            for offset, bucket in enumerate(range(end - length + 1, end + 1)):
+                                day = every_value[(every_code == code) & (buckets == bucket)].sum(axis=0)
+                                if not np.allclose(day, series[offset], atol=1e-9):
+                                    mismatches.append(f"batch {batch} {name} series({key}) bucket {bucket}: "
+                                                      f"{series[offset].tolist()} != {day.tolist()}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=4096, help="events per add()")
+    parser.add_argument('--check', action='store_true', help="only run the correctness check")
+    args = parser.parse_args(argv)
+
+    mismatches = check_windows()
+    if mismatches:
+        print(f"❌ {len(mismatches)} windows differ from the raw events:")
+        for line in mismatches[:20]:
+            print(f"   {line}")
+        sys.exit(1)
+    print("✅ Windows and series match the raw events, across idle gaps and late events")
+    if args.check:
+        return
+
+    rng = np.random.default_rng(7)
+    times = 1_750_000_000 + np.sort(rng.integers(0, 30 * 86400, args.events))
+    departments = rng.integers(0, DEPARTMENTS, args.events)
+    values = np.column_stack([np.ones(args.events), rng.random(args.events)])
+    store = AggregateStore(METRICS)
+    for i in range(DEPARTMENTS):
+        store.department_code(f'dept{i}')
+    began = time.perf_counter()
+    for start in range(0, args.events, args.batch):
+        stop = start + args.batch
+        store.add(departments[start:stop], times[start:stop], values[start:stop])
+    elapsed = time.perf_counter() - began
+    print(f"{args.events:,} events over 30 days in batches of {args.batch:,}: "
+          f"{elapsed:.2f}s, {args.events / elapsed:,.0f} events/s")
+
+
+if __name__ == '__main__':
+    main()
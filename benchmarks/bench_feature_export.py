@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Memory and wall-time benchmark for the create_feature_table.py Excel export
+
+Run: python3 benchmarks/bench_feature_export.py [--rows 10000 100000 1000000] [--max-in-memory 100000]
+
+Synthetic feature rows (the real ones, repeated and renumbered) are written
+with the in-memory path (DataFrame -> write_excel, every cell built before
+saving), the streaming path (generator -> write_excel_streaming) and the
+whole CLI with --stream (a JSONL --source -> source cache, table, table hash,
+streamed Excel file). Each run is a fresh subprocess, so the peak RSS
+reported is that run's alone. The in-memory path is skipped above
+--max-in-memory rows: at a million rows it needs several GB.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def synthetic_rows(count):
+    """`count` rows in COLUMNS order, generated lazily."""
+    from create_feature_table import features
+
+    for i in range(count):
+        feature = features[i % len(features)]
+        yield (i + 1, f"{feature['Feature']} #{i + 1}", feature['Short Description'], feature['Prototype'],
+               feature['Notes'], feature['Suggested by'])
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB on Linux
+
+
+def write_source(rows, path):
+    """The synthetic rows as a JSONL --source file."""
+    from create_feature_table import COLUMNS
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in synthetic_rows(rows):
+            f.write(json.dumps(dict(zip(COLUMNS[1:], row[1:])), ensure_ascii=False) + '\n')
+
+
+def run(mode, rows, path):
+    """Child process: export once and print the measurements as JSON."""
+    import pandas as pd
+    import create_feature_table as table
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'in-memory':
+        df = pd.DataFrame(synthetic_rows(rows), columns=table.COLUMNS)
+        table.write_excel(df, path, stream=False)
+    elif mode == 'streaming':
+        table.write_excel_streaming(synthetic_rows(rows), path)
+    else:
+        # `path` is the output directory, with the source written next to it by measure()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            table.main(['--source', f'{path}.jsonl', '--stream', '--formats', 'xlsx', '--outdir', path])
+        path = os.path.join(path, table.EXCEL_FILENAME)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'peak_mb': peak_rss_mb(), 'baseline_mb': baseline,
+                      'file_mb': os.path.getsize(path) / 2**20}))
+
+
+def measure(mode, rows, workdir):
+    if mode == 'cli':
+        path = os.path.join(workdir, f'cli-{rows}')
+        write_source(rows, f'{path}.jsonl')
+    else:
+        path = os.path.join(workdir, f'{mode}-{rows}.xlsx')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, str(rows), path],
+                            capture_output=True, text=True, check=True).stdout
+    if mode == 'cli':
+        shutil.rmtree(path)
+        os.remove(f'{path}.jsonl')
+    else:
+        os.remove(path)
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-memory vs streaming Excel export, and the --stream CLI")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-in-memory', type=int, default=100_000,
+                        help="largest row count to try with the in-memory path")
+    parser.add_argument('--run', nargs=3, metavar=('MODE', 'ROWS', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        mode, rows, path = args.run
+        run(mode, int(rows), path)
+        return
+
+    workdir = tempfile.mkdtemp()
+    print(f"{'rows':>10} {'mode':<10} {'seconds':>8} {'rows/s':>9} {'peak MB':>8} {'+MB':>7} {'file MB':>8}")
+    for rows in args.rows:
+        for mode in ('in-memory', 'streaming', 'cli'):
+            if mode == 'in-memory' and rows > args.max_in_memory:
+                print(f"{rows:>10,} {mode:<10} {'skipped (--max-in-memory)':>26}")
+                continue
+            result = measure(mode, rows, workdir)
+            print(f"{rows:>10,} {mode:<10} {result['seconds']:>8.1f} {rows / result['seconds']:>9,.0f} "
+                  f"{result['peak_mb']:>8.0f} {result['peak_mb'] - result['baseline_mb']:>7.0f} "
+                  f"{result['file_mb']:>8.1f}")
+    os.rmdir(workdir)
+
+
+if __name__ == '__main__':
+    main()
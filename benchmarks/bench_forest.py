@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Throughput of the Digital Forest engine (ecosmart.forest) vs rescanning forests
+
+Run: python3 benchmarks/bench_forest.py [--users 10000] [--departments 200] [--events 1000000]
+
+Behaviors from the matrix are drawn for --users users in --departments
+departments (a few active users do most of it) and applied in ticks of
+--tick events, as a push server would between two coalesced messages. After
+each tick the engine's diff() is taken. The baseline recomputes every
+department's health and trees from its members' forests after each tick,
+as getForestHealth does for the trees.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart.forest import BEHAVIORS, TEAM_BEHAVIORS, ForestEngine  # noqa: E402
+
+# roughly how often each behavior happens
+FREQUENCY = {'optimize_prompt': 30, 'library_prompt': 40, 'quiz_passed': 2, 'sustainable_tool': 5,
+             'share_prompt': 5, 'department_efficiency': 0.05, 'co2_reduction': 0.02, 'quiz_completion': 0.02,
+             'ignored_suggestion': 15, 'excessive_tokens': 20, 'inefficient_day': 1}
+
+
+def make_events(count, users, departments, seed):
+    rng = random.Random(seed)
+    home = [f'dept{rng.randrange(departments)}' for _ in range(users)]
+    activity = [1 / (rank + 1) ** 0.8 for rank in range(users)]
+    behaviors = list(BEHAVIORS)
+    picked = rng.choices(behaviors, [FREQUENCY[b] for b in behaviors], k=count)
+    people = rng.choices(range(users), activity, k=count)
+    return [(behavior, None, f'dept{rng.randrange(departments)}') if behavior in TEAM_BEHAVIORS
+            else (behavior, f'user{person}', home[person])
+            for behavior, person in zip(picked, people)]
+
+
+def rescan(engine):
+    """Department health and trees recomputed from every member's forest."""
+    totals = {}
+    for user, forest in engine._users.items():
+        entry = totals.setdefault(engine._membership[user], [0.0, 0, 0])
+        entry[0] += forest.health
+        entry[1] += forest.trees
+        entry[2] += 1
+    return {key: (health / count, trees) for key, (health, trees, count) in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental forest health against rescanning")
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--departments', type=int, default=200)
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--tick', type=int, default=2_000, help="events between diffs")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.users, args.departments, args.seed)
+    engine = ForestEngine()
+    applying, diffing, rescanning, changed = 0.0, [], [], []
+    sample = max(1, args.events // args.tick // 50)    # rescan on 50 ticks spread over the run
+    for tick, start in enumerate(range(0, len(events), args.tick)):
+        began = time.perf_counter()
+        engine.record_many(events[start:start + args.tick])
+        applied = time.perf_counter()
+        diff = engine.diff()
+        done = time.perf_counter()
+        applying += applied - began
+        diffing.append(done - applied)
+        changed.append(len(diff.departments) + len(diff.users))
+        if tick % sample == sample - 1:
+            began = time.perf_counter()
+            rescan(engine)
+            rescanning.append(time.perf_counter() - began)
+
+    ticks = len(diffing)
+    print(f"{args.events:,} behaviors, {len(engine):,} user forests, {args.departments} departments, "
+          f"{ticks:,} ticks of {args.tick:,}")
+    print(f"{'apply (record_many)':<24} {applying:>7.2f}s {args.events / applying:>12,.0f} events/s")
+    print(f"{'diff per tick':<24} {statistics.fmean(diffing) * 1e3:>6.2f}ms  "
+          f"{statistics.fmean(changed):,.0f} forests changed on average")
+    print(f"{'rescan per tick':<24} {statistics.fmean(rescanning) * 1e3:>6.2f}ms  (every forest, baseline)")
+    print(f"Forest health {engine.health()}%")
+
+
+if __name__ == '__main__':
+    main()
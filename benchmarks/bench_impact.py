@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Parity check and throughput benchmark for the EcoSmart batch impact calculator
+Compares ecosmart.core_engine with golden values produced by core-engine.js,
+then times calculate_impact_batch against a per-prompt Python loop.
+
+Run: python3 benchmarks/bench_impact.py [--sizes 10000,1000000] [--parity]
+Regenerate the golden values after changing core-engine.js:
+     node benchmarks/generate_engine_parity.js
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ecosmart import core_engine as engine  # noqa: E402
+
+FIXTURE = os.path.join(ROOT, 'benchmarks', 'fixtures', 'core_engine_parity.json')
+
+
+def same(expected, actual, where, mismatches):
+    """Recursively compare a JS result with the Python one; numbers must match exactly."""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict) or set(expected) != set(actual):
+            mismatches.append(f"{where}: keys {sorted(expected)} != {sorted(actual or {})}")
+            return
+        for key in expected:
+            same(expected[key], actual[key], f"{where}.{key}", mismatches)
+    elif isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        if not (expected == actual or (math.isnan(expected) and math.isnan(actual))):
+            mismatches.append(f"{where}: JS {expected!r} != Python {actual!r}")
+    elif expected != actual:
+        mismatches.append(f"{where}: JS {expected!r} != Python {actual!r}")
+
+
+def check_parity():
+    """Return a list of mismatches between core-engine.js and the Python port."""
+    with open(FIXTURE, encoding='utf-8') as f:
+        golden = json.load(f)
+    mismatches = []
+
+    numeric = golden['numeric']
+    batch = engine.calculate_impact_batch(
+        [case['input'] for case in numeric],
+        [case['output'] for case in numeric],  # zeros are re-estimated, so only non-zero cases compare
+        grid_profile=[case['profile'] for case in numeric],
+    )
+    energy = engine.calculate_energy(np.array([c['input'] for c in numeric]),
+                                     np.array([c['output'] for c in numeric]))
+    for i, case in enumerate(numeric):
+        where = f"numeric[{case['input']}+{case['output']} {case['profile']}]"
+        same(case['energy'], float(energy[i]), f"{where}.energy", mismatches)
+        scalar_energy = engine.calculate_energy(case['input'], case['output'])
+        same(case['energy'], scalar_energy, f"{where}.energy (scalar)", mismatches)
+        same(case['water'], engine.calculate_water(scalar_energy, case['profile']), f"{where}.water", mismatches)
+        same(case['carbon'], engine.calculate_carbon(scalar_energy, case['profile']), f"{where}.carbon", mismatches)
+        if case['output']:
+            same(case['energy'], float(batch['energy_wh'][i]), f"{where}.energy (batch)", mismatches)
+            same(case['water'], float(batch['water_liters'][i]), f"{where}.water (batch)", mismatches)
+            same(case['carbon'], float(batch['carbon_kg'][i]), f"{where}.carbon (batch)", mismatches)
+            same(case['ecoScore'], int(batch['eco_score'][i]), f"{where}.ecoScore (batch)", mismatches)
+
+    cases = golden['outputTokens']
+    estimated = engine.estimate_output_tokens(np.array([c['input'] for c in cases]), [c['type'] for c in cases])
+    for i, case in enumerate(cases):
+        same(case['output'], int(estimated[i]), f"outputTokens[{case['input']} {case['type']}]", mismatches)
+
+    for case in golden['impacts']:
+        result = engine.calculate_environmental_impact(case['text'], case['outputType'], case['gridProfile'])
+        del result['metadata']['timestamp']
+        same(case['result'], result, f"impact[{case['text'][:20]!r} {case['outputType']}]", mismatches)
+
+    for case in golden['comparisons']:
+        result = engine.compare_prompts(case['original'], case['optimized'], output_type=case['outputType'])
+        del result['original']['metadata']['timestamp']
+        del result['optimized']['metadata']['timestamp']
+        same(case['result'], result, f"compare[{case['original'][:20]!r}]", mismatches)
+    return mismatches
+
+
+def synthetic_tokens(n, seed=7):
+    """Log-normal token counts, roughly the shape of real prompt logs."""
+    rng = np.random.default_rng(seed)
+    inputs = np.minimum(rng.lognormal(5.0, 1.2, n), 60000).astype(np.int64)
+    profiles = rng.integers(0, len(engine.GRID_PROFILES), n)
+    types = rng.integers(0, len(engine.OUTPUT_TYPES), n)
+    return inputs, profiles, types
+
+
+def loop_impacts(inputs, profiles, types):
+    """Per-prompt scalar path, the way the browser scores one prompt at a time."""
+    for input_tokens, profile, output_type in zip(inputs.tolist(), profiles.tolist(), types.tolist()):
+        output_tokens = engine.estimate_output_tokens(input_tokens, engine.OUTPUT_TYPES[output_type])
+        energy = engine.calculate_energy(input_tokens, output_tokens)
+        profile_name = engine.GRID_PROFILES[profile]
+        water = engine.calculate_water(energy, profile_name)
+        carbon = engine.calculate_carbon(energy, profile_name)
+        engine.calculate_eco_score(energy, water, carbon)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help="comma-separated batch sizes to time")
+    parser.add_argument('--loop-limit', type=int, default=20000,
+                        help="largest size for which the per-prompt loop is timed")
+    parser.add_argument('--parity', action='store_true', help="only run the parity check")
+    args = parser.parse_args(argv)
+
+    mismatches = check_parity()
+    if mismatches:
+        print(f"❌ {len(mismatches)} parity mismatches with core-engine.js:")
+        for line in mismatches[:20]:
+            print(f"   {line}")
+        sys.exit(1)
+    print("✅ Parity with core-engine.js: all golden values match exactly")
+    if args.parity:
+        return
+
+    print(f"\n{'prompts':>10}{'batch s':>10}{'prompts/s':>14}{'loop prompts/s':>16}{'speed-up':>10}")
+    for n in (int(size) for size in args.sizes.split(',')):
+        inputs, profiles, types = synthetic_tokens(n)
+        batch_time = timed(engine.calculate_impact_batch, inputs, None, types, profiles)
+        line = f"{n:>10}{batch_time:>10.3f}{n / batch_time:>14,.0f}"
+        if n <= args.loop_limit:
+            loop_time = timed(loop_impacts, inputs, profiles, types)
+            line += f"{n / loop_time:>16,.0f}{loop_time / batch_time:>9.0f}x"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Append, replay and rebuild times of the usage journal (ecosmart.journal)
+
+Run: python3 benchmarks/bench_journal.py [--events 1000000] [--segment-mb 64]
+
+--events synthetic usage and savings events (a few hundred users in eight
+departments, one every few seconds) are appended in batches. The journal is
+then replayed through the memory-mapped reader, folded into a
+UsageProjection from scratch, snapshotted, and rebuilt again from the
+snapshot after 1% more events. Opening the writer (which scans the last
+segment for a torn record) is timed as well.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart import journal  # noqa: E402
+
+
+def events(count, seed, start=1.76e9):
+    rng = random.Random(seed)
+    for i in range(count):
+        kind = journal.SAVINGS if rng.random() < 0.2 else journal.USAGE
+        yield (kind, f'user{rng.randrange(400)}', f'dept{rng.randrange(8)}', rng.randrange(20, 3000),
+               rng.random() * 2, rng.random() * 0.02, rng.random() * 1e-3, start + i * 3.0)
+
+
+def timed(label, count, function):
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    rate = f"{count / seconds:>12,.0f} events/s" if count else ''
+    print(f"{label:<28} {seconds:>7.2f}s {rate}")
+    return result
+
+
+def append(directory, batch, segment_bytes, fsync=False):
+    with journal.Journal(directory, segment_bytes, fsync) as writer:
+        pending = []
+        for event in batch:
+            pending.append(event)
+            if len(pending) == 10_000:
+                writer.append_many(pending)
+                pending = []
+        writer.append_many(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the append-only usage journal")
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--segment-mb', type=float, default=journal.SEGMENT_BYTES / 2**20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    segment_bytes = int(args.segment_mb * 2**20)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generated = list(events(args.events, args.seed))
+        timed('append (batches of 10k)', args.events, lambda: append(directory, generated, segment_bytes))
+        size = sum(os.path.getsize(path) for _, path in journal.segments(directory))
+        print(f"  {len(journal.segments(directory))} segments, {size / 2**20:.1f} MB, "
+              f"{size / args.events:.0f} bytes/event")
+
+        timed('replay (mmap reader)', args.events, lambda: sum(1 for _ in journal.read_events(directory)))
+        timed('replay, CRC checked', args.events,
+              lambda: sum(1 for _ in journal.read_events(directory, verify=True)))
+        projection = timed('rebuild from scratch', args.events,
+                           lambda: journal.rebuild(directory, use_snapshot=False))
+        path = timed('snapshot', 0, lambda: journal.write_snapshot(directory, projection))
+        print(f"  {os.path.getsize(path) / 2**10:.0f} KB for {len(projection.users)} users, "
+              f"{len(projection.departments)} departments, {len(projection.days)} days")
+
+        more = args.events // 100
+        append(directory, events(more, args.seed + 1, start=1.76e9 + args.events * 3.0), segment_bytes)
+        rebuilt = timed('rebuild from snapshot', more, lambda: journal.rebuild(directory))
+        full = journal.rebuild(directory, use_snapshot=False)
+        same = rebuilt.to_dict() == full.to_dict()
+        print(f"  seq {rebuilt.seq:,}; identical to a full rebuild: {same}")
+        timed('open writer (tail scan)', 0, lambda: journal.Journal(directory, segment_bytes).close())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ecosmart.leaderboard at ministry scale
+
+Run: python3 benchmarks/bench_leaderboard.py [--participants 100000] [--updates 200000]
+
+Builds a board of synthetic participants spread over departments, then
+times score updates, top-10, rank lookups, "around me" and department
+standings with both index backends. For comparison, the browser approach
+(re-sort the whole array after every score change) is timed on a sample.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart import leaderboard  # noqa: E402
+
+DEPARTMENTS = 40
+
+
+def timed(operation, count):
+    """Microseconds per call of operation(i) for i in range(count)."""
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench_backend(name, factory, participants, updates, seed):
+    rng = random.Random(seed)
+    users = [f'user{i:06d}' for i in range(participants)]
+    departments = [f'dept{rng.randrange(DEPARTMENTS):02d}' for _ in users]
+
+    board = leaderboard.Leaderboard(factory)
+    start = time.perf_counter()
+    for user, department in zip(users, departments):
+        board.update(user, rng.randrange(5000), department)
+    build = time.perf_counter() - start
+
+    picks = [rng.randrange(participants) for _ in range(updates)]
+    points = [rng.randrange(1, 50) for _ in range(updates)]
+    update_us = timed(lambda i: board.add(users[picks[i]], points[i]), updates)
+    queries = min(updates, 20000)
+    rank_us = timed(lambda i: board.rank(users[picks[i]]), queries)
+    department_rank_us = timed(lambda i: board.rank(users[picks[i]], within_department=True), queries)
+    top_us = timed(lambda i: board.top(10), queries)
+    around_us = timed(lambda i: board.around(users[picks[i]], 2), queries)
+    standings_us = timed(lambda i: board.department_standings(), queries)
+
+    print(f"{name:<18} {build:>8.2f} {1e6 / update_us:>12,.0f} {rank_us:>8.1f} {department_rank_us:>8.1f} "
+          f"{top_us:>8.1f} {around_us:>8.1f} {standings_us:>10.1f}")
+
+
+def bench_resort(participants, samples, seed):
+    """tetris-enhanced.js style: update one entry, then sort the whole array."""
+    rng = random.Random(seed)
+    entries = [{'name': f'user{i:06d}', 'score': rng.randrange(5000)} for i in range(participants)]
+    start = time.perf_counter()
+    for _ in range(samples):
+        rng.choice(entries)['score'] += rng.randrange(1, 50)
+        entries.sort(key=lambda entry: entry['score'], reverse=True)
+    per_update = (time.perf_counter() - start) / samples
+    print(f"{'re-sort array':<18} {'':>8} {1 / per_update:>12,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the leaderboard index")
+    parser.add_argument('--participants', type=int, default=100_000)
+    parser.add_argument('--updates', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.participants:,} participants in {DEPARTMENTS} departments, {args.updates:,} score updates")
+    print(f"{'backend':<18} {'build s':>8} {'updates/s':>12} {'rank µs':>8} {'dept µs':>8} "
+          f"{'top10 µs':>8} {'around µs':>8} {'depts µs':>10}")
+    if leaderboard.SortedList is not None:
+        bench_backend('sortedcontainers', leaderboard.SortedList, args.participants, args.updates, args.seed)
+    bench_backend('skip list', leaderboard.SkipList, args.participants, args.updates, args.seed)
+    bench_resort(args.participants, 20, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Search latency of the indexed prompt library (ecosmart.library) vs a linear scan
+
+Run: python3 benchmarks/bench_library.py [--sizes 1000 10000 50000] [--queries 2000]
+
+Libraries of synthetic prompts (words drawn with a Zipf-like skew from a
+vocabulary of a few thousand, plus a couple of tags each) are searched with
+queries of four kinds: one whole word, a 3-letter prefix as typed, two words,
+and a tag lookup. The linear scan is searchPrompts / getPromptsByTags from
+storage-manager.js in Python (a substring test on every prompt's text and
+tags). Save, update and delete times show what keeping the index in step costs.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart.library import PromptLibrary  # noqa: E402
+
+SYLLABLES = ('ka', 'lo', 'mi', 're', 'su', 'ta', 'ven', 'dor', 'pli', 'gra', 'ni', 'ost', 'al', 'em', 'ur')
+TAGS = ('email', 'code', 'summary', 'report', 'translation', 'meeting', 'policy', 'analysis', 'draft',
+        'short', 'data', 'planning', 'hr', 'finance', 'legal', 'communication')
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randrange(2, 5))))
+    return sorted(words)
+
+
+def make_prompts(count, words, rng):
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return [{'text': ' '.join(rng.choices(words, weights, k=rng.randrange(8, 60))).capitalize() + '.',
+             'tags': rng.sample(TAGS, rng.randrange(0, 4)),
+             'use_count': rng.randrange(50)}
+            for _ in range(count)]
+
+
+def linear_search(prompts, query):
+    """searchPrompts: case-insensitive substring of the text or of a tag."""
+    query = query.lower()
+    return [p for p in prompts if query in p['text'].lower() or any(query in t.lower() for t in p['tags'])]
+
+
+def linear_by_tags(prompts, tags):
+    """getPromptsByTags: prompts with any of the tags."""
+    return [p for p in prompts if any(tag in p['tags'] for tag in tags)]
+
+
+def make_queries(count, words, rng):
+    common = words[:200]
+    queries = []
+    for i in range(count):
+        kind = ('word', 'prefix', 'two words', 'tag')[i % 4]
+        if kind == 'word':
+            query = rng.choice(common)
+        elif kind == 'prefix':
+            query = rng.choice(common)[:3]
+        elif kind == 'two words':
+            query = f'{rng.choice(common)} {rng.choice(common)}'
+        else:
+            query = rng.choice(TAGS)
+        queries.append((kind, query))
+    return queries
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1e6, result
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return statistics.fmean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def bench(size, words, queries, scan_queries, rng):
+    prompts = make_prompts(size, words, rng)
+    library = PromptLibrary()
+    start = time.perf_counter()
+    saved = [library.save(prompt) for prompt in prompts]
+    build = time.perf_counter() - start
+    print(f"\n{size:,} prompts, {len(library._vocabulary):,} terms, indexed in {build:.2f}s")
+    print(f"{'query':<10} {'index mean':>11} {'p50':>8} {'p99':>8} {'scan mean':>11} {'speedup':>8} "
+          f"{'matches':>8}")
+    for kind in ('word', 'prefix', 'two words', 'tag'):
+        indexed, scanned, matches = [], [], []
+        for i, (query_kind, query) in enumerate(queries):
+            if query_kind != kind:
+                continue
+            if kind == 'tag':
+                micros, result = timed(library.by_tags, [query], 50)
+            else:
+                micros, (result, total) = timed(library.search, query, 50)
+                matches.append(total)
+            indexed.append(micros)
+            if i < scan_queries:
+                scan = linear_by_tags if kind == 'tag' else linear_search
+                micros, found = timed(scan, saved, [query] if kind == 'tag' else query)
+                scanned.append(micros)
+                if kind == 'tag':
+                    matches.append(len(found))
+        mean, p50, p99 = summary(indexed)
+        scan_mean = statistics.fmean(scanned)
+        print(f"{kind:<10} {mean:>9.0f}µs {p50:>6.0f}µs {p99:>6.0f}µs {scan_mean:>9.0f}µs "
+              f"{scan_mean / mean:>7.0f}x {statistics.fmean(matches):>8.0f}")
+
+    changes = {'save': [], 'update': [], 'delete': []}
+    for prompt in make_prompts(200, words, rng):
+        micros, prompt = timed(library.save, prompt)
+        changes['save'].append(micros)
+        micros, _ = timed(library.update, prompt['id'], {'text': prompt['text'] + ' revised', 'tags': ['draft']})
+        changes['update'].append(micros)
+        micros, _ = timed(library.delete, prompt['id'])
+        changes['delete'].append(micros)
+    print('  '.join(f"{op} {statistics.fmean(samples):.0f}µs" for op, samples in changes.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexed prompt search against a linear scan")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--scan-queries', type=int, default=200, help="queries also run as a linear scan")
+    parser.add_argument('--words', type=int, default=5_000, help="vocabulary size")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = vocabulary(args.words, rng)
+    rng.shuffle(words)
+    queries = make_queries(args.queries, words, rng)
+    for size in args.sizes:
+        bench(size, words, queries, args.scan_queries, rng)
+
+
+if __name__ == '__main__':
+    main()
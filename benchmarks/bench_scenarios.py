@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Scenario grid (ecosmart.scenarios) vs replaying the quarter per scenario
+
+Run: python3 benchmarks/bench_scenarios.py [--events 5000000] [--departments 12] [--workers N]
+
+A quarter (92 days) of synthetic usage is simulated under every grid
+profile, output type, two hourly carbon-intensity curves (a solar-shaped
+day and a wind-shaped week) and three load shifts. The baseline answers
+each scenario the straightforward way: calculate_impact_batch over every
+event, then the event's hour looked up in the curve. It is timed on
+--naive scenarios and extrapolated to the grid.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart import core_engine as engine  # noqa: E402
+from ecosmart.scenarios import FLAT, OBSERVED, Curve, Usage, simulate  # noqa: E402
+
+START = datetime(2026, 7, 1, tzinfo=timezone.utc)
+DAYS = 92
+
+
+def make_usage(events, departments, seed):
+    rng = np.random.default_rng(seed)
+    # office hours on weekdays, little at night and at weekends
+    hour_of_day = np.exp(-0.5 * ((np.arange(24) - 13) / 3.5) ** 2) + 0.03
+    day_of_week = np.array([1, 1, 1, 1, 0.9, 0.15, 0.1])    # 2026-07-01 is a Wednesday
+    weights = (day_of_week[(np.arange(DAYS) + 2) % 7][:, None] * hour_of_day).ravel()
+    hour = rng.choice(DAYS * 24, events, p=weights / weights.sum()).astype(np.int32)
+    inputs = rng.lognormal(5, 1, events).astype(np.int64) + 1
+    ratio = rng.choice(list(engine.OUTPUT_RATIOS.values()), events)
+    outputs = np.where(rng.random(events) < 0.8, (inputs * ratio).astype(np.int64), 0)    # 20% not logged
+    department = rng.zipf(1.6, events) % departments
+    return Usage(START, DAYS * 24, tuple(f'dept{i}' for i in range(departments)), inputs, outputs, hour,
+                 department.astype(np.int16))
+
+
+def make_curves():
+    hours = np.arange(24)
+    solar = 0.45 - 0.25 * np.clip(np.sin((hours - 6) / 12 * np.pi), 0, None)
+    week = np.arange(168)
+    wind = 0.35 + 0.15 * np.sin(week / 168 * 4 * np.pi) + 0.05 * np.cos(week / 24 * 2 * np.pi)
+    return [Curve('solar-day', solar), Curve('wind-week', wind)]
+
+
+def naive(usage, profile, output_type, curve, shift):
+    """One scenario from the events: impacts per event, carbon from the event's hour."""
+    if output_type == OBSERVED:
+        impact = engine.calculate_impact_batch(usage.input_tokens, usage.output_tokens, grid_profile=profile)
+    else:
+        impact = engine.calculate_impact_batch(usage.input_tokens, output_type=output_type, grid_profile=profile)
+    if curve is None:
+        carbon = impact['carbon_kg'].sum()
+    else:
+        intensity, _ = curve.hourly(usage.start, usage.hours)
+        carbon = (impact['energy_wh'] / 1000 * intensity[usage.hour]).sum()
+        cleanest = intensity.reshape(-1, 24).min(1)[usage.hour // 24]
+        carbon = (1 - shift) * carbon + shift * (impact['energy_wh'] / 1000 * cleanest).sum()
+    return impact['energy_wh'].sum(), impact['water_liters'].sum(), carbon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scenario grid against per-scenario replays")
+    parser.add_argument('--events', type=int, default=5_000_000)
+    parser.add_argument('--departments', type=int, default=12)
+    parser.add_argument('--workers', type=int, help="default: one per CPU")
+    parser.add_argument('--naive', type=int, default=3, help="scenarios to time the baseline on")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    usage = make_usage(args.events, args.departments, args.seed)
+    curves = make_curves()
+    began = time.perf_counter()
+    grid = simulate(usage, curves=curves, workers=args.workers)
+    elapsed = time.perf_counter() - began
+
+    # the baseline, and a check that both agree
+    energy, water, carbon = grid.totals()
+    scenarios = [(p, o, c, s) for p in range(len(grid.profiles)) for o in range(len(grid.output_types))
+                 for c in range(len(grid.curves)) for s in range(len(grid.shifts))]
+    picked = [scenarios[i] for i in np.linspace(0, len(scenarios) - 1, args.naive).astype(int)]
+    began = time.perf_counter()
+    for index in picked:
+        p, o, c, s = index
+        expected = naive(usage, grid.profiles[p], grid.output_types[o], None if c == 0 else curves[c - 1],
+                         grid.shifts[s])
+        for value, total in zip(expected, (energy[index], water[index], carbon[index])):
+            assert abs(value - total) <= 1e-9 * abs(value), (index, value, total)
+    per_scenario = (time.perf_counter() - began) / len(picked)
+
+    print(f"{usage.events:,} events over {DAYS} days, {args.departments} departments; "
+          f"{grid.size} scenarios ({len(grid.profiles)} profiles x {len(grid.output_types)} output types x "
+          f"{len(grid.curves)} curves x {len(grid.shifts)} shifts)")
+    print(f"{'scenario grid':<22} {elapsed:>8.2f}s  ({os.cpu_count()} CPUs, workers={args.workers or 'auto'})")
+    print(f"{'replay per scenario':<22} {per_scenario * grid.size:>8.2f}s  "
+          f"({per_scenario:.2f}s x {grid.size}, timed on {len(picked)})")
+    best = np.unravel_index(np.argmax(grid.savings()), grid.savings().shape)
+    print(f"Most carbon saved: {grid.profiles[best[0]]}, {grid.output_types[best[1]]}, {grid.curves[best[2]]}, "
+          f"shift {grid.shifts[best[3]]} ({grid.savings()[best] / carbon[grid.baseline]:.0%} of "
+          f"{carbon[grid.baseline]:,.0f} kg; {FLAT} {grid.profiles[grid.baseline[0]]} baseline)")
+
+
+if __name__ == '__main__':
+    main()
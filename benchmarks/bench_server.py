@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for prototypes/black-frame-tetris/server.py
+Compares the original single-threaded server with the pooled keep-alive server.
+
+Run: python3 benchmarks/bench_server.py [--clients 40] [--requests 50]
+
+Each simulated client loads the enhanced Tetris page the way a browser does
+(HTML, then CSS and JS) over one connection, repeatedly.
+"""
+import argparse
+import http.client
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TETRIS_DIR = os.path.join(ROOT, 'prototypes', 'black-frame-tetris')
+sys.path.insert(0, TETRIS_DIR)
+
+import server  # noqa: E402
+
+PAGE_ASSETS = ['/index-enhanced.html', '/styles-enhanced.css', '/tetris-enhanced.js']
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_client(port, page_loads, latencies, errors, received):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Accept-Encoding': 'gzip'}
+    try:
+        for _ in range(page_loads):
+            for path in PAGE_ASSETS:
+                start = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers=headers)
+                    response = conn.getresponse()
+                    received.append(len(response.read()))
+                except (OSError, http.client.HTTPException):
+                    errors.append(path)
+                    conn.close()
+                    continue
+                latencies.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+def bench(single, clients, page_loads, workers, production=False):
+    if single:
+        base = server.MyHTTPRequestHandler
+    else:
+        base = server.CachingHTTPRequestHandler if production else server.KeepAliveHTTPRequestHandler
+    handler = type('QuietHandler', (base,), {'log_message': lambda self, *args: None})
+    httpd = server.make_server(0, workers, single, handler, production=production,
+                               mounts={'/': TETRIS_DIR})
+    port = httpd.server_address[1]
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    latencies, errors, received = [], [], []
+    threads = [threading.Thread(target=run_client, args=(port, page_loads, latencies, errors, received))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    httpd.shutdown()
+    httpd.server_close()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'kb_per_request': sum(received) / len(received) / 1024 if received else 0.0,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=40, help="concurrent simulated displays")
+    parser.add_argument('--requests', type=int, default=50, help="page loads per client")
+    parser.add_argument('--workers', type=int, default=server.WORKERS, help="pool size for the threaded server")
+    args = parser.parse_args(argv)
+
+    print(f"📊 {args.clients} clients × {args.requests} page loads ({len(PAGE_ASSETS)} files each)\n")
+    print(f"{'server':<32}{'requests':>10}{'errors':>8}{'KB/req':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    modes = (
+        ("single (TCPServer)", True, False),
+        (f"pooled ({args.workers} workers)", False, False),
+        (f"pooled + memory cache (gzip)", False, True),
+    )
+    for label, single, production in modes:
+        result = bench(single, args.clients, args.requests, args.workers, production)
+        print(f"{label:<32}{result['requests']:>10}{result['errors']:>8}{result['kb_per_request']:>8.1f}"
+              f"{result['rps']:>10.0f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the cached impact-estimation service (ecosmart.service)
+
+Run: python3 benchmarks/bench_service.py [--requests 50000] [--library 500] [--cache-size 10000]
+
+A keystroke-like workload: most requests are library prompts picked with a
+Zipf-like skew (a few templates are used far more than the rest), the others
+are one-off prompts. Estimates per second are timed in-process with and
+without the cache, then over HTTP keep-alive, and the cache metrics are
+printed.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart import service  # noqa: E402
+
+WORDS = ('summarize', 'the', 'quarterly', 'report', 'in', 'three', 'bullet', 'points', 'write', 'python',
+         'function', 'to', 'parse', 'csv', 'files', 'explain', 'energy', 'use', 'of', 'language', 'models')
+OUTPUT_TYPES = ('general', 'code', 'analysis', 'creative')
+
+
+def workload(requests, library_size, reuse, seed):
+    rng = random.Random(seed)
+    library = [' '.join(rng.choice(WORDS) for _ in range(rng.randrange(5, 120))) for _ in range(library_size)]
+    weights = [1 / (rank + 1) for rank in range(library_size)]
+    picks = rng.choices(library, weights, k=requests)
+    prompts = []
+    for i, prompt in enumerate(picks):
+        if rng.random() >= reuse:
+            prompt = f'{prompt} {i}'   # a one-off edit
+        prompts.append((prompt, rng.choice(OUTPUT_TYPES)))
+    return prompts
+
+
+def timed(estimator, prompts):
+    start = time.perf_counter()
+    for prompt, output_type in prompts:
+        estimator.estimate(prompt, output_type)
+    return len(prompts) / (time.perf_counter() - start)
+
+
+def bench_http(prompts, cache_size):
+    httpd = service.make_server(0, cache_size=cache_size, host='127.0.0.1')
+    httpd.RequestHandlerClass = type('QuietHandler', (service.EstimationHandler,),
+                                     {'log_message': lambda self, *a: None})
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1])
+    start = time.perf_counter()
+    for prompt, output_type in prompts:
+        connection.request('POST', '/estimate', json.dumps({'prompt': prompt, 'outputType': output_type}),
+                           {'Content-Type': 'application/json'})
+        connection.getresponse().read()
+    rate = len(prompts) / (time.perf_counter() - start)
+    metrics = httpd.estimator.metrics()
+    connection.close()
+    httpd.shutdown()
+    httpd.server_close()
+    return rate, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the impact-estimation cache")
+    parser.add_argument('--requests', type=int, default=50_000)
+    parser.add_argument('--library', type=int, default=500, help="distinct library prompts")
+    parser.add_argument('--reuse', type=float, default=0.8, help="share of requests that are library prompts")
+    parser.add_argument('--cache-size', type=int, default=service.CACHE_SIZE)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    prompts = workload(args.requests, args.library, args.reuse, args.seed)
+    print(f"{args.requests:,} requests, {args.library} library prompts, {args.reuse:.0%} reuse")
+
+    uncached = timed(service.ImpactEstimator(service.TTLCache(maxsize=0)), prompts)
+    estimator = service.ImpactEstimator(service.TTLCache(args.cache_size))
+    cached = timed(estimator, prompts)
+    metrics = estimator.metrics()
+    print(f"🐢 No cache:     {uncached:>10,.0f} estimates/s")
+    print(f"🗃️  With cache:   {cached:>10,.0f} estimates/s  ({cached / uncached:.1f}x, "
+          f"hit rate {metrics['hitRate']:.1%}, {metrics['size']:,} entries)")
+
+    rate, metrics = bench_http(prompts, args.cache_size)
+    print(f"🌐 HTTP keep-alive: {rate:>7,.0f} requests/s  (hit rate {metrics['hitRate']:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Memory and writes of bulk sync (ecosmart.sync) vs the single-JSON-string path
+
+Run: python3 benchmarks/bench_sync.py [--prompts 50000] [--events 100000]
+
+Library: a library of --prompts synthetic prompts is exported and imported
+once as one JSON document (exportLibraryAsJSON / importLibraryFromJSON) and
+once as streamed NDJSON. The transient peak is the tracemalloc peak minus
+what is still held afterwards (the imported library), i.e. the memory the
+transfer itself needed. The libraries are in memory, without a change log.
+
+Stats: usage events are written to a stats file once per event, as
+updateUsageStats does (the first --unbatched events only, as this is slow),
+and all --events through StatsBatcher.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecosmart import core_engine as engine  # noqa: E402
+from ecosmart import sync  # noqa: E402
+from ecosmart.library import PromptLibrary  # noqa: E402
+
+WORDS = ('summarize', 'the', 'quarterly', 'report', 'in', 'three', 'bullet', 'points', 'write', 'python',
+         'function', 'to', 'parse', 'csv', 'files', 'explain', 'energy', 'use', 'of', 'language', 'models')
+
+
+def make_library(count, seed):
+    rng = random.Random(seed)
+    library = PromptLibrary()
+    impact = engine.calculate_environmental_impact('Summarize this report', 'analysis')
+    summary = {'energy': {'wh': impact['impact']['energy']['wh']},
+               'water': {'liters': impact['impact']['water']['liters']},
+               'carbon': {'kg': impact['impact']['carbon']['kg']}}
+    library.save_many({'text': ' '.join(rng.choices(WORDS, k=rng.randrange(5, 80))) + f' #{i}',
+                       'tags': rng.sample(WORDS, 2), 'tokens': impact['tokens'], 'impact': summary}
+                      for i in range(count))
+    return library
+
+
+def measured(function):
+    """(seconds, transient peak MB) of function(): the peak above what it started with and what it returns."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, (peak - retained) / 2**20
+
+
+def bench_library(count, workdir, seed):
+    library = make_library(count, seed)
+    json_path = os.path.join(workdir, 'library.json')
+    ndjson_path = os.path.join(workdir, 'library.ndjson')
+
+    def export_json():
+        text = json.dumps(library.export(), indent=2)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def import_json():
+        with open(json_path, encoding='utf-8') as f:
+            data = json.loads(f.read())
+        target = PromptLibrary()
+        target.import_prompts(data)
+        return target
+
+    def import_ndjson():
+        target = PromptLibrary()
+        sync.import_library(target, ndjson_path)
+        return target
+
+    rows = [
+        ('JSON export', *measured(export_json)),
+        ('NDJSON export', *measured(lambda: sync.export_library(library, ndjson_path))),
+        ('JSON import', *measured(import_json)),
+        ('NDJSON import', *measured(import_ndjson)),
+    ]
+    print(f"{count:,} prompts: JSON {os.path.getsize(json_path) / 2**20:.0f} MB, "
+          f"NDJSON {os.path.getsize(ndjson_path) / 2**20:.0f} MB")
+    print(f"{'':<15} {'time':>7} {'transient peak':>15}")
+    for label, seconds, peak in rows:
+        print(f"{label:<15} {seconds:>6.2f}s {peak:>12.1f} MB")
+
+
+def bench_stats(events, unbatched, users, workdir, seed):
+    rng = random.Random(seed)
+    impact = engine.calculate_environmental_impact('Summarize this report', 'analysis')
+    stream = [f'user{rng.randrange(users)}' for _ in range(events)]
+    print(f"\nUsage events from {users:,} users")
+    for label, max_events, count in (('write per event', 1, min(unbatched, events)),
+                                     ('StatsBatcher', sync.STATS_BATCH, events)):
+        path = os.path.join(workdir, f'stats-{max_events}.json')
+        store = sync.UsageStatsStore(path)
+        start = time.perf_counter()
+        with sync.StatsBatcher(store, max_events=max_events, max_delay=math.inf) as batcher:
+            for user in stream[:count]:
+                batcher.record_query(user, impact)
+        seconds = time.perf_counter() - start
+        print(f"{label:<16} {count:>8,} events {seconds:>7.2f}s {count / seconds:>10,.0f} events/s "
+              f"{store.writes:>8,} writes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NDJSON bulk sync against single-document JSON")
+    parser.add_argument('--prompts', type=int, default=50_000)
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--unbatched', type=int, default=5_000, help="events written one by one")
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_library(args.prompts, workdir, args.seed)
+        bench_stats(args.events, args.unbatched, args.users, workdir, args.seed)
+
+
+if __name__ == '__main__':
+    main()
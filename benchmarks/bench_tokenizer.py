@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Accuracy and throughput of BPE token counts (ecosmart.tokenizer) vs chars/4
+
+Run: python3 benchmarks/bench_tokenizer.py --vocab cl100k_base.tiktoken [--prompts 1000000]
+
+A model's vocabulary is required (--vocab, or ECOSMART_BPE_VOCAB); none is
+bundled. With cl100k_base the BPE counts are the model's own, so the
+accuracy table is the error of chars/4 against the model.
+
+Accuracy: prompts of four kinds (English prose and code from this
+repository, Dutch and non-Latin sentences below) are counted with chars/4
+and with the vocabulary.
+
+Throughput: --prompts synthetic log prompts (slices of the repository text,
+a share of them repeated) are counted with estimate_tokens_batch, then with
+count_tokens_batch on a cold tokenizer and again once its caches are warm.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ecosmart import core_engine as engine  # noqa: E402
+from ecosmart import tokenizer  # noqa: E402
+
+DUTCH = [
+    "Kun je dit kwartaalrapport samenvatten in drie duidelijke punten?",
+    "Schrijf een korte e-mail aan het team over de nieuwe duurzaamheidsdoelen van het ministerie.",
+    "Wat zijn de belangrijkste verschillen tussen de begroting van dit jaar en die van vorig jaar?",
+    "Vertaal de volgende alinea naar eenvoudig Nederlands voor een breed publiek.",
+    "Maak een overzicht van de energieverbruikscijfers per afdeling voor de afgelopen maand.",
+    "Hoeveel water en elektriciteit kost het trainen en gebruiken van grote taalmodellen?",
+    "Stel een agenda op voor het overleg van donderdag met de beleidsmedewerkers.",
+    "Leg uit waarom kortere prompts zuiniger zijn zonder dat de kwaliteit achteruitgaat.",
+]
+NON_LATIN = [
+    "请用三点总结这份季度报告，并说明主要的风险。",
+    "人工智能的能源消耗对环境有什么影响？",
+    "Кратко перескажи этот отчёт и выдели три главных вывода.",
+    "Сколько энергии потребляет один запрос к языковой модели?",
+    "لخص هذا التقرير في ثلاث نقاط رئيسية من فضلك.",
+    "Γράψε μια σύντομη περίληψη της αναφοράς για την ομάδα.",
+    "この報告書を三つの要点にまとめてください。",
+    "이 보고서를 세 가지 요점으로 요약해 주세요.",
+]
+
+
+def repository_text(patterns):
+    files = subprocess.run(['git', 'ls-files', *patterns], cwd=ROOT, capture_output=True, text=True,
+                           check=True).stdout.split()
+    for name in files:
+        if 'fixtures' in name:
+            continue
+        with open(os.path.join(ROOT, name), encoding='utf-8', errors='replace') as f:
+            yield f.read()
+
+
+def paragraphs(texts, minimum=80, maximum=1200):
+    for text in texts:
+        for paragraph in text.split('\n\n'):
+            if minimum <= len(paragraph) <= maximum:
+                yield paragraph
+
+
+def error(estimates, reference):
+    """Mean absolute relative error, in percent."""
+    return sum(abs(e - r) / r for e, r in zip(estimates, reference) if r) / len(reference) * 100
+
+
+def bench_accuracy(vocab_path, samples_per_kind, seed):
+    """Error of chars/4 against the model vocabulary's counts."""
+    rng = random.Random(seed)
+    prose = [p for p in paragraphs(repository_text(['*.md'])) if not p.lstrip().startswith(('|', '```', '#'))]
+    code = list(paragraphs(repository_text(['*.py', '*.js'])))
+    kinds = {
+        'English prose': rng.sample(prose, min(samples_per_kind, len(prose))),
+        'code': rng.sample(code, min(samples_per_kind, len(code))),
+        'Dutch': DUTCH,
+        'non-Latin': NON_LATIN,
+    }
+    model = tokenizer.BPETokenizer.from_file(vocab_path)
+    print(f"Vocabulary: {vocab_path} ({len(model):,} tokens)")
+    print(f"{'kind':<14} {'prompts':>7} {'BPE tokens':>10} {'chars/4':>8} {'chars/4 err':>11} {'chars/token':>11}")
+    for kind, texts in kinds.items():
+        counts = [model.count(text) for text in texts]
+        heuristic = [engine.estimate_tokens(text) for text in texts]
+        chars = sum(len(text) for text in texts) / sum(counts)
+        print(f"{kind:<14} {len(texts):>7} {sum(counts) / len(texts):>10.1f} {sum(heuristic) / len(texts):>8.1f} "
+              f"{error(heuristic, counts):>10.1f}% {chars:>11.2f}")
+
+
+def synthetic_prompts(count, reuse, seed):
+    rng = random.Random(seed)
+    corpus = '\n\n'.join(repository_text(['*.md', '*.py', '*.js']))
+    library = []
+    prompts = []
+    for _ in range(count):
+        if library and rng.random() < reuse:
+            prompts.append(rng.choice(library))
+            continue
+        start = rng.randrange(len(corpus) - 2000)
+        prompt = corpus[start:start + rng.randrange(20, 1600)]
+        prompts.append(prompt)
+        if len(library) < 5000:
+            library.append(prompt)
+    return prompts
+
+
+def timed(function, prompts):
+    start = time.perf_counter()
+    counts = function(prompts)
+    return time.perf_counter() - start, counts
+
+
+def bench_throughput(prompts, vocab_path):
+    print(f"\n{len(prompts):,} prompts, {sum(map(len, prompts)) / len(prompts):.0f} characters on average")
+    seconds, heuristic = timed(engine.estimate_tokens_batch, prompts)
+    print(f"{'chars/4':<22} {seconds:>7.1f}s {len(prompts) / seconds:>12,.0f} prompts/s  "
+          f"{heuristic.sum():>14,} tokens")
+    counter = tokenizer.BPETokenizer.from_file(vocab_path)
+    for label in ('BPE (cold caches)', 'BPE (warm caches)'):
+        seconds, counts = timed(counter.count_batch, prompts)
+        print(f"{label:<22} {seconds:>7.1f}s {len(prompts) / seconds:>12,.0f} prompts/s  "
+              f"{counts.sum():>14,} tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BPE token counts against chars/4")
+    parser.add_argument('--prompts', type=int, default=1_000_000)
+    parser.add_argument('--reuse', type=float, default=0.3, help="share of prompts repeated from a library")
+    parser.add_argument('--samples', type=int, default=200, help="prose and code samples for accuracy")
+    parser.add_argument('--vocab', default=os.environ.get(tokenizer.VOCAB_ENV),
+                        help=f"a model's .tiktoken vocabulary, e.g. cl100k_base.tiktoken "
+                             f"(default: ${tokenizer.VOCAB_ENV})")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    if not args.vocab:
+        parser.error(f"give --vocab or set {tokenizer.VOCAB_ENV}: no vocabulary is bundled")
+    if not os.path.isfile(args.vocab):
+        parser.error(f"vocabulary {args.vocab} not found")
+
+    bench_accuracy(args.vocab, args.samples, args.seed)
+    bench_throughput(synthetic_prompts(args.prompts, args.reuse, args.seed), args.vocab)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env node
+/**
+ * Generate golden values from prototypes/ecoprompt-coach/core-engine.js
+ * for the Python port's parity check (benchmarks/bench_impact.py --parity).
+ *
+ * Run: node benchmarks/generate_engine_parity.js
+ * Writes: benchmarks/fixtures/core_engine_parity.json
+ */
+
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const root = path.join(__dirname, '..');
+const source = fs.readFileSync(path.join(root, 'prototypes/ecoprompt-coach/core-engine.js'), 'utf8');
+const sandbox = { window: {} };
+vm.runInNewContext(source, sandbox);
+const engine = sandbox.window.EcoSmartEngine;
+
+// Deterministic pseudo-random numbers (mulberry32) so the fixture is stable
+let seed = 20250301;
+function random() {
+  seed |= 0; seed = seed + 0x6D2B79F5 | 0;
+  let t = Math.imul(seed ^ seed >>> 15, 1 | seed);
+  t = t + Math.imul(t ^ t >>> 7, 61 | t) ^ t;
+  return ((t ^ t >>> 14) >>> 0) / 4294967296;
+}
+
+const profiles = Object.keys(engine.ENVIRONMENTAL_CONSTANTS);
+const outputTypes = ['general', 'code', 'creative', 'brief', 'analysis', 'unknown'];
+
+// Token pairs around every benchmark boundary, plus random ones up to 50k
+const tokenPairs = [[0, 0], [1, 0], [0, 1], [100, 300], [199, 200], [200, 200], [200, 201],
+                    [1000, 1000], [1000, 1001], [10000, 1500], [10000, 1501], [40000, 60000]];
+for (let i = 0; i < 120; i++) {
+  const scale = [400, 2000, 11500, 50000][i % 4];
+  tokenPairs.push([Math.floor(random() * scale), Math.floor(random() * scale)]);
+}
+
+const numeric = [];
+for (const [input, output] of tokenPairs) {
+  for (const profile of profiles) {
+    const constants = engine.ENVIRONMENTAL_CONSTANTS[profile];
+    const energy = engine.calculateEnergy(input, output);
+    const water = engine.calculateWater(energy, constants);
+    const carbon = engine.calculateCarbon(energy, constants);
+    numeric.push({
+      input, output, profile, energy, water, carbon,
+      ecoScore: engine.calculateEcoScore(energy, water, carbon)
+    });
+  }
+}
+
+const outputTokens = [];
+for (let input = 0; input < 60; input++) {
+  for (const type of outputTypes) {
+    outputTokens.push({ input, type, output: engine.estimateOutputTokens(input, type) });
+  }
+}
+
+const texts = ['', '   ', 'a', 'abcd', 'abcde', 'Summarize this report in three bullet points.',
+               'Vat dit rapport samen in drie punten alstublieft.', 'def f(x):\n    return x ** 2\n',
+               '請總結這份報告', 'emoji 🌱🌳🌍 test', '\t\n padded \n\t',
+               'Write a detailed analysis of energy usage in data centers. '.repeat(40)];
+const impacts = [];
+const impactProfiles = profiles.concat(['UNKNOWN']);
+for (const text of texts) {
+  outputTypes.forEach((outputType, i) => {
+    const gridProfile = impactProfiles[i % impactProfiles.length];
+    const result = engine.calculateEnvironmentalImpact(text, { outputType, gridProfile });
+    delete result.metadata.timestamp;
+    impacts.push({ text, outputType, gridProfile, result });
+  });
+}
+
+const comparisons = [];
+for (let i = 0; i < texts.length; i++) {
+  const original = texts[i];
+  const optimized = texts[(i + 3) % texts.length];
+  const result = engine.comparePrompts(original, optimized, { outputType: 'code' });
+  delete result.original.metadata.timestamp;
+  delete result.optimized.metadata.timestamp;
+  comparisons.push({ original, optimized, outputType: 'code', result });
+}
+
+const out = path.join(__dirname, 'fixtures', 'core_engine_parity.json');
+fs.writeFileSync(out, JSON.stringify({ numeric, outputTokens, impacts, comparisons }));
+console.log(`✅ Wrote ${numeric.length} numeric, ${outputTokens.length} output-token, ` +
+            `${impacts.length} impact and ${comparisons.length} comparison cases to ${path.relative(root, out)}`);
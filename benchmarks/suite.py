@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Performance-regression suite: impact engine, department aggregation, reports
+and static serving
+
+Run: python3 benchmarks/suite.py [--scale small|medium|large] [--only impact-batch,static]
+     python3 benchmarks/suite.py --scale medium --update-baseline   # after an intended change
+     python3 benchmarks/suite.py --generate usage.jsonl.gz --scale large   # just write a usage log
+
+Every scenario runs in a fresh subprocess on synthetic data, so its peak RSS
+is its own. It reports throughput, latency percentiles (per chunk, report,
+call or request, see SCENARIOS) and peak RSS. Each scenario is repeated
+--repeat times and the run with the median throughput is kept.
+
+Results are written as JSON to --out (default benchmarks/results/SCALE.json)
+and compared with the same scale in benchmarks/baseline.json. A metric that
+is worse than its baseline by more than its THRESHOLDS fraction is a
+regression, and the exit status is 1. Baselines are only comparable on the
+machine that recorded them: run --update-baseline once per machine. The
+medium scale is the one to gate changes on; small runs have few samples.
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TETRIS_DIR = os.path.join(ROOT, 'prototypes', 'black-frame-tetris')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Work per scenario at each scale
+SCALES = {
+    'small': {'events': 10_000, 'prompts': 2_000, 'reports': 20, 'features': 1_000, 'requests': 2_000},
+    'medium': {'events': 100_000, 'prompts': 10_000, 'reports': 50, 'features': 10_000, 'requests': 10_000},
+    'large': {'events': 1_000_000, 'prompts': 50_000, 'reports': 100, 'features': 100_000, 'requests': 40_000},
+}
+
+# Largest accepted change before a metric counts as a regression; repeated
+# small runs on one machine vary by up to ~25%
+THRESHOLDS = {
+    'throughput': 0.30,     # 30% slower
+    'p50_ms': 0.40,
+    'p95_ms': 0.50,
+    'p99_ms': 1.00,         # the tail is noisy
+    'peak_rss_mb': 0.20,
+}
+MIN_LATENCY_CHANGE_MS = 0.05   # latency changes below this are noise, whatever the percentage
+
+CHUNK_EVENTS = 4096     # events per chunk for the impact and aggregation latencies
+CLIENTS = 4             # keep-alive connections for static serving
+PAGE_ASSETS = ['/index-enhanced.html', '/styles-enhanced.css', '/tetris-enhanced.js']
+
+DEPARTMENTS = ('it', 'finance', 'hr', 'policy', 'operations', 'legal', 'marketing', 'research')
+TOOLS = ('gpt-4o', 'gpt-4o-mini', 'gpt-35-turbo', 'o1-mini', 'claude-3-haiku', 'copilot', 'dall-e-3',
+         'whisper', 'text-embedding-3-small')
+WORDS = ('summarize', 'the', 'quarterly', 'report', 'in', 'three', 'bullet', 'points', 'write', 'python',
+         'function', 'to', 'parse', 'csv', 'files', 'explain', 'energy', 'use', 'of', 'language', 'models')
+
+
+# ==============================================================================
+# Synthetic data
+# ==============================================================================
+
+def usage_records(count, seed=7, days=30, users_per_department=50, start=None):
+    """
+    `count` usage-log records in the fields ecosmart.ingest reads, spread over
+    `days` days in time order: a few departments and tools do most of the
+    work, token counts are log-normal, and users often continue a query.
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2026, 9, 1, tzinfo=timezone.utc)
+    step = days * 86400 / max(count, 1)
+    department_weights = [1 / (rank + 1) for rank in range(len(DEPARTMENTS))]
+    tool_weights = [1 / (rank + 1) ** 1.5 for rank in range(len(TOOLS))]
+    queries = {}
+    for i in range(count):
+        department = rng.choices(DEPARTMENTS, department_weights)[0]
+        user = f'{department}-{rng.randrange(users_per_department)}'
+        if user not in queries or rng.random() > 0.4:
+            queries[user] = f'q{i}'
+        output_tokens = 0 if rng.random() < 0.1 else min(int(rng.lognormvariate(5.5, 1.0)), 16000)
+        yield {
+            'timestamp': (start + timedelta(seconds=i * step)).isoformat(),
+            'department': department,
+            'user': user,
+            'tool': rng.choices(TOOLS, tool_weights)[0],
+            'input_tokens': min(int(rng.lognormvariate(5.0, 1.2)), 60000),
+            'output_tokens': output_tokens,     # 0: estimated from the input, as in the browser
+            'query_id': queries[user],
+            'grid_profile': 'AWS_ANTHROPIC' if rng.random() < 0.05 else None,
+        }
+
+
+def write_usage_log(path, count, seed=7):
+    """Write usage_records() as JSONL (gzipped if `path` ends in .gz)."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        for record in usage_records(count, seed):
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def prompt_texts(count, seed=7):
+    rng = random.Random(seed)
+    return [' '.join(rng.choices(WORDS, k=int(rng.lognormvariate(3.0, 0.8)) + 1)) for _ in range(count)]
+
+
+def feature_rows(count):
+    """`count` feature dicts: the real ones, repeated and renumbered."""
+    from create_feature_table import features
+
+    for i in range(count):
+        feature = features[i % len(features)]
+        yield {**feature, 'Feature': f"{feature['Feature']} #{i + 1}"}
+
+
+# ==============================================================================
+# Scenarios (each returns items, unit, seconds, latencies in seconds)
+# ==============================================================================
+
+def bench_impact_batch(scale, seed, workdir):
+    """calculate_impact_batch over the usage log, one call per chunk."""
+    import numpy as np
+    from ecosmart import core_engine as engine
+
+    inputs, outputs, profiles = [], [], []
+    for record in usage_records(scale['events'], seed):     # only the columns, not a million dicts
+        inputs.append(record['input_tokens'])
+        outputs.append(record['output_tokens'])
+        profiles.append(record['grid_profile'] or engine.DEFAULT_GRID_PROFILE)
+    inputs, outputs = np.array(inputs, dtype=np.int64), np.array(outputs, dtype=np.int64)
+    latencies = []
+    for start in range(0, len(inputs), CHUNK_EVENTS):
+        end = start + CHUNK_EVENTS
+        began = time.perf_counter()
+        engine.calculate_impact_batch(inputs[start:end], outputs[start:end], grid_profile=profiles[start:end])
+        latencies.append(time.perf_counter() - began)
+    return len(inputs), 'events', sum(latencies), latencies
+
+
+def bench_impact_single(scale, seed, workdir):
+    """calculate_environmental_impact per prompt, as the estimation service and the extension call it."""
+    from ecosmart import core_engine as engine
+
+    texts = prompt_texts(scale['prompts'], seed)
+    types = engine.OUTPUT_TYPES
+    latencies = []
+    for i, text in enumerate(texts):
+        began = time.perf_counter()
+        engine.calculate_environmental_impact(text, types[i % len(types)])
+        latencies.append(time.perf_counter() - began)
+    return len(texts), 'prompts', sum(latencies), latencies
+
+
+def bench_aggregation(scale, seed, workdir):
+    """Usage log (JSONL.gz) -> DepartmentRollup, the ingest pipeline timed per chunk."""
+    from ecosmart import ingest
+
+    path = os.path.join(workdir, 'usage.jsonl.gz')
+    write_usage_log(path, scale['events'], seed)
+    rollup = ingest.DepartmentRollup()
+    chunks = ingest.chunked(ingest.mark_queries(ingest.parse_events(ingest.read_records(path))), CHUNK_EVENTS)
+    latencies = []
+    while True:
+        began = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        rollup.add_chunk(chunk)
+        latencies.append(time.perf_counter() - began)
+    return rollup.events, 'events', sum(latencies), latencies
+
+
+def bench_department_report(scale, seed, workdir):
+    """department-data.json for the Magic Mirror (snapshot + atomic write) from a filled rollup."""
+    from ecosmart import ingest
+
+    rollup = ingest.DepartmentRollup()
+    for chunk in ingest.chunked(ingest.mark_queries(ingest.parse_events(usage_records(scale['events'], seed)))):
+        rollup.add_chunk(chunk)
+    path = os.path.join(workdir, 'department-data.json')
+    latencies = []
+    for _ in range(scale['reports']):
+        began = time.perf_counter()
+        ingest.write_json(rollup.snapshot(), path)
+        latencies.append(time.perf_counter() - began)
+    return len(latencies), 'reports', sum(latencies), latencies
+
+
+def bench_feature_report(scale, seed, workdir):
+    """create_feature_table.build of the Markdown, HTML and CSV tables (forced, in this process)."""
+    import create_feature_table as table
+
+    df = table.build_table(feature_rows(scale['features']))
+    latencies = []
+    for _ in range(3):
+        began = time.perf_counter()
+        table.build(df, workdir, force=True, formats=('md', 'html', 'csv'), jobs=1)
+        latencies.append(time.perf_counter() - began)
+    return len(df) * len(latencies), 'rows', sum(latencies), latencies
+
+
+def bench_static(scale, seed, workdir):
+    """The production server (memory cache, gzip) under CLIENTS keep-alive clients loading the Tetris page."""
+    import http.client
+
+    sys.path.insert(0, TETRIS_DIR)
+    import server
+
+    handler = type('QuietHandler', (server.CachingHTTPRequestHandler,), {'log_message': lambda self, *args: None})
+    httpd = server.make_server(0, handler_class=handler, production=True, mounts={'/': TETRIS_DIR})
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    per_client = scale['requests'] // CLIENTS
+    latencies, errors = [], []
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine = []
+        for i in range(per_client):
+            began = time.perf_counter()
+            try:
+                conn.request('GET', PAGE_ASSETS[i % len(PAGE_ASSETS)], headers={'Accept-Encoding': 'gzip'})
+                conn.getresponse().read()
+            except (OSError, http.client.HTTPException):
+                errors.append(i)
+                conn.close()
+                continue
+            mine.append(time.perf_counter() - began)
+        conn.close()
+        latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    httpd.shutdown()
+    httpd.server_close()
+    if errors:
+        raise RuntimeError(f"{len(errors)} requests failed")
+    return len(latencies), 'requests', elapsed, latencies
+
+
+# name -> (function, what one latency sample is)
+SCENARIOS = {
+    'impact-batch': (bench_impact_batch, f'chunk of {CHUNK_EVENTS} events'),
+    'impact-single': (bench_impact_single, 'prompt'),
+    'aggregation': (bench_aggregation, f'chunk of {CHUNK_EVENTS} events'),
+    'department-report': (bench_department_report, 'report'),
+    'feature-report': (bench_feature_report, 'build'),
+    'static': (bench_static, 'request'),
+}
+
+
+# ==============================================================================
+# Measurement
+# ==============================================================================
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB on Linux
+
+
+def run(name, scale, seed):
+    """Child process: run one scenario and print its measurements as JSON."""
+    function, sample = SCENARIOS[name]
+    with tempfile.TemporaryDirectory() as workdir:
+        items, unit, seconds, latencies = function(SCALES[scale], seed, workdir)
+    print(json.dumps({
+        'items': items,
+        'unit': unit,
+        'seconds': round(seconds, 4),
+        'throughput': round(items / seconds, 1),
+        'sample': sample,
+        'samples': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'max_ms': round(max(latencies) * 1000, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }))
+
+
+def measure(name, scale, seed, repeat):
+    """Run a scenario `repeat` times in fresh processes; the run with the median throughput."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name, scale, str(seed)],
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output))
+    runs.sort(key=lambda result: result['throughput'])
+    return runs[len(runs) // 2]
+
+
+# ==============================================================================
+# Baseline comparison
+# ==============================================================================
+
+def regressions(current, baseline, thresholds=THRESHOLDS):
+    """
+    [(scenario, metric, baseline value, current value, change)] for every
+    metric worse than its baseline by more than its threshold.
+    """
+    found = []
+    for name, result in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for metric, threshold in thresholds.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            if metric == 'throughput':
+                worse = change < -threshold
+            else:
+                worse = change > threshold
+                if metric.endswith('_ms') and new - old < MIN_LATENCY_CHANGE_MS:
+                    worse = False
+            if worse:
+                found.append((name, metric, old, new, change))
+    return found
+
+
+def load_baselines(path=BASELINE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def print_results(results, baseline):
+    base = baseline.get('scenarios', {}) if baseline else {}
+    print(f"{'scenario':<18} {'items':>10} {'throughput':>14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'RSS MB':>7} {'vs baseline':>12}")
+    for name, result in results['scenarios'].items():
+        old = base.get(name, {}).get('throughput')
+        change = f"{result['throughput'] / old - 1:>+11.1%}" if old else f"{'—':>11}"
+        print(f"{name:<18} {result['items']:>10,} {result['throughput']:>10,.0f}/s {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['peak_rss_mb']:>7.0f} {change:>12}")
+
+
+def parse_threshold(value):
+    metric, sep, fraction = value.partition('=')
+    if not sep or metric not in THRESHOLDS:
+        raise argparse.ArgumentTypeError(f"expected METRIC=FRACTION with METRIC one of {', '.join(THRESHOLDS)}")
+    return metric, float(fraction)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance-regression suite against a stored baseline")
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--only', help=f"comma-separated scenarios ({', '.join(SCENARIOS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per scenario (the median is kept)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', help="results JSON (default: benchmarks/results/SCALE.json)")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline JSON, keyed by scale")
+    parser.add_argument('--threshold', type=parse_threshold, action='append', default=[],
+                        metavar='METRIC=FRACTION', help="override a regression threshold (repeatable)")
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--generate', metavar='PATH', help="only write a synthetic usage log of the scale")
+    parser.add_argument('--run', nargs=3, metavar=('SCENARIO', 'SCALE', 'SEED'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        name, scale, seed = args.run
+        run(name, scale, int(seed))
+        return
+    if args.generate:
+        write_usage_log(args.generate, SCALES[args.scale]['events'], args.seed)
+        print(f"✅ {SCALES[args.scale]['events']:,} usage records → {args.generate}")
+        return
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    results = {
+        'scale': args.scale,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        'scenarios': {},
+    }
+    baselines = load_baselines(args.baseline)
+    baseline = baselines.get(args.scale)
+    print(f"📊 Scale {args.scale}: {', '.join(f'{value:,} {key}' for key, value in SCALES[args.scale].items())}"
+          f", median of {args.repeat} runs\n")
+    for name in names:
+        results['scenarios'][name] = measure(name, args.scale, args.seed, args.repeat)
+    print_results(results, baseline)
+
+    out = args.out or os.path.join(RESULTS_DIR, f'{args.scale}.json')
+    write_json(results, out)
+    print(f"\n💾 Results → {os.path.relpath(out)}")
+
+    if args.update_baseline:
+        if baseline and args.only:    # keep the scenarios that were not re-run
+            results['scenarios'] = {**baseline['scenarios'], **results['scenarios']}
+        baselines[args.scale] = results
+        write_json(baselines, args.baseline)
+        print(f"📌 Baseline for {args.scale} → {os.path.relpath(args.baseline)}")
+        return
+    if not baseline:
+        print(f"⚠️  No {args.scale} baseline in {os.path.relpath(args.baseline)}; run with --update-baseline")
+        return
+    if baseline.get('machine') != results['machine']:
+        print(f"⚠️  Baseline recorded on {baseline.get('machine')}; comparisons may not be meaningful")
+
+    found = regressions(results, baseline, {**THRESHOLDS, **dict(args.threshold)})
+    if not found:
+        print(f"✅ No regressions against the {baseline['created']} baseline")
+        return
+    print(f"❌ {len(found)} regression(s) against the {baseline['created']} baseline:")
+    for name, metric, old, new, change in found:
+        print(f"   {name}: {metric} {old:,.2f} → {new:,.2f} ({change:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,39 @@
 """
 Generate Feature Table from Partner Feedback
 Creates both Excel and Markdown tables with all features
+
+Run: python3 create_feature_table.py           # rewrite only outputs whose inputs changed
+     python3 create_feature_table.py --force   # rewrite everything
+     python3 create_feature_table.py --source PARTNER_FEEDBACK_SUMMARY.md --source extra.csv
+     python3 create_feature_table.py --formats all --timings   # + HTML, CSV, one file per prototype
+
+Every output is fingerprinted with a hash of the feature rows and of the code
+that renders it (recorded in .feature_table_build.json). Outputs whose
+fingerprint and file contents are unchanged are skipped, so a run without
+changes leaves the working tree clean. The table is grouped by prototype
+once; stale outputs are then rendered in parallel, one worker process each.
+
+Without --source the table is the `features` list below. With one or more
+--source files (JSONL, CSV, or the Markdown feedback summary) the rows are
+streamed from those files instead, in order; see "Sources".
 """
 
-import pandas as pd
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
 from datetime import datetime
+from html import escape
+from typing import NamedTuple, Optional
+
+import pandas as pd
 
 # Define all features extracted from partner feedback
 features = [
@@ -468,94 +497,685 @@ features = [
     },
 ]
 
-# Create DataFrame
-df = pd.DataFrame(features)
+COLUMNS = ['#', 'Feature', 'Short Description', 'Prototype', 'Notes', 'Suggested by']
+COLUMN_WIDTHS = {'#': 5, 'Feature': 35, 'Short Description': 60, 'Prototype': 30, 'Notes': 60, 'Suggested by': 25}
 
-# Add row numbers
-df.insert(0, '#', range(1, len(df) + 1))
+EXCEL_FILENAME = 'PARTNER_FEEDBACK_FEATURES.xlsx'
+MARKDOWN_FILENAME = 'PARTNER_FEEDBACK_FEATURES.md'
+MANIFEST_FILENAME = '.feature_table_build.json'
+SOURCE_CACHE_DIRNAME = '.feature_sources'
 
-# Reorder columns to match requested format
-df = df[['#', 'Feature', 'Short Description', 'Prototype', 'Notes', 'Suggested by']]
+# From this many rows the Excel file is written in write-only (streaming) mode
+STREAM_ROWS = 10_000
 
-# Create Excel file with formatting
-excel_filename = 'PARTNER_FEEDBACK_FEATURES.xlsx'
-with pd.ExcelWriter(excel_filename, engine='openpyxl') as writer:
-    df.to_excel(writer, sheet_name='Features', index=False)
 
-    # Get workbook and worksheet
-    workbook = writer.book
-    worksheet = writer.sheets['Features']
+def build_table(features):
+    """Numbered DataFrame in the column order of the outputs; `features` may be any iterable of dicts."""
+    df = pd.DataFrame(features, columns=COLUMNS[1:])
+    df.insert(0, '#', range(1, len(df) + 1))
+    return df[COLUMNS]
 
-    # Set column widths
-    worksheet.column_dimensions['A'].width = 5   # #
-    worksheet.column_dimensions['B'].width = 35  # Feature
-    worksheet.column_dimensions['C'].width = 60  # Short Description
-    worksheet.column_dimensions['D'].width = 30  # Prototype
-    worksheet.column_dimensions['E'].width = 60  # Notes
-    worksheet.column_dimensions['F'].width = 25  # Suggested by
 
-    # Format header row
-    from openpyxl.styles import Font, PatternFill, Alignment
+# ==============================================================================
+# Sources
+# ==============================================================================
+
+# file suffix -> loader(path) yielding feature dicts; add formats with @loader
+LOADERS = {}
+
+
+def loader(*suffixes):
+    def register(function):
+        for suffix in suffixes:
+            LOADERS[suffix] = function
+        return function
+    return register
+
+
+@loader('.jsonl', '.ndjson')
+def load_jsonl(path):
+    """One feature object per line."""
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+
+
+@loader('.csv')
+def load_csv(path):
+    """Header row with the column names (any '#' column is ignored: rows are renumbered)."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+PROTOTYPE_HEADING = re.compile(r'^## (\d+)\. (.+?)\s*$')
+LABEL_LINE = re.compile(r'^\*\*(.+?):?\*\*:?\s*$')
+DONE_ITEM = re.compile(r'^\s*[-*] ✅ (.+?)\s*$')
+# summary headings whose prototype goes by a shorter name in the built-in table
+PROTOTYPE_NAMES = {'Digital Forest Wall': 'Digital Forest'}
+
+
+@loader('.md', '.markdown')
+def load_markdown(path):
+    """
+    Features from PARTNER_FEEDBACK_SUMMARY.md, parsed line by line.
+
+    Every ✅ item under a prototype's "Implementation Response" becomes a
+    feature of that prototype ("## 4. Prompt Coach" -> "Prompt Coach
+    (Prototype 4)", named as in the built-in table), noted with the heading or bold label above it. It is
+    credited to the partners it names, or to every partner with feedback in
+    that section ("#### Matthijs" under "Key Feedback Points").
+    """
+    prototype = subsection = context = None
+    partners = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip()
+            if line.startswith('## '):
+                match = PROTOTYPE_HEADING.match(line)
+                if match:
+                    name = match[2].split(' / ')[0]
+                    prototype = f"{PROTOTYPE_NAMES.get(name, name)} (Prototype {match[1]})"
+                else:
+                    prototype = None
+                subsection = context = None
+                partners = []
+            elif prototype is None:
+                continue
+            elif line.startswith('### '):
+                subsection, context = line[4:].strip(), None
+            elif line.startswith('#### '):
+                heading = line[5:].strip().rstrip(':')
+                if subsection == 'Key Feedback Points':
+                    partners.append(heading)
+                else:
+                    context = heading
+            elif subsection == 'Implementation Response':
+                label = LABEL_LINE.match(line)
+                if label:
+                    context = label[1]
+                    continue
+                item = DONE_ITEM.match(line)
+                if item:
+                    yield markdown_feature(item[1], prototype, context, partners)
+
+
+def markdown_feature(text, prototype, context, partners):
+    description = text.replace('**', '')
+    mentioned = ([partner for partner in partners if partner in description]
+                 or [partner for partner in partners if context and partner in context]
+                 or partners)
+    return {
+        'Feature': re.split(r' \(| - ', description, maxsplit=1)[0],
+        'Short Description': description,
+        'Prototype': prototype,
+        'Notes': context or '',
+        'Suggested by': ', '.join(mentioned),
+    }
+
+
+def feature_record(raw):
+    """Source row -> {column: text} for every feature column, or None without a Feature name."""
+    record = {}
+    for column in COLUMNS[1:]:
+        value = raw.get(column)
+        record[column] = '' if value is None else str(value).strip()
+    return record if record['Feature'] else None
+
+
+def parser_hash(load):
+    """Hash of a loader and of every function and constant the records it yields depend on."""
+    digest = hashlib.sha256()
+    for function in (load, markdown_feature, feature_record):
+        digest.update(inspect.getsource(function).encode('utf-8'))
+    constants = [COLUMNS, PROTOTYPE_HEADING.pattern, LABEL_LINE.pattern, DONE_ITEM.pattern, PROTOTYPE_NAMES]
+    digest.update(json.dumps(constants, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def source_records(path, cache_dir=SOURCE_CACHE_DIRNAME):
+    """
+    Feature records of one source file, streamed.
+
+    Parsed records are kept in `cache_dir` as JSONL behind a header line with
+    the source's mtime and size and the parser_hash; while those match, the
+    cache is read instead of parsing the source again. A cache is written
+    as the source is parsed and only replaces the previous one once complete.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix not in LOADERS:
+        raise ValueError(f"no loader for {path!r} (known: {', '.join(sorted(LOADERS))})")
+    load = LOADERS[suffix]
+    source = os.path.abspath(path)
+    st = os.stat(source)
+    key = {'source': source, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+           'parser': parser_hash(load)}
+    cache_path = os.path.join(cache_dir, hashlib.sha256(source.encode('utf-8')).hexdigest()[:16] + '.jsonl')
+
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            if json.loads(f.readline()) == key:
+                for line in f:
+                    yield json.loads(line)
+                return
+    except (OSError, ValueError):
+        pass  # no cache yet, or unreadable: parse the source
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{cache_path}.{os.getpid()}.tmp'
+    complete = False
+    try:
+        with open(tmp, 'w', encoding='utf-8') as cache:
+            cache.write(json.dumps(key) + '\n')
+            for raw in load(path):
+                record = feature_record(raw)
+                if record is None:
+                    continue
+                cache.write(json.dumps(record, ensure_ascii=False) + '\n')
+                yield record
+        os.replace(tmp, cache_path)
+        complete = True
+    finally:
+        if not complete and os.path.exists(tmp):
+            os.remove(tmp)
+
 
-    header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-    header_font = Font(bold=True, color='FFFFFF', size=12)
+def load_features(sources, cache_dir=SOURCE_CACHE_DIRNAME):
+    """Records of every source in turn, one at a time."""
+    for path in sources:
+        yield from source_records(path, cache_dir)
 
+
+# ==============================================================================
+# Excel
+# ==============================================================================
+
+def feature_styles():
+    """Named styles: registered once per workbook, shared by every cell that uses them."""
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+    header = NamedStyle(
+        name='feature_header',
+        font=Font(bold=True, color='FFFFFF', size=12),
+        fill=PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+    )
+    body = NamedStyle(name='feature_body', alignment=Alignment(vertical='top', wrap_text=True))
+    return header, body
+
+
+def write_excel(df, path, stream=None):
+    """
+    Styled workbook with one sheet. Large tables (STREAM_ROWS or more, or
+    stream=True) go through write_excel_streaming instead of building every
+    cell in memory first.
+    """
+    if stream or (stream is None and len(df) >= STREAM_ROWS):
+        write_excel_streaming(df.itertuples(index=False), path, list(df.columns))
+        return
+
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Features'
+    header, body = feature_styles()
+    workbook.add_named_style(header)
+    workbook.add_named_style(body)
+
+    # Set column widths
+    for index, column in enumerate(df.columns, 1):
+        worksheet.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTHS[column]
+
+    worksheet.append(list(df.columns))
     for cell in worksheet[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell.style = header.name
+    worksheet.row_dimensions[1].height = 30
+
+    for row in df.itertuples(index=False):
+        worksheet.append(row)
+    # resolve the named style once, then share its style ids with every data cell
+    rows = worksheet.iter_rows(min_row=2)
+    first = next(rows, ())
+    for cell in first:
+        cell.style = body.name
+    if first:
+        body_style = first[0]._style
+        for row in rows:
+            for cell in row:
+                cell._style = copy(body_style)
+
+    workbook.save(path)
+
+
+def write_excel_streaming(rows, path, columns=COLUMNS):
+    """
+    Same workbook as write_excel, written row by row with a write-only sheet.
 
-    # Format data cells
-    for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-        for cell in row:
-            cell.alignment = Alignment(vertical='top', wrap_text=True)
+    `rows` is any iterable of value sequences in `columns` order (a generator
+    is fine), so memory stays flat however many rows there are: each row is
+    serialised as soon as it is appended. Widths and the header height must
+    be set before the first row, and every cell carries its own style.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
 
-    # Set row height for header
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Features')
+    header, body = feature_styles()
+    workbook.add_named_style(header)
+    workbook.add_named_style(body)
+
+    for index, column in enumerate(columns, 1):
+        worksheet.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTHS.get(column, 20)
     worksheet.row_dimensions[1].height = 30
 
-print(f"✅ Excel file created: {excel_filename}")
-print(f"📊 Total features documented: {len(df)}")
+    header_cells = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, column)
+        cell.style = header.name
+        header_cells.append(cell)
+    worksheet.append(header_cells)
 
-# Also create a markdown version
-markdown_filename = 'PARTNER_FEEDBACK_FEATURES.md'
-with open(markdown_filename, 'w') as f:
-    f.write("# Partner Feedback Features Table\n\n")
-    f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-    f.write(f"**Total Features**: {len(df)}\n\n")
-    f.write("## Summary by Prototype\n\n")
+    # one styled cell per column, refilled for every row: append() serialises
+    # the row straight away, so the cells are free again when it returns
+    body_cells = []
+    for _ in columns:
+        cell = WriteOnlyCell(worksheet)
+        cell.style = body.name
+        body_cells.append(cell)
+    for row in rows:
+        for cell, value in zip(body_cells, row):
+            cell.value = value
+        worksheet.append(body_cells)
 
-    # Count features by prototype
-    prototype_counts = df['Prototype'].value_counts()
-    for prototype, count in prototype_counts.items():
-        f.write(f"- **{prototype}**: {count} features\n")
+    workbook.save(path)
+
+
+# ==============================================================================
+# Markdown
+# ==============================================================================
 
-    f.write("\n---\n\n")
-    f.write("## Complete Feature Table\n\n")
+def markdown_table(df):
+    """
+    GitHub pipe table, laid out like DataFrame.to_markdown(index=False)
+    (numbers right-aligned, text left-aligned) without the per-cell overhead.
+    """
+    columns = []
+    for name in df.columns:
+        values = df[name].tolist()
+        numeric = all(isinstance(value, (int, float)) for value in values)
+        cells = [str(value) for value in values]
+        width = max([len(name) + 2] + [len(cell) for cell in cells])
+        pad = str.rjust if numeric else str.ljust
+        rule = '-' * (width + 1) + ':' if numeric else ':' + '-' * (width + 1)
+        columns.append((pad(name, width), rule, [pad(cell, width) for cell in cells]))
 
-    # Write markdown table
-    f.write(df.to_markdown(index=False))
+    lines = ['| ' + ' | '.join(header for header, _, _ in columns) + ' |',
+             '|' + '|'.join(rule for _, rule, _ in columns) + '|']
+    lines.extend('| ' + ' | '.join(row) + ' |' for row in zip(*(cells for _, _, cells in columns)))
+    return '\n'.join(lines)
+
+
+def render_markdown(report, generated):
+    df = report.df
+    parts = [
+        "# Partner Feedback Features Table\n\n",
+        f"**Generated**: {generated.strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+        f"**Total Features**: {len(df)}\n\n",
+        "## Summary by Prototype\n\n",
+    ]
+
+    # Count features by prototype
+    for prototype, count in report.counts():
+        parts.append(f"- **{prototype}**: {count} features\n")
 
-    f.write("\n\n---\n\n")
-    f.write("## Features by Prototype Category\n\n")
+    parts.append("\n---\n\n")
+    parts.append("## Complete Feature Table\n\n")
+    parts.append(markdown_table(df))
+
+    parts.append("\n\n---\n\n")
+    parts.append("## Features by Prototype Category\n\n")
 
     # Group by prototype
-    for prototype in df['Prototype'].unique():
-        f.write(f"### {prototype}\n\n")
-        prototype_df = df[df['Prototype'] == prototype][['#', 'Feature', 'Short Description', 'Suggested by']]
-        f.write(prototype_df.to_markdown(index=False))
-        f.write("\n\n")
-
-    f.write("---\n\n")
-    f.write("*This document was auto-generated from partner feedback analysis.*\n")
-    f.write("*Source: PARTNER_FEEDBACK_SUMMARY.md*\n")
-
-print(f"✅ Markdown file created: {markdown_filename}")
-
-# Print summary
-print("\n📋 Feature Breakdown:")
-for prototype, count in prototype_counts.items():
-    print(f"   {prototype}: {count} features")
-
-print("\n✨ Files created successfully!")
-print(f"   - {excel_filename}")
-print(f"   - {markdown_filename}")
+    for prototype in report.groups:
+        parts.append(f"### {prototype}\n\n")
+        parts.append(markdown_table(report.group(prototype, PROTOTYPE_COLUMNS)))
+        parts.append("\n\n")
+
+    parts.append("---\n\n")
+    parts.append("*This document was auto-generated from partner feedback analysis.*\n")
+    parts.append("*Source: PARTNER_FEEDBACK_SUMMARY.md*\n")
+    return ''.join(parts)
+
+
+def write_markdown(report, path):
+    write_text(path, render_markdown(report, datetime.now()))
+
+
+def write_prototype_files(report, path):
+    """Directory with one Markdown table per prototype, named after its slug."""
+    os.makedirs(path)
+    for prototype in report.groups:
+        text = (f"# {prototype}\n\n"
+                f"**Features**: {len(report.groups[prototype])}\n\n"
+                + markdown_table(report.group(prototype, COLUMNS_WITHOUT_PROTOTYPE)) + "\n")
+        write_text(os.path.join(path, f"{slug(prototype)}.md"), text)
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+# ==============================================================================
+# HTML and CSV
+# ==============================================================================
+
+HTML_STYLE = """\
+body { font-family: system-ui, sans-serif; margin: 2rem; color: #222; }
+table { border-collapse: collapse; margin-bottom: 2rem; }
+th { background: #366092; color: #fff; padding: .5rem; }
+td { padding: .4rem .5rem; vertical-align: top; border-bottom: 1px solid #ddd; }
+td.num { text-align: right; }"""
+
+
+def html_table(df):
+    rows = ['<tr>' + ''.join(f'<th>{escape(str(name))}</th>' for name in df.columns) + '</tr>']
+    numeric = [name == '#' for name in df.columns]
+    for values in df.itertuples(index=False):
+        rows.append('<tr>' + ''.join(
+            f'<td class="num">{value}</td>' if is_number else f'<td>{escape(str(value))}</td>'
+            for value, is_number in zip(values, numeric)) + '</tr>')
+    return '<table>\n' + '\n'.join(rows) + '\n</table>\n'
+
+
+def render_html(report, generated):
+    df = report.df
+    parts = [
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n',
+        '<title>Partner Feedback Features Table</title>\n',
+        f'<style>\n{HTML_STYLE}\n</style>\n</head>\n<body>\n',
+        '<h1>Partner Feedback Features Table</h1>\n',
+        f"<p><strong>Generated</strong>: {generated.strftime('%Y-%m-%d %H:%M:%S')}<br>\n",
+        f'<strong>Total Features</strong>: {len(df)}</p>\n',
+        '<h2>Summary by Prototype</h2>\n<ul>\n',
+    ]
+    for prototype, count in report.counts():
+        parts.append(f'<li><a href="#{slug(prototype)}">{escape(prototype)}</a>: {count} features</li>\n')
+    parts.append('</ul>\n<h2>Complete Feature Table</h2>\n')
+    parts.append(html_table(df))
+    parts.append('<h2>Features by Prototype Category</h2>\n')
+    for prototype in report.groups:
+        parts.append(f'<h3 id="{slug(prototype)}">{escape(prototype)}</h3>\n')
+        parts.append(html_table(report.group(prototype, PROTOTYPE_COLUMNS)))
+    parts.append('<p><em>Source: PARTNER_FEEDBACK_SUMMARY.md</em></p>\n</body>\n</html>\n')
+    return ''.join(parts)
+
+
+def write_html(report, path):
+    write_text(path, render_html(report, datetime.now()))
+
+
+def write_csv(report, path):
+    report.df.to_csv(path, index=False, encoding='utf-8')
+
+
+# ==============================================================================
+# Report pipeline
+# ==============================================================================
+
+PROTOTYPE_COLUMNS = ['#', 'Feature', 'Short Description', 'Suggested by']
+COLUMNS_WITHOUT_PROTOTYPE = [column for column in COLUMNS if column != 'Prototype']
+
+
+class Report(NamedTuple):
+    """
+    The table and its rows per prototype, grouped once for every output.
+    `groups` maps prototype -> row positions, in order of first appearance.
+    """
+    df: pd.DataFrame
+    groups: dict
+    stream: Optional[bool] = None
+
+    @classmethod
+    def from_table(cls, df, stream=None):
+        groups = {}
+        for position, prototype in enumerate(df['Prototype'].tolist()):
+            groups.setdefault(prototype, []).append(position)
+        return cls(df, groups, stream)
+
+    def counts(self):
+        """(prototype, features), largest first; ties keep their order of appearance."""
+        return sorted(((prototype, len(rows)) for prototype, rows in self.groups.items()),
+                      key=lambda item: -item[1])
+
+    def group(self, prototype, columns=COLUMNS):
+        return self.df[columns].take(self.groups[prototype])
+
+
+def write_excel_report(report, path):
+    write_excel(report.df, path, report.stream)
+
+
+# code and constants behind report.groups, counts() and group(), which the grouped outputs use
+REPORT_CODE = (Report.from_table, Report.counts, Report.group)
+
+# format -> (output file or directory, label, writer, code and constants whose changes must trigger a rebuild)
+OUTPUTS = {
+    'xlsx': (EXCEL_FILENAME, 'Excel', write_excel_report,
+             (write_excel_report, write_excel, write_excel_streaming, feature_styles)),
+    'md': (MARKDOWN_FILENAME, 'Markdown', write_markdown,
+           (write_markdown, render_markdown, markdown_table, write_text, *REPORT_CODE, PROTOTYPE_COLUMNS)),
+    'html': ('PARTNER_FEEDBACK_FEATURES.html', 'HTML', write_html,
+             (write_html, render_html, html_table, slug, write_text, *REPORT_CODE, PROTOTYPE_COLUMNS,
+              HTML_STYLE)),
+    'csv': ('PARTNER_FEEDBACK_FEATURES.csv', 'CSV', write_csv, (write_csv,)),
+    'prototypes': ('PARTNER_FEEDBACK_FEATURES_BY_PROTOTYPE', 'Per-prototype', write_prototype_files,
+                   (write_prototype_files, markdown_table, slug, write_text, *REPORT_CODE,
+                    COLUMNS_WITHOUT_PROTOTYPE)),
+}
+DEFAULT_FORMATS = ('xlsx', 'md')
+
+
+def file_hash(path):
+    """SHA-256 of a file, or of the names and contents of the files in a directory."""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            digest.update(f'{name}\0{file_hash(os.path.join(path, name))}\0'.encode('utf-8'))
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_hash(df):
+    """
+    Hash of the table contents and the column layout, shared by every output's
+    fingerprint. Rows are hashed one at a time, so no copy of the table is made.
+    """
+    digest = hashlib.sha256(json.dumps([list(df.columns), COLUMN_WIDTHS]).encode('utf-8'))
+    for row in df.itertuples(index=False, name=None):
+        digest.update(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def fingerprint(table, code):
+    """Hash of the table hash and the rendering code (functions by source, constants as JSON)."""
+    digest = hashlib.sha256(table.encode('ascii'))
+    for item in code:
+        source = inspect.getsource(item) if callable(item) else json.dumps(item, ensure_ascii=False)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def replace(tmp, path):
+    """os.replace that also works for directories (an existing one cannot be renamed over)."""
+    if os.path.isdir(tmp) and os.path.exists(path):
+        old = f'{path}.old'
+        remove(old)
+        os.replace(path, old)
+        os.replace(tmp, path)
+        remove(old)
+    else:
+        os.replace(tmp, path)
+
+
+_report = None  # the Report being rendered, in pool workers
+
+
+def _init_worker(report):
+    global _report
+    _report = report
+
+
+def _render(name, path, report=None):
+    """Write format `name` to `path`; returns the seconds it took."""
+    start = time.perf_counter()
+    OUTPUTS[name][2](report or _report, path)
+    return time.perf_counter() - start
+
+
+def build(df, outdir='.', force=False, stream=None, formats=DEFAULT_FORMATS, jobs=None, timings=None):
+    """
+    Write every output in `formats` whose inputs changed; returns
+    {filename: 'written' | 'unchanged'}.
+
+    The table is grouped by prototype once and shared by all outputs. Stale
+    outputs are rendered in a process pool of `jobs` workers (default: one per
+    CPU; with one worker or one output they are rendered in this process).
+    `stream` forces (True) or disables (False) streaming Excel output; None
+    decides by size. Seconds per stage are added to `timings` if given.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    report = Report.from_table(df, stream)
+    timings['group'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manifest_path = os.path.join(outdir, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_path)
+    table = table_hash(df)
+    results, pending = {}, {}
+    for name in formats:
+        filename, _, _, code = OUTPUTS[name]
+        path = os.path.join(outdir, filename)
+        key = fingerprint(table, code)
+        recorded = manifest.get(filename, {})
+        if (not force and recorded.get('inputs') == key and os.path.exists(path)
+                and file_hash(path) == recorded.get('output')):
+            results[filename] = 'unchanged'
+        else:
+            pending[name] = key
+    timings['check'] = time.perf_counter() - start
+
+    jobs = min(jobs or os.cpu_count() or 1, len(pending))
+    tmp_paths = {name: os.path.join(outdir, f'{OUTPUTS[name][0]}.tmp') for name in pending}
+    for tmp in tmp_paths.values():
+        remove(tmp)
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(report,)) as pool:
+            futures = {name: pool.submit(_render, name, tmp_paths[name]) for name in pending}
+            for name, future in futures.items():
+                timings[f'render {name}'] = future.result()
+    else:
+        for name in pending:
+            timings[f'render {name}'] = _render(name, tmp_paths[name], report)
+
+    start = time.perf_counter()
+    for name, key in pending.items():
+        filename = OUTPUTS[name][0]
+        path = os.path.join(outdir, filename)
+        replace(tmp_paths[name], path)
+        manifest[filename] = {'inputs': key, 'output': file_hash(path)}
+        results[filename] = 'written'
+
+    if pending:
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+            f.write('\n')
+    timings['commit'] = time.perf_counter() - start
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the partner feedback feature table")
+    parser.add_argument('--force', action='store_true', help="rewrite outputs even if unchanged")
+    parser.add_argument('--outdir', default='.', help="directory for the output files")
+    parser.add_argument('--source', action='append', metavar='PATH',
+                        help=f"read features from a {'/'.join(sorted(LOADERS))} file instead of the built-in "
+                             "list (repeatable)")
+    parser.add_argument('--stream', action='store_true',
+                        help=f"write the Excel file in streaming mode (automatic from {STREAM_ROWS:,} rows)")
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS),
+                        help=f"comma-separated outputs to build, or 'all' ({', '.join(OUTPUTS)})")
+    parser.add_argument('--jobs', type=int, help="worker processes for rendering (default: one per CPU)")
+    parser.add_argument('--timings', action='store_true', help="print the seconds spent per stage")
+    args = parser.parse_args(argv)
+
+    formats = list(OUTPUTS) if args.formats == 'all' else [name.strip() for name in args.formats.split(',')]
+    unknown = [name for name in formats if name not in OUTPUTS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)} (choose from {', '.join(OUTPUTS)})")
+
+    start = time.perf_counter()
+    timings = {}
+    if args.source:
+        df = build_table(load_features(args.source, os.path.join(args.outdir, SOURCE_CACHE_DIRNAME)))
+    else:
+        df = build_table(features)
+    timings['load'] = time.perf_counter() - start
+    results = build(df, args.outdir, args.force, stream=True if args.stream else None,
+                    formats=formats, jobs=args.jobs, timings=timings)
+    elapsed = time.perf_counter() - start
+
+    labels = {filename: label for filename, label, _, _ in OUTPUTS.values()}
+    for filename, result in results.items():
+        if result == 'written':
+            print(f"✅ {labels[filename]} file created: {filename}")
+        else:
+            print(f"⏭️  {labels[filename]} file unchanged: {filename}")
+    print(f"📊 Total features documented: {len(df)}")
+
+    # Print summary
+    print("\n📋 Feature Breakdown:")
+    for prototype, count in Report.from_table(df).counts():
+        print(f"   {prototype}: {count} features")
+
+    if args.timings:
+        print("\n⏱️  Stage timings:")
+        for stage, seconds in timings.items():
+            print(f"   {stage:<18} {seconds * 1000:>9.1f} ms")
+    print(f"\n✨ Done in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
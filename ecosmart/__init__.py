@@ -0,0 +1,25 @@
+"""
+EcoSmart: Python backend for the Sustainable AI prototypes.
+
+The calculation engine mirrors prototypes/ecoprompt-coach/core-engine.js so that
+batch reports and the browser extension agree on every number.
+"""
+
+from .core_engine import (
+    ENERGY_BASELINES_GPT4O,
+    ENVIRONMENTAL_CONSTANTS,
+    GRID_PROFILES,
+    OUTPUT_RATIOS,
+    OUTPUT_TYPES,
+    PHYSICS_CONSTANTS,
+    calculate_carbon,
+    calculate_eco_score,
+    calculate_energy,
+    calculate_environmental_impact,
+    calculate_impact_batch,
+    calculate_water,
+    compare_prompts,
+    estimate_output_tokens,
+    estimate_tokens,
+    estimate_tokens_batch,
+)
@@ -0,0 +1,340 @@
+"""
+Incremental time-bucketed aggregate store for dashboard and mirror trends
+
+Keeps per-department counters for minute, hour, day and week buckets in
+fixed-size ring buffers. Each slot holds the *cumulative* total up to the end
+of its bucket, so any trailing window is one subtraction:
+
+    window(k buckets ending at b) = cum[b] - cum[b - k]
+
+which makes window and trend-delta queries O(1) regardless of window length.
+Adding an event touches one slot per resolution (more only for late events
+or after an idle gap).
+
+The arrays live in a memory-mapped file: reopening the store after a restart
+maps the file and is ready in milliseconds, with no reprocessing of logs.
+"""
+
+import json
+import os
+
+import numpy as np
+
+# name, bucket length in seconds, number of buckets kept
+RESOLUTIONS = (
+    ('minute', 60, 1440),           # 24 hours
+    ('hour', 3600, 24 * 35),        # 5 weeks
+    ('day', 86400, 400),            # 13 months
+    ('week', 7 * 86400, 106),       # 2 years
+)
+# Unix epoch was a Thursday; shift so week buckets start on Monday
+WEEK_OFFSET = 3 * 86400
+
+MAGIC = 'ecosmart-aggregates'
+VERSION = 1
+HEADER_BYTES = 16384
+DEPARTMENT_CAPACITY = 32
+TOOL_CAPACITY = 32
+
+
+class AggregateStore:
+    """
+    Ring-buffered cumulative counters per (department, bucket, metric).
+
+    `metrics` are additive per-event values (prompt counts, tokens, energy...);
+    in addition every registered tool gets a usage-count column, so distinct
+    tools in a window can be counted too. With `path=None` the arrays are kept
+    in memory only.
+    """
+
+    def __init__(self, metrics, path=None, department_capacity=DEPARTMENT_CAPACITY,
+                 tool_capacity=TOOL_CAPACITY, resolutions=RESOLUTIONS):
+        self.path = path
+        if path and os.path.exists(path) and os.path.getsize(path) > 0:
+            self._open(path, metrics)
+        else:
+            self._create(path, metrics, department_capacity, tool_capacity, resolutions)
+
+    # --------------------------------------------------------------------------
+    # File layout: JSON header | int64 state | float64 cumulative ring per resolution
+    # --------------------------------------------------------------------------
+
+    def _create(self, path, metrics, department_capacity, tool_capacity, resolutions):
+        self.header = {
+            'magic': MAGIC,
+            'version': VERSION,
+            'metrics': list(metrics),
+            'resolutions': [list(r) for r in resolutions],
+            'department_capacity': department_capacity,
+            'tool_capacity': tool_capacity,
+            'departments': [],      # [key, display name]
+            'tools': [],
+        }
+        size = HEADER_BYTES + self._state_bytes() + self._ring_bytes()
+        if path:
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            self._buffer = np.memmap(path, dtype=np.uint8, mode='r+', shape=(size,))
+        else:
+            self._buffer = np.zeros(size, dtype=np.uint8)
+        self._map_arrays()
+        self._state[:] = -1
+        self._state[:2] = 0         # events, latest timestamp
+        self._write_header()
+
+    def _open(self, path, metrics):
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r+')
+        raw = bytes(self._buffer[:HEADER_BYTES]).rstrip(b'\0')
+        self.header = json.loads(raw)
+        if self.header.get('magic') != MAGIC or self.header.get('version') != VERSION:
+            raise ValueError(f"{path} is not an aggregate store (version {VERSION})")
+        if self.header['metrics'] != list(metrics):
+            raise ValueError(f"{path} was created with metrics {self.header['metrics']}")
+        self._map_arrays()
+
+    def _state_bytes(self):
+        return 8 * (2 + 2 * len(self.header['resolutions']))
+
+    def _ring_bytes(self):
+        return sum(8 * self._ring_shape(slots)[0] * slots * self._ring_shape(slots)[2]
+                   for _, _, slots in self.header['resolutions'])
+
+    def _ring_shape(self, slots):
+        width = len(self.header['metrics']) + self.header['tool_capacity']
+        return self.header['department_capacity'], slots, width
+
+    def _map_arrays(self):
+        offset = HEADER_BYTES
+        self._state = np.ndarray((self._state_bytes() // 8,), dtype=np.int64, buffer=self._buffer, offset=offset)
+        offset += self._state_bytes()
+        self._rings = {}
+        self._seconds = {}
+        for index, (name, seconds, slots) in enumerate(self.header['resolutions']):
+            shape = self._ring_shape(slots)
+            self._rings[name] = np.ndarray(shape, dtype=np.float64, buffer=self._buffer, offset=offset)
+            self._seconds[name] = (index, seconds, slots)
+            offset += 8 * shape[0] * shape[1] * shape[2]
+        self.metrics = tuple(self.header['metrics'])
+        self._departments = {key: i for i, (key, _) in enumerate(self.header['departments'])}
+        self._tools = {tool: i for i, tool in enumerate(self.header['tools'])}
+
+    def _write_header(self):
+        raw = json.dumps(self.header, ensure_ascii=False).encode('utf-8')
+        if len(raw) > HEADER_BYTES:
+            raise ValueError("aggregate store header is full (too many departments/tools)")
+        self._buffer[:HEADER_BYTES] = 0
+        self._buffer[:len(raw)] = np.frombuffer(raw, dtype=np.uint8)
+
+    def flush(self):
+        """Write dirty pages to disk (no-op for in-memory stores)."""
+        if isinstance(self._buffer, np.memmap):
+            self._buffer.flush()
+
+    def close(self):
+        self.flush()
+        self._buffer = self._state = self._rings = None
+
+    # --------------------------------------------------------------------------
+    # Registration
+    # --------------------------------------------------------------------------
+
+    @property
+    def departments(self):
+        return [key for key, _ in self.header['departments']]
+
+    @property
+    def events(self):
+        return int(self._state[0])
+
+    @property
+    def latest(self):
+        """Newest event time seen, as Unix seconds (None before the first event)."""
+        return int(self._state[1]) if self.events else None
+
+    def department_name(self, key):
+        return dict(self.header['departments'])[key]
+
+    def department_code(self, key, name=None):
+        """Index of `key`, registering it (with display `name`) on first use."""
+        code = self._departments.get(key)
+        if code is None:
+            if len(self._departments) >= self.header['department_capacity']:
+                raise ValueError(f"aggregate store is full ({self.header['department_capacity']} departments)")
+            code = len(self._departments)
+            self.header['departments'].append([key, name or key])
+            self._departments[key] = code
+            self._write_header()
+        return code
+
+    def tool_column(self, tool):
+        """Ring column counting prompts sent to `tool`, registering it on first use."""
+        index = self._tools.get(tool)
+        if index is None:
+            if len(self._tools) >= self.header['tool_capacity']:
+                return None  # beyond capacity tools are not counted for diversity
+            index = len(self._tools)
+            self.header['tools'].append(tool)
+            self._tools[tool] = index
+            self._write_header()
+        return len(self.metrics) + index
+
+    # --------------------------------------------------------------------------
+    # Updates
+    # --------------------------------------------------------------------------
+
+    def add(self, department_codes, timestamps, values, tool_columns=None):
+        """
+        Add a batch of events.
+
+        department_codes: int array (from department_code)
+        timestamps:       Unix seconds, int array
+        values:           float array [events, len(metrics)]
+        tool_columns:     optional int array (from tool_column, -1 for none)
+        """
+        department_codes = np.asarray(department_codes, dtype=np.intp)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if not len(timestamps):
+            return
+        width = len(self.metrics) + self.header['tool_capacity']
+        rows = np.zeros((len(timestamps), width))
+        rows[:, :len(self.metrics)] = values
+        if tool_columns is not None:
+            tool_columns = np.asarray(tool_columns, dtype=np.intp)
+            has_tool = tool_columns >= 0
+            rows[np.nonzero(has_tool)[0], tool_columns[has_tool]] = 1.0
+
+        capacity = self.header['department_capacity']
+        for name in self._seconds:
+            # one summed row per (bucket, department) present in the batch
+            keys = self._bucket(timestamps, name) * capacity + department_codes
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            sums = np.add.reduceat(rows[order], starts, axis=0)
+            buckets, codes = np.divmod(keys[starts], capacity)
+            head, _ = self._head(name)
+            if head < 0 or buckets[0] > head:
+                self._append_buckets(name, buckets, codes, sums)
+                continue
+            # late events: bucket by bucket, within the sorted (bucket, department) pairs
+            edges = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1], True])
+            for lo, hi in zip(edges[:-1].tolist(), edges[1:].tolist()):
+                self._add_bucket(name, int(buckets[lo]), codes[lo:hi], sums[lo:hi])
+
+        self._state[0] += len(timestamps)
+        self._state[1] = max(int(self._state[1]), int(timestamps.max()))
+
+    def _bucket(self, timestamps, resolution):
+        seconds = self._seconds[resolution][1]
+        if resolution == 'week':
+            return (timestamps + WEEK_OFFSET) // seconds
+        return timestamps // seconds
+
+    def _head(self, resolution):
+        index = self._seconds[resolution][0]
+        return int(self._state[2 + 2 * index]), int(self._state[3 + 2 * index])
+
+    def _set_head(self, resolution, head, first):
+        index = self._seconds[resolution][0]
+        self._state[2 + 2 * index] = head
+        self._state[3 + 2 * index] = first
+
+    def _append_buckets(self, resolution, buckets, codes, sums):
+        """Fast path for batches entirely after the head: one cumulative sum over the new buckets."""
+        ring = self._rings[resolution]
+        capacity, slots, width = ring.shape
+        head, first = self._head(resolution)
+        last = int(buckets[-1])
+        lo = max(int(buckets[0]), last - slots + 1)
+        running = np.zeros((capacity, width)) if head < 0 else ring[:, head % slots].copy()
+        if head >= 0:
+            # idle buckets between the head and the batch still hold an earlier lap: they are the running total
+            ring[:, np.arange(max(head + 1, last - slots + 1), lo) % slots] = running[:, None, :]
+        # events in buckets that are already outside the ring only count towards the running total
+        deltas = np.zeros((capacity, last - lo + 1, width))
+        np.add.at(deltas, (codes, np.maximum(buckets - lo, 0)), sums)
+        ring[:, np.arange(lo, last + 1) % slots] = running[:, None, :] + np.cumsum(deltas, axis=1)
+        self._set_head(resolution, last, int(buckets[0]) if head < 0 else min(first, int(buckets[0])))
+
+    def _add_bucket(self, resolution, bucket, codes, delta):
+        """Add `delta` [len(codes), width] to `bucket`, keeping every later slot cumulative."""
+        ring = self._rings[resolution]
+        slots = ring.shape[1]
+        head, first = self._head(resolution)
+        if head < 0:
+            head = first = bucket
+            ring[:, bucket % slots] = 0
+        elif bucket > head:
+            # open the new bucket(s): they start at the running total
+            running = ring[:, head % slots].copy()
+            opened = np.arange(max(head + 1, bucket - slots + 1), bucket + 1) % slots
+            ring[:, opened] = running[:, None, :]
+            head = bucket
+        # every bucket from `bucket` up to the head includes this delta; slots
+        # older than the ring are gone, and buckets before `first` were zero
+        start = max(bucket, head - slots + 1)
+        ring[np.ix_(codes, np.arange(start, head + 1) % slots)] += delta[:, None, :]
+        self._set_head(resolution, head, min(first, bucket))
+
+    # --------------------------------------------------------------------------
+    # Queries (all O(1) in the window length except series)
+    # --------------------------------------------------------------------------
+
+    def current_bucket(self, resolution, now=None):
+        """Bucket number containing `now` (Unix seconds; default: the newest event)."""
+        if now is None:
+            now = self.latest or 0
+        return int(self._bucket(np.int64(now), resolution))
+
+    def _cumulative(self, code, resolution, bucket):
+        ring = self._rings[resolution]
+        slots = ring.shape[1]
+        head, first = self._head(resolution)
+        if head < 0 or bucket < first:
+            return np.zeros(ring.shape[2])
+        if bucket >= head:
+            return ring[code, head % slots]
+        if bucket <= head - slots:
+            raise ValueError(f"bucket {bucket} is older than the {resolution} ring ({slots} buckets)")
+        return ring[code, bucket % slots]
+
+    def _codes(self, department):
+        """Codes of a department key, or of a list of keys (unknown keys are skipped)."""
+        keys = (department,) if isinstance(department, str) else department
+        return [self._departments[key] for key in keys if key in self._departments]
+
+    def window(self, department, resolution, buckets, end=None):
+        """
+        {metric: total} over the `buckets` buckets ending with bucket `end`
+        (inclusive, default: the current bucket), plus 'tools': distinct tools used.
+        `department` may be a list of keys, whose totals are combined.
+        """
+        totals = np.zeros(self._rings[resolution].shape[2])
+        if end is None:
+            end = self.current_bucket(resolution)
+        for code in self._codes(department):
+            totals += self._cumulative(code, resolution, end) - self._cumulative(code, resolution, end - buckets)
+        return self._as_dict(totals)
+
+    def trend(self, department, resolution, buckets, end=None):
+        """{metric: change} of the trailing window against the window before it."""
+        if end is None:
+            end = self.current_bucket(resolution)
+        current = self.window(department, resolution, buckets, end)
+        previous = self.window(department, resolution, buckets, end - buckets)
+        return {key: current[key] - previous[key] for key in current}
+
+    def series(self, department, resolution, buckets, end=None):
+        """[buckets, width] array of per-bucket totals, oldest first (for charts); see window()."""
+        if end is None:
+            end = self.current_bucket(resolution)
+        series = np.zeros((buckets, self._rings[resolution].shape[2]))
+        for code in self._codes(department):
+            cumulative = np.array([self._cumulative(code, resolution, b) for b in range(end - buckets, end + 1)])
+            series += np.diff(cumulative, axis=0)
+        return series
+
+    def _as_dict(self, totals):
+        result = {metric: float(totals[i]) for i, metric in enumerate(self.metrics)}
+        result['tools'] = int(np.count_nonzero(totals[len(self.metrics):len(self.metrics) + len(self._tools)] > 0))
+        return result
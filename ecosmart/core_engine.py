@@ -0,0 +1,397 @@
+"""
+Eco-Smart Core Calculation Engine (Python port)
+Mirrors prototypes/ecoprompt-coach/core-engine.js formula for formula, so the
+numbers in nightly reports match what the extension shows for one prompt.
+
+Every calculation function accepts either scalars or NumPy arrays; with
+arrays the whole batch is computed with vectorized operations.
+"""
+
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+# ==============================================================================
+# SECTION 1: Research-Based Constants and Coefficients
+# ==============================================================================
+
+# Environmental multipliers from research paper (Table 1, Page 4)
+ENVIRONMENTAL_CONSTANTS = {
+    'AZURE_OPENAI': {
+        'name': 'Azure/OpenAI (Default)',
+        'PUE': 1.12,            # Power Usage Effectiveness
+        'WUE_SITE': 0.30,       # Water Usage Effectiveness (on-site cooling) L/kWh
+        'WUE_SOURCE': 3.142,    # Water Usage Effectiveness (off-site electricity) L/kWh
+        'CIF': 0.3528,          # Carbon Intensity Factor kgCO2e/kWh
+        'region': 'US',
+    },
+    'AWS_ANTHROPIC': {
+        'name': 'AWS/Anthropic',
+        'PUE': 1.14,
+        'WUE_SITE': 0.18,
+        'WUE_SOURCE': 3.142,
+        'CIF': 0.385,
+        'region': 'US',
+    },
+    'DEEPSEEK_CHINA': {
+        'name': 'DeepSeek (China)',
+        'PUE': 1.27,
+        'WUE_SITE': 1.20,
+        'WUE_SOURCE': 6.016,
+        'CIF': 0.6,
+        'region': 'CN',
+    },
+}
+DEFAULT_GRID_PROFILE = 'AZURE_OPENAI'
+
+# Energy consumption baselines from research (Table 4, Page 8), GPT-4o (March 2025)
+ENERGY_BASELINES_GPT4O = {
+    'SHORT': {'inputTokens': 100, 'outputTokens': 300, 'totalTokens': 400, 'energyWh': 0.421, 'stdDev': 0.127},
+    'MEDIUM': {'inputTokens': 1000, 'outputTokens': 1000, 'totalTokens': 2000, 'energyWh': 1.214, 'stdDev': 0.391},
+    'LONG': {'inputTokens': 10000, 'outputTokens': 1500, 'totalTokens': 11500, 'energyWh': 1.788, 'stdDev': 0.363},
+}
+
+# Physics constants for real-world conversions
+PHYSICS_CONSTANTS = {
+    'KWH_TO_MJ': 3.6,                    # 1 kWh = 3.6 megajoules
+    'KWH_TO_WH': 1000,                   # 1 kWh = 1000 Wh
+    'LED_BULB_WATTS': 10,                # Typical LED bulb
+    'SMARTPHONE_CHARGE_WH': 15,          # iPhone ~15Wh battery
+    'LAPTOP_CHARGE_WH': 60,              # Typical laptop battery
+    'COFFEE_MAKER_WATTS': 1000,          # Coffee maker power
+    'COFFEE_BOIL_TIME_MINUTES': 5,       # Time to boil water for coffee
+    'TV_65_INCH_WATTS': 130,             # 65" LED TV
+    'LITERS_PER_GALLON': 3.785,          # US gallon
+    'CUPS_OF_COFFEE_ML': 237,            # 1 cup = 8 oz = 237ml
+    'CO2_CAR_PER_KM': 0.192,             # kg CO2 per km (gasoline car)
+    'CO2_TREE_ABSORPTION_KG_YEAR': 21,   # Average tree absorbs 21kg CO2/year
+}
+
+# Output/input token ratios used by estimateOutputTokens
+OUTPUT_RATIOS = {
+    'general': 1.5,     # General queries typically get ~1.5x response
+    'code': 2.0,        # Code generation produces more output
+    'creative': 3.0,    # Creative writing produces longer output
+    'brief': 0.5,       # Brief answers are shorter
+    'analysis': 2.5,    # Analysis produces detailed output
+}
+
+# Grid profiles as parallel arrays, indexed by GRID_PROFILE_CODES[name]
+GRID_PROFILES = tuple(ENVIRONMENTAL_CONSTANTS)
+GRID_PROFILE_CODES = {name: code for code, name in enumerate(GRID_PROFILES)}
+_PUE = np.array([ENVIRONMENTAL_CONSTANTS[p]['PUE'] for p in GRID_PROFILES])
+_WUE_SITE = np.array([ENVIRONMENTAL_CONSTANTS[p]['WUE_SITE'] for p in GRID_PROFILES])
+_WUE_SOURCE = np.array([ENVIRONMENTAL_CONSTANTS[p]['WUE_SOURCE'] for p in GRID_PROFILES])
+_CIF = np.array([ENVIRONMENTAL_CONSTANTS[p]['CIF'] for p in GRID_PROFILES])
+
+OUTPUT_TYPES = tuple(OUTPUT_RATIOS)
+OUTPUT_TYPE_CODES = {name: code for code, name in enumerate(OUTPUT_TYPES)}
+_RATIOS = np.array([OUTPUT_RATIOS[t] for t in OUTPUT_TYPES])
+
+
+def _scalar_or_array(value, like):
+    """Return a Python float/int when every input was a scalar, the array otherwise."""
+    if all(np.ndim(x) == 0 for x in like):
+        return np.asarray(value).item()
+    return value
+
+
+def js_round(x):
+    """Math.round: halves round up (towards +infinity), unlike np.round."""
+    return np.floor(np.asarray(x, dtype=np.float64) + 0.5)
+
+
+def grid_profile_codes(grid_profile):
+    """
+    Integer profile codes for a profile name, a sequence of names, or codes.
+
+    Unknown names fall back to AZURE_OPENAI, like the JS engine.
+    """
+    if isinstance(grid_profile, str):
+        return np.intp(GRID_PROFILE_CODES.get(grid_profile, 0))
+    values = np.asarray(grid_profile)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.intp)
+    lookup = np.vectorize(lambda name: GRID_PROFILE_CODES.get(name, 0), otypes=[np.intp])
+    return lookup(values)
+
+
+def output_type_codes(output_type):
+    """Integer output-type codes; unknown types count as 'general'."""
+    if isinstance(output_type, str):
+        return np.intp(OUTPUT_TYPE_CODES.get(output_type, 0))
+    values = np.asarray(output_type)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.intp)
+    lookup = np.vectorize(lambda name: OUTPUT_TYPE_CODES.get(name, 0), otypes=[np.intp])
+    return lookup(values)
+
+
+# ==============================================================================
+# SECTION 2: Core Calculation Functions (Based on Research Formulas)
+# ==============================================================================
+
+_SHORT = ENERGY_BASELINES_GPT4O['SHORT']
+_MEDIUM = ENERGY_BASELINES_GPT4O['MEDIUM']
+_LONG = ENERGY_BASELINES_GPT4O['LONG']
+
+
+def calculate_energy(input_tokens, output_tokens):
+    """
+    Energy in Wh, interpolated linearly between the Table 4 benchmarks.
+
+    Below SHORT the line runs from 0; beyond LONG it is extrapolated with the
+    MEDIUM-LONG slope. Each segment uses the same expression as the JS engine,
+    so results are bit-for-bit identical.
+    """
+    total = np.asarray(input_tokens, dtype=np.float64) + np.asarray(output_tokens, dtype=np.float64)
+    x0, y0 = _SHORT['totalTokens'], _SHORT['energyWh']
+    x1, y1 = _MEDIUM['totalTokens'], _MEDIUM['energyWh']
+    x2, y2 = _LONG['totalTokens'], _LONG['energyWh']
+
+    energy = np.empty_like(total)
+    below = total <= x0
+    short_medium = ~below & (total <= x1)
+    medium_long = ~below & ~short_medium & (total <= x2)
+    beyond = ~(below | short_medium | medium_long)
+
+    energy[below] = (total[below] / x0) * y0
+    energy[short_medium] = linear_interpolate(x0, y0, x1, y1, total[short_medium])
+    energy[medium_long] = linear_interpolate(x1, y1, x2, y2, total[medium_long])
+    rate = (y2 - y1) / (x2 - x1)
+    energy[beyond] = y2 + (total[beyond] - x2) * rate
+    return _scalar_or_array(energy, (input_tokens, output_tokens))
+
+
+def linear_interpolate(x1, y1, x2, y2, x):
+    """Linear interpolation helper"""
+    return y1 + (y2 - y1) * (x - x1) / (x2 - x1)
+
+
+def calculate_water(energy_wh, grid_profile=DEFAULT_GRID_PROFILE):
+    """
+    Water consumption in liters, Equation (3), Page 7:
+    Water (L) = (E_query / PUE) × WUE_site + E_query × WUE_source
+    """
+    codes = grid_profile_codes(grid_profile)
+    energy_kwh = np.asarray(energy_wh, dtype=np.float64) / PHYSICS_CONSTANTS['KWH_TO_WH']
+    on_site = (energy_kwh / _PUE[codes]) * _WUE_SITE[codes]   # on-site cooling water (evaporated)
+    off_site = energy_kwh * _WUE_SOURCE[codes]                 # off-site electricity generation water
+    return _scalar_or_array(on_site + off_site, (energy_wh, codes))
+
+
+def calculate_carbon(energy_wh, grid_profile=DEFAULT_GRID_PROFILE):
+    """
+    Carbon emissions in kg CO2e, Equation (4), Page 7:
+    Carbon (kgCO2e) = E_query × CIF
+    """
+    codes = grid_profile_codes(grid_profile)
+    energy_kwh = np.asarray(energy_wh, dtype=np.float64) / PHYSICS_CONSTANTS['KWH_TO_WH']
+    return _scalar_or_array(energy_kwh * _CIF[codes], (energy_wh, codes))
+
+
+# ==============================================================================
+# SECTION 3: Token Estimation (Approximation)
+# ==============================================================================
+
+def estimate_tokens(text):
+    """
+    Estimated token count: ~4 characters per token (OpenAI standard).
+
+    Length is counted in UTF-16 code units, as JavaScript's String.length does.
+    """
+    if not text or not text.strip():
+        return 0
+    return -(-(len(text.encode('utf-16-le')) // 2) // 4)
+
+
+def estimate_tokens_batch(texts):
+    """estimate_tokens for an iterable of texts, as an int64 array."""
+    return np.fromiter((estimate_tokens(text) for text in texts), dtype=np.int64)
+
+
+def estimate_output_tokens(input_tokens, output_type='general'):
+    """Output tokens from the conservative per-type response ratios."""
+    ratio = _RATIOS[output_type_codes(output_type)]
+    result = js_round(np.asarray(input_tokens, dtype=np.float64) * ratio).astype(np.int64)
+    return _scalar_or_array(result, (input_tokens, ratio))
+
+
+# ==============================================================================
+# SECTION 4: Real-World Analogies (Accurate Physics Conversions)
+# ==============================================================================
+
+def to_fixed(value, digits):
+    """Number.prototype.toFixed: exact binary value, ties rounded up."""
+    quantum = Decimal(1).scaleb(-digits)
+    return str(Decimal(float(value)).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def get_energy_analogies(energy_wh):
+    """Convert energy to relatable real-world equivalents"""
+    p = PHYSICS_CONSTANTS
+    return {
+        'ledHours': to_fixed(energy_wh / p['LED_BULB_WATTS'], 2),
+        'smartphoneCharges': to_fixed(energy_wh / p['SMARTPHONE_CHARGE_WH'], 2),
+        'laptopCharges': to_fixed(energy_wh / p['LAPTOP_CHARGE_WH'], 2),
+        'cupsOfCoffee': to_fixed(energy_wh / (p['COFFEE_MAKER_WATTS'] * p['COFFEE_BOIL_TIME_MINUTES'] / 60), 2),
+        'tvHours': to_fixed(energy_wh / p['TV_65_INCH_WATTS'], 2),
+        'googleSearches': to_fixed(energy_wh / 0.3, 1),
+    }
+
+
+def get_water_analogies(water_liters):
+    """Convert water to relatable real-world equivalents"""
+    p = PHYSICS_CONSTANTS
+    return {
+        'cupsOfCoffee': to_fixed(water_liters * 1000 / p['CUPS_OF_COFFEE_ML'], 2),
+        'waterBottles': to_fixed(water_liters * 2, 2),
+        'gallons': to_fixed(water_liters / p['LITERS_PER_GALLON'], 3),
+        'daysOfDrinking': to_fixed(water_liters / 2, 3),
+    }
+
+
+def get_carbon_analogies(carbon_kg):
+    """Convert carbon to relatable real-world equivalents"""
+    p = PHYSICS_CONSTANTS
+    return {
+        'drivingKm': to_fixed(carbon_kg / p['CO2_CAR_PER_KM'], 2),
+        'drivingMiles': to_fixed(carbon_kg / p['CO2_CAR_PER_KM'] * 0.621371, 2),
+        'treesPerYear': to_fixed(carbon_kg / p['CO2_TREE_ABSORPTION_KG_YEAR'], 3),
+        'treeDays': to_fixed(carbon_kg / p['CO2_TREE_ABSORPTION_KG_YEAR'] * 365, 1),
+    }
+
+
+# ==============================================================================
+# SECTION 5: Main Impact Calculator
+# ==============================================================================
+
+def calculate_environmental_impact(prompt_text, output_type='general', grid_profile=DEFAULT_GRID_PROFILE,
+                                   custom_output_tokens=None, token_counter=None):
+    """
+    Complete environmental impact for one prompt, shaped like the JS result object.
+
+    `token_counter` replaces estimate_tokens (e.g. tokenizer.count_tokens);
+    the default keeps parity with core-engine.js.
+    """
+    input_tokens = (token_counter or estimate_tokens)(prompt_text)
+    output_tokens = custom_output_tokens or estimate_output_tokens(input_tokens, output_type)
+    total_tokens = input_tokens + output_tokens
+
+    profile = grid_profile if grid_profile in ENVIRONMENTAL_CONSTANTS else DEFAULT_GRID_PROFILE
+    constants = ENVIRONMENTAL_CONSTANTS[profile]
+
+    energy_wh = calculate_energy(input_tokens, output_tokens)
+    water_liters = calculate_water(energy_wh, profile)
+    carbon_kg = calculate_carbon(energy_wh, profile)
+
+    return {
+        'tokens': {'input': input_tokens, 'output': output_tokens, 'total': total_tokens},
+        'impact': {
+            'energy': {'wh': energy_wh, 'kwh': energy_wh / 1000, 'analogies': get_energy_analogies(energy_wh)},
+            'water': {'liters': water_liters, 'milliliters': water_liters * 1000,
+                      'analogies': get_water_analogies(water_liters)},
+            'carbon': {'kg': carbon_kg, 'grams': carbon_kg * 1000, 'analogies': get_carbon_analogies(carbon_kg)},
+        },
+        'metadata': {
+            'gridProfile': constants['name'],
+            'region': constants['region'],
+            'ecoScore': calculate_eco_score(energy_wh, water_liters, carbon_kg),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        },
+    }
+
+
+def calculate_eco_score(energy_wh, water_liters, carbon_kg):
+    """
+    Eco-score on a 0-100 scale, lower is better.
+
+    Normalized against the SHORT benchmark under the default (Azure) profile,
+    whatever profile the inputs were computed with - as in the JS engine.
+    """
+    baseline_energy = _SHORT['energyWh']
+    baseline_water = calculate_water(baseline_energy)
+    baseline_carbon = calculate_carbon(baseline_energy)
+
+    energy_ratio = np.asarray(energy_wh, dtype=np.float64) / baseline_energy
+    water_ratio = np.asarray(water_liters, dtype=np.float64) / baseline_water
+    carbon_ratio = np.asarray(carbon_kg, dtype=np.float64) / baseline_carbon
+
+    # Weighted average (energy weighted most heavily)
+    composite = (energy_ratio * 0.5) + (water_ratio * 0.25) + (carbon_ratio * 0.25)
+    score = np.minimum(100, js_round(composite * 50)).astype(np.int64)
+    return _scalar_or_array(score, (energy_wh, water_liters, carbon_kg))
+
+
+def calculate_impact_batch(input_tokens, output_tokens=None, output_type='general',
+                           grid_profile=DEFAULT_GRID_PROFILE):
+    """
+    Vectorized impact for many prompts at once.
+
+    input_tokens:  array of input token counts
+    output_tokens: optional array of known output counts; zeros (and None)
+                   fall back to estimate_output_tokens, like customOutputTokens
+    output_type:   one type, or an array of type names/codes per prompt
+    grid_profile:  one profile, or an array of profile names/codes per prompt
+
+    Returns a dict of equally long arrays: input_tokens, output_tokens,
+    total_tokens, energy_wh, water_liters, carbon_kg and eco_score.
+    """
+    inputs = np.asarray(input_tokens, dtype=np.int64)
+    estimated = estimate_output_tokens(inputs, output_type)
+    if output_tokens is None:
+        outputs = np.broadcast_to(estimated, inputs.shape).astype(np.int64)
+    else:
+        custom = np.asarray(output_tokens, dtype=np.int64)
+        outputs = np.where(custom != 0, custom, estimated)
+
+    codes = grid_profile_codes(grid_profile)
+    energy = calculate_energy(inputs, outputs)
+    water = calculate_water(energy, codes)
+    carbon = calculate_carbon(energy, codes)
+    return {
+        'input_tokens': inputs,
+        'output_tokens': outputs,
+        'total_tokens': inputs + outputs,
+        'energy_wh': energy,
+        'water_liters': water,
+        'carbon_kg': carbon,
+        'eco_score': calculate_eco_score(energy, water, carbon),
+    }
+
+
+# ==============================================================================
+# SECTION 6: Comparison and Optimization Functions
+# ==============================================================================
+
+def compare_prompts(original_prompt, optimized_prompt, **options):
+    """Compare two prompts to show optimization savings"""
+    original = calculate_environmental_impact(original_prompt, **options)
+    optimized = calculate_environmental_impact(optimized_prompt, **options)
+    return {
+        'original': original,
+        'optimized': optimized,
+        'savings': savings_between(original, optimized),
+    }
+
+
+def savings_between(original, optimized):
+    """The savings block of comparePrompts for two impact results."""
+    def percentage(before, after):
+        if before == 0:
+            # JS prints 'NaN' for 0/0 and '-Infinity' for x/0
+            return 'NaN' if after == 0 else '-Infinity'
+        return to_fixed((1 - after / before) * 100, 1)
+
+    o, n = original['impact'], optimized['impact']
+    return {
+        'energy': {'wh': o['energy']['wh'] - n['energy']['wh'],
+                   'percentage': percentage(o['energy']['wh'], n['energy']['wh'])},
+        'water': {'liters': o['water']['liters'] - n['water']['liters'],
+                  'percentage': percentage(o['water']['liters'], n['water']['liters'])},
+        'carbon': {'kg': o['carbon']['kg'] - n['carbon']['kg'],
+                   'percentage': percentage(o['carbon']['kg'], n['carbon']['kg'])},
+        'tokens': {'saved': original['tokens']['total'] - optimized['tokens']['total'],
+                   'percentage': percentage(original['tokens']['total'], optimized['tokens']['total'])},
+    }
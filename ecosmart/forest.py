@@ -0,0 +1,298 @@
+"""
+Digital Forest state engine driven by the behavior matrix
+
+forest.js recomputes getForestHealth() over every tree on a timer, and trees
+are planted by button clicks at random. Here the forest follows what people
+do: each behavior from the matrix in prototypes/digital-forest/
+FEEDBACK_UPDATES.md earns (or costs) points, and points grow trees and move
+health.
+
+Every user has a forest, and every department has a team forest for the
+team achievements. An event changes one forest:
+
+  points > 0   growth += points; each TREE_POINTS of growth plants a tree;
+               health moves towards 100 by points / HEALTH_SCALE of the way
+  points < 0   health moves towards 0 by -points / HEALTH_SCALE of the way
+
+A department's health is the mean over its members' forests and its team
+forest, and its tree count is their sum. Both are running sums, adjusted by
+the change in the one forest an event touched, so no event rescans a
+department. diff() returns only the forests whose shown values changed since
+the last call, in the push hub's forest format, for the canvas to apply, and
+the trees planted since then. publish() sends a diff to a push hub: values
+as state changes, planted trees as a one-off event, so a display that
+connects later gets the forest as it is without replanting old trees.
+
+The engine is also a journal projection (apply, seq, to_dict, from_dict):
+journal.rebuild(directory, ForestEngine) replays usage events as behaviors
+(after the latest ForestEngine snapshot, if any), where a query over
+EXCESSIVE_TOKENS tokens costs points and a recorded saving counts as an
+optimized prompt.
+"""
+
+from typing import NamedTuple
+
+from .journal import SAVINGS, USAGE
+
+# Behavior matrix (FEEDBACK_UPDATES.md, "Forest Growth Behaviors"); the
+# decay values are ours, as the matrix only lists the behaviors
+BEHAVIORS = {
+    # individual actions
+    'optimize_prompt': 10,
+    'library_prompt': 5,
+    'quiz_passed': 50,          # 80% or more
+    'sustainable_tool': 25,
+    'share_prompt': 10,
+    # team achievements, credited to the department's team forest
+    'department_efficiency': 100,   # department below 1.5 for a week
+    'co2_reduction': 200,           # 10% month over month
+    'quiz_completion': 150,         # everyone passed
+    # behaviors that remove leaves
+    'ignored_suggestion': -5,
+    'excessive_tokens': -10,        # a query over EXCESSIVE_TOKENS tokens
+    'inefficient_day': -20,         # prompt efficiency above 2.0 for the day
+}
+TEAM_BEHAVIORS = frozenset({'department_efficiency', 'co2_reduction', 'quiz_completion'})
+
+TREE_POINTS = 100       # growth points per tree
+HEALTH_SCALE = 200      # points that would take health all the way to 100 (or 0)
+START_HEALTH = 70.0     # health of a new forest
+EXCESSIVE_TOKENS = 500
+
+
+class Forest:
+    __slots__ = ('health', 'trees', 'growth', 'points')
+
+    def __init__(self, health=START_HEALTH, trees=0, growth=0, points=0):
+        self.health = health
+        self.trees = trees
+        self.growth = growth
+        self.points = points
+
+    def record(self, points):
+        """Apply `points`; returns the number of trees planted."""
+        self.points += points
+        share = min(abs(points) / HEALTH_SCALE, 1.0)
+        if points > 0:
+            self.health += (100.0 - self.health) * share
+            planted, self.growth = divmod(self.growth + points, TREE_POINTS)
+            self.trees += planted
+            return planted
+        self.health -= self.health * share
+        return 0
+
+    def view(self):
+        return {'health': round(self.health, 1), 'trees': self.trees, 'growth': self.growth}
+
+    def to_list(self):
+        return [self.health, self.trees, self.growth, self.points]
+
+
+class _Department:
+    __slots__ = ('name', 'team', 'members', 'health_sum', 'trees')
+
+    def __init__(self, name):
+        self.name = name
+        self.team = Forest()
+        self.members = 0
+        self.health_sum = self.team.health   # over members and the team forest
+        self.trees = 0
+
+    def view(self):
+        return {'name': self.name, 'health': round(self.health_sum / (self.members + 1), 1),
+                'trees': self.trees, 'members': self.members}
+
+
+class ForestDiff(NamedTuple):
+    departments: dict   # key -> {'name', 'health', 'trees', 'members'}
+    users: dict         # user -> {'health', 'trees', 'growth'}
+    planted: dict       # key -> trees planted since the last diff
+
+
+class ForestEngine:
+    """
+    Forests per user and department, updated per event in O(1).
+    `names` maps department keys to display names (default: the key).
+    """
+
+    def __init__(self, names=None):
+        self.names = dict(names or {})
+        self.seq = 0
+        self._users = {}            # user -> Forest
+        self._membership = {}       # user -> department key
+        self._departments = {}      # key -> _Department
+        self._dirty_users = set()
+        self._dirty_departments = set()
+        self._planted = {}          # department -> trees planted since the last diff
+        self._shown_users = {}      # last view sent per user / department
+        self._shown_departments = {}
+
+    def __len__(self):
+        return len(self._users)
+
+    def _department(self, key):
+        department = self._departments.get(key)
+        if department is None:
+            department = self._departments[key] = _Department(self.names.get(key, key))
+            self._dirty_departments.add(key)
+        return department
+
+    def _join(self, user, key):
+        """The forest of `user`, who is (now) in department `key`."""
+        forest = self._users.get(user)
+        current = self._membership.get(user)
+        if forest is None:
+            forest = self._users[user] = Forest()
+        elif current == key:
+            return forest
+        if current is not None:
+            self._leave(current, forest)
+        department = self._department(key)
+        department.members += 1
+        department.health_sum += forest.health
+        department.trees += forest.trees
+        self._membership[user] = key
+        self._dirty_departments.add(key)
+        return forest
+
+    def _leave(self, key, forest):
+        department = self._departments[key]
+        department.members -= 1
+        department.health_sum -= forest.health
+        department.trees -= forest.trees
+        self._dirty_departments.add(key)
+
+    @staticmethod
+    def check(behavior, user=None, department=None):
+        """The points of `behavior`; ValueError if it is unknown or lacks its user or department."""
+        points = BEHAVIORS.get(behavior)
+        if points is None:
+            raise ValueError(f"unknown behavior {behavior!r}")
+        if behavior in TEAM_BEHAVIORS and department is None:
+            raise ValueError(f"{behavior} needs a department")
+        if behavior not in TEAM_BEHAVIORS and user is None:
+            raise ValueError(f"{behavior} needs a user")
+        return points
+
+    def record(self, behavior, user=None, department=None):
+        """
+        Apply one behavior for `user` in `department` (team behaviors: the
+        department only); returns the number of trees planted.
+        """
+        points = self.check(behavior, user, department)
+        if behavior in TEAM_BEHAVIORS:
+            key = department
+            forest = self._department(key).team
+        else:
+            key = department if department is not None else self._membership.get(user, '')
+            forest = self._join(user, key)
+            self._dirty_users.add(user)
+        health, trees = forest.health, forest.trees
+        planted = forest.record(points)
+        owner = self._departments[key]
+        owner.health_sum += forest.health - health
+        owner.trees += forest.trees - trees
+        self._dirty_departments.add(key)
+        if planted:
+            self._planted[key] = self._planted.get(key, 0) + planted
+        return planted
+
+    def record_many(self, events):
+        """
+        record() for each (behavior, user, department); returns the trees
+        planted. Every event is checked first, so a bad one applies none.
+        """
+        events = list(events)
+        for behavior, user, department in events:
+            self.check(behavior, user, department)
+        return sum(self.record(behavior, user, department) for behavior, user, department in events)
+
+    # --------------------------------------------------------------------------
+    # Views
+    # --------------------------------------------------------------------------
+
+    def department(self, key):
+        """{'name', 'health', 'trees', 'members'} of a department; KeyError if it has no forest."""
+        return self._departments[key].view()
+
+    def user(self, user):
+        """{'health', 'trees', 'growth'} of a user's forest; KeyError if there is none."""
+        return self._users[user].view()
+
+    def health(self):
+        """Mean health over every forest, as getForestHealth."""
+        forests = sum(department.members + 1 for department in self._departments.values())
+        if not forests:
+            return 0
+        return round(sum(department.health_sum for department in self._departments.values()) / forests)
+
+    def snapshot(self):
+        """Every department, in the forest topic's format (for a display that just connected)."""
+        return {key: department.view() for key, department in self._departments.items()}
+
+    def diff(self):
+        """Forests whose shown values changed, and the trees planted per department, since the last diff."""
+        departments = {}
+        for key in self._dirty_departments:
+            view = self._departments[key].view()
+            if view != self._shown_departments.get(key):
+                self._shown_departments[key] = departments[key] = view
+        planted, self._planted = self._planted, {}
+        users = {}
+        for user in self._dirty_users:
+            view = self._users[user].view()
+            if view != self._shown_users.get(user):
+                self._shown_users[user] = users[user] = view
+        self._dirty_departments.clear()
+        self._dirty_users.clear()
+        return ForestDiff(departments, users, planted)
+
+    def publish(self, hub, topic='forest'):
+        """
+        Send diff() to a push hub: the department values are merged into
+        `topic` with publish(), and planted trees go out once with announce(),
+        so they are not part of the snapshot a new display receives.
+        """
+        diff = self.diff()
+        if diff.departments:
+            hub.publish(topic, diff.departments)
+        if diff.planted:
+            hub.announce(topic, {'planted': diff.planted})
+        return diff
+
+    # --------------------------------------------------------------------------
+    # Journal projection
+    # --------------------------------------------------------------------------
+
+    def apply(self, event):
+        """Fold an ecosmart.journal event in as behaviors."""
+        if event.kind == SAVINGS:
+            self.record('optimize_prompt', event.user, event.department)
+        elif event.kind == USAGE and event.tokens > EXCESSIVE_TOKENS:
+            self.record('excessive_tokens', event.user, event.department)
+        elif event.kind == USAGE:
+            self._join(event.user, event.department)
+        self.seq = event.seq
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'names': self.names,
+            'users': {user: [self._membership[user], *forest.to_list()] for user, forest in self._users.items()},
+            'teams': {key: department.team.to_list() for key, department in self._departments.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        engine = cls(state['names'])
+        engine.seq = state['seq']
+        for key, team in state['teams'].items():
+            department = engine._department(key)
+            department.team = Forest(*team)
+            department.health_sum = department.team.health
+            department.trees = department.team.trees
+        for user, (key, *forest) in state['users'].items():
+            engine._users[user] = Forest(*forest)
+            engine._join(user, key)
+            engine._dirty_users.add(user)
+        return engine
@@ -0,0 +1,403 @@
+"""
+Streaming usage-log ingestion for the Magic Mirror department display
+
+Reads Azure OpenAI usage exports (JSONL or CSV, optionally gzipped) one record
+at a time and rolls them up into the per-department fields mirror.js shows:
+promptEfficiency, energyUsage, toolDiversity, co2Impact, trends and score.
+
+Memory stays bounded however large the logs are: records flow through a
+generator pipeline, impact is computed per chunk with the vectorized engine,
+and only per-department time-bucketed totals are kept (see aggregates.py).
+
+Run: python3 -m ecosmart.ingest logs/usage-*.jsonl.gz \\
+         --out prototypes/magic-mirror-department/department-data.json
+
+With --store the totals persist in a memory-mapped file, so each run only
+ingests the logs written since the last one.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from datetime import date, datetime, timezone
+from itertools import islice
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from . import core_engine as engine
+from .aggregates import AggregateStore
+
+CHUNK_SIZE = 65536
+
+# Column names seen in Azure Monitor / Azure OpenAI exports, plus our own
+FIELD_ALIASES = {
+    'timestamp': ('timestamp', 'TimeGenerated', 'time', 'Timestamp', 'created'),
+    'department': ('department', 'Department', 'dept', 'DepartmentId'),
+    'user': ('user', 'user_id', 'UserId', 'CallerObjectId', 'CallerIpAddress'),
+    'tool': ('tool', 'model', 'ModelDeploymentName', 'DeploymentName', 'ModelName'),
+    'input_tokens': ('input_tokens', 'prompt_tokens', 'ProcessedPromptTokens', 'PromptTokens'),
+    'output_tokens': ('output_tokens', 'completion_tokens', 'GeneratedTokens', 'CompletionTokens'),
+    'query_id': ('query_id', 'conversation_id', 'ConversationId', 'session_id', 'SessionId'),
+    'grid_profile': ('grid_profile', 'GridProfile'),
+}
+
+# Display names used by mirror.js; other departments keep the name from the log
+DEPARTMENT_NAMES = {
+    'it': 'IT Department',
+    'finance': 'Finance Team',
+    'hr': 'Human Resources',
+    'policy': 'Policy & Strategy',
+    'operations': 'Operations',
+}
+
+# Score weights and anchors (see department_score)
+EFFICIENCY_BEST = 1.0        # prompts per query that earns full efficiency points
+EFFICIENCY_WORST = 2.5       # prompts per query that earns none
+DIVERSITY_TARGET = 7         # tools in use for full diversity points
+
+
+class UsageEvent(NamedTuple):
+    """One prompt sent to an AI system, normalized from a log record."""
+    timestamp: datetime
+    department: str
+    user: Optional[str]
+    tool: Optional[str]
+    input_tokens: int
+    output_tokens: int
+    query_id: Optional[str]
+    grid_profile: Optional[str]
+
+
+# ==============================================================================
+# Pipeline stages (all generators)
+# ==============================================================================
+
+def open_log(path):
+    """Open a log file as text, transparently decompressing .gz files."""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def log_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(path, fmt=None, errors=None):
+    """Yield one dict per JSONL line or CSV row; unparseable lines are counted in `errors`."""
+    fmt = fmt or log_format(path)
+    with open_log(path) as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                if errors is not None:
+                    errors['unparseable'] = errors.get('unparseable', 0) + 1
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def _field(record, name):
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def parse_timestamp(value):
+    """ISO 8601 string or Unix epoch (seconds or milliseconds) to datetime."""
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
+        seconds = float(value)
+        if seconds > 1e11:
+            seconds /= 1000
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    if not isinstance(value, str):
+        raise TypeError(f"timestamp must be a string or a number, not {type(value).__name__}")
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    # naive timestamps are taken as UTC so they compare with aware ones
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def department_key(name):
+    """'IT Department' / 'it' / 'Finance Team' -> the slug mirror.js uses."""
+    slug = name.strip().lower()
+    for key, display_name in DEPARTMENT_NAMES.items():
+        if slug in (key, display_name.lower()):
+            return key
+    return slug.replace(' ', '-')
+
+
+def parse_events(records, errors=None):
+    """Normalize raw records into UsageEvents, skipping (and counting) malformed ones."""
+    for record in records:
+        try:
+            department = _field(record, 'department')
+            timestamp = _field(record, 'timestamp')
+            if department is None or timestamp is None:
+                raise ValueError('missing department or timestamp')
+            user = _field(record, 'user')
+            tool = _field(record, 'tool')
+            query_id = _field(record, 'query_id')
+            yield UsageEvent(
+                timestamp=parse_timestamp(timestamp),
+                department=department_key(str(department)),
+                user=None if user is None else str(user),
+                tool=None if tool is None else str(tool),
+                input_tokens=int(float(_field(record, 'input_tokens') or 0)),
+                output_tokens=int(float(_field(record, 'output_tokens') or 0)),
+                query_id=None if query_id is None else str(query_id),
+                grid_profile=_field(record, 'grid_profile'),
+            )
+        except (TypeError, ValueError, OverflowError):
+            if errors is not None:
+                errors['malformed'] = errors.get('malformed', 0) + 1
+
+
+def mark_queries(events):
+    """
+    Yield (event, starts_query) pairs.
+
+    A prompt starts a new query when its query id differs from the previous
+    prompt of the same user; without ids every prompt is its own query. Only
+    the last id per user is remembered, so memory grows with users, not events.
+    """
+    last_query = {}
+    for event in events:
+        if event.query_id is None:
+            yield event, True
+            continue
+        key = (event.department, event.user)
+        starts_query = last_query.get(key) != event.query_id
+        last_query[key] = event.query_id
+        yield event, starts_query
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    """Yield lists of up to `size` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ==============================================================================
+# Incremental rollup
+# ==============================================================================
+
+# Additive per-event totals kept for every department in the aggregate store
+TOTALS = ('prompts', 'queries', 'input_tokens', 'output_tokens', 'energy_wh', 'water_liters', 'carbon_kg',
+          'eco_score_sum')
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+TREND_KEYS = ('promptEfficiency', 'energyUsage', 'toolDiversity', 'co2Impact')
+
+
+class DepartmentRollup:
+    """
+    Per-department running totals, kept in a time-bucketed AggregateStore.
+
+    Memory is the fixed size of the store's rings, so a multi-GB log costs as
+    much as a week of logs. With `store_path` the totals persist in a
+    memory-mapped file and later runs only need to ingest new logs.
+    """
+
+    def __init__(self, grid_profile=engine.DEFAULT_GRID_PROFILE, store_path=None):
+        self.grid_profile = grid_profile
+        self.store = AggregateStore(TOTALS, store_path)
+
+    @property
+    def events(self):
+        return self.store.events
+
+    @property
+    def latest(self):
+        """Newest event timestamp seen (None before the first event)."""
+        latest = self.store.latest
+        return None if latest is None else datetime.fromtimestamp(latest, tz=timezone.utc)
+
+    @property
+    def departments(self):
+        return sorted(self.store.departments)
+
+    def add_chunk(self, marked_events):
+        """Fold a list of (UsageEvent, starts_query) pairs into the totals."""
+        if not marked_events:
+            return
+        events = [event for event, _ in marked_events]
+        starts = np.fromiter((flag for _, flag in marked_events), dtype=np.float64, count=len(events))
+        impact = engine.calculate_impact_batch(
+            np.fromiter((e.input_tokens for e in events), dtype=np.int64, count=len(events)),
+            np.fromiter((e.output_tokens for e in events), dtype=np.int64, count=len(events)),
+            grid_profile=[e.grid_profile or self.grid_profile for e in events],
+        )
+        columns = np.column_stack([
+            np.ones(len(events)), starts,
+            impact['input_tokens'], impact['output_tokens'],
+            impact['energy_wh'], impact['water_liters'], impact['carbon_kg'], impact['eco_score'],
+        ])
+
+        store = self.store
+        codes = {}
+        tools = {None: -1}
+        for event in events:
+            if event.department not in codes:
+                codes[event.department] = store.department_code(
+                    event.department, DEPARTMENT_NAMES.get(event.department, event.department))
+            if event.tool not in tools:
+                column = store.tool_column(event.tool)
+                tools[event.tool] = -1 if column is None else column
+        store.add(
+            np.fromiter((codes[e.department] for e in events), dtype=np.intp, count=len(events)),
+            np.fromiter((int(e.timestamp.timestamp()) for e in events), dtype=np.int64, count=len(events)),
+            columns,
+            np.fromiter((tools[e.tool] for e in events), dtype=np.intp, count=len(events)),
+        )
+
+    def window(self, department, end, days):
+        """
+        Totals (plus 'tools': distinct tools) for the `days` days ending on date
+        ordinal `end`; `department` may be a list of departments to combine.
+        """
+        return self.store.window(department, 'day', days, end - EPOCH_ORDINAL)
+
+    def weekly(self, department, end):
+        """Per-day promptEfficiency and co2Impact for the 7 days ending on `end`, for the chart."""
+        series = self.store.series(department, 'day', 7, end - EPOCH_ORDINAL)
+        prompts, queries = series[:, TOTALS.index('prompts')], series[:, TOTALS.index('queries')]
+        efficiency = np.divide(prompts, queries, out=np.zeros(7), where=queries > 0)
+        return {
+            'days': [WEEKDAYS[date.fromordinal(day).weekday()] for day in range(end - 6, end + 1)],
+            'promptEfficiency': [round(value, 2) for value in efficiency.tolist()],
+            'co2Impact': [round(value, 3) for value in series[:, TOTALS.index('carbon_kg')].tolist()],
+        }
+
+    def end(self, as_of=None):
+        """Date ordinal of the report day: `as_of`, else the newest event's day, else today."""
+        return (as_of or self.latest or datetime.now(timezone.utc)).date().toordinal()
+
+    def entry(self, department, end):
+        """
+        One departmentData entry (without 'name') for `department`, or for a
+        list of departments combined, up to date ordinal `end`.
+
+        Energy and prompt efficiency cover the 7 days up to `end`, CO2 the
+        last 30 days; trends compare with the period before. Every window is
+        two lookups in the store.
+        """
+        week = self.window(department, end, 7)
+        last_week = self.window(department, end - 7, 7)
+        month = self.window(department, end, 30)
+        last_month = self.window(department, end - 30, 30)
+
+        metrics = department_metrics(week, month)
+        previous = department_metrics(last_week, last_month)
+        return {
+            'score': department_score(metrics, week),
+            **metrics,
+            'trends': {key: round(metrics[key] - previous[key], 1) for key in TREND_KEYS},
+            'weekly': self.weekly(department, end),
+        }
+
+    def snapshot(self, as_of=None):
+        """The departmentData object for mirror.js, as of `as_of` (default: the newest event)."""
+        end = self.end(as_of)
+        return {
+            department: {'name': self.store.department_name(department), **self.entry(department, end)}
+            for department in self.departments
+        }
+
+
+def department_metrics(week, month):
+    return {
+        'promptEfficiency': round(week['prompts'] / week['queries'], 2) if week['queries'] else 0.0,
+        'energyUsage': round(week['energy_wh'] / 1000, 3),       # kWh this week
+        'toolDiversity': week['tools'],
+        'co2Impact': round(month['carbon_kg'], 3),               # kg CO2 this month
+    }
+
+
+def department_score(metrics, week):
+    """
+    Sustainability score 0-100 (higher is better), from the week's figures:
+    40% prompt efficiency (1.0 prompts/query = full marks, 2.5+ = none),
+    40% average eco-score of the prompts (the engine's 0-100, lower is better),
+    20% tool diversity (7+ tools = full marks).
+    """
+    if not week['prompts']:
+        return 0
+    efficiency = (EFFICIENCY_WORST - metrics['promptEfficiency']) / (EFFICIENCY_WORST - EFFICIENCY_BEST)
+    efficiency = min(1.0, max(0.0, efficiency))
+    eco = 1 - (week['eco_score_sum'] / week['prompts']) / 100
+    diversity = min(metrics['toolDiversity'], DIVERSITY_TARGET) / DIVERSITY_TARGET
+    return int(round(100 * (0.4 * efficiency + 0.4 * eco + 0.2 * diversity)))
+
+
+def ingest(paths, rollup=None, chunk_size=CHUNK_SIZE, errors=None):
+    """Stream every log in `paths` through the pipeline into `rollup` (created if None)."""
+    rollup = rollup or DepartmentRollup()
+    records = (record for path in paths for record in read_records(path, errors=errors))
+    for chunk in chunked(mark_queries(parse_events(records, errors)), chunk_size):
+        rollup.add_chunk(chunk)
+    return rollup
+
+
+def write_json(data, path):
+    """Write `data` atomically, so displays never fetch a half-written file."""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roll usage logs up into Magic Mirror department data")
+    parser.add_argument('logs', nargs='+', help="JSONL/CSV usage exports (.gz allowed, '-' for stdin)")
+    parser.add_argument('--out', default='department-data.json', help="JSON file the mirror loads")
+    parser.add_argument('--as-of', type=date.fromisoformat, help="report date (default: newest event)")
+    parser.add_argument('--grid-profile', default=engine.DEFAULT_GRID_PROFILE, choices=engine.GRID_PROFILES,
+                        help="grid profile for records without one")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="events per vectorized batch")
+    parser.add_argument('--store', help="aggregate store file to add to (created if missing); "
+                                        "logs must not be ingested into it twice")
+    args = parser.parse_args(argv)
+
+    errors = {}
+    rollup = ingest(args.logs, DepartmentRollup(args.grid_profile, args.store), args.chunk_size, errors)
+    rollup.store.flush()
+    as_of = datetime.combine(args.as_of, datetime.min.time()) if args.as_of else None
+    try:
+        snapshot = rollup.snapshot(as_of)
+    except ValueError as exc:   # the 60 days before --as-of are no longer in the day ring
+        raise SystemExit(f"❌ --as-of {args.as_of} is too long before the newest event: {exc}")
+    write_json(snapshot, args.out)
+
+    print(f"✅ {rollup.events:,} events{' in ' + args.store if args.store else ''} → {args.out}")
+    print(f"🏢 Departments: {', '.join(rollup.departments) or 'none'}")
+    if errors:
+        print(f"⚠️  Skipped: {', '.join(f'{count:,} {kind}' for kind, count in errors.items())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,475 @@
+"""
+Append-only usage journal with segment files and snapshots
+
+The prototypes keep co2Saved, requestsToday, forest health and department
+scores as mutable totals: after a crash, or a bug in one of them, there is no
+history to rebuild them from. This journal keeps the history instead: every
+query and every saving is appended as an event, and the totals are folded
+from the events.
+
+Events are binary records, each a length and CRC-32 followed by the payload:
+
+  u32 length, u32 crc32 | u64 seq, f64 timestamp, u8 kind, u16 user bytes,
+  u16 department bytes, i64 tokens, f64 energy Wh, f64 water L, f64 carbon kg,
+  user (UTF-8), department (UTF-8)
+
+appended to segment files named after their first sequence number
+(segment-00000000000000000001.log) and rolled over at `segment_bytes`. On
+open, the last segment is scanned and a record torn by a crash is cut off;
+sealed segments are never written again. Readers map segments into memory
+and skip those before the requested sequence number.
+
+A snapshot is a projection's state (zlib-compressed JSON) at a sequence
+number, named after the projection's class
+(snapshot-UsageProjection-00000000000000000001.json.z); rebuild() loads the
+latest of its projection and replays only the events after it.
+Events are folded in sequence order with the same arithmetic every time, so
+a rebuild gives the same totals as the process that crashed.
+
+Run: python3 -m ecosmart.journal import DIR events.ndjson   (ecosmart.sync stats lines)
+     python3 -m ecosmart.journal rebuild DIR [--snapshot]
+     python3 -m ecosmart.journal info DIR
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from . import ingest
+from .sync import STAT_TOTALS
+
+SEGMENT_BYTES = 64 << 20
+SEGMENT_MAGIC = b'ECOJ'
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sHxxQ')     # magic, version, first seq
+RECORD_HEADER = struct.Struct('<II')          # payload length, crc32 of payload
+EVENT = struct.Struct('<QdBHHqddd')           # see module docstring
+SEGMENT_NAME = re.compile(r'segment-(\d{20})\.log$')
+SNAPSHOT_NAME = re.compile(r'snapshot-(?:(\w+?)-)?(\d{20})\.json\.z$')   # unnamed: UsageProjection
+MAX_NAME_BYTES = 0xFFFF
+KEEP_SNAPSHOTS = 2
+
+USAGE = 1
+SAVINGS = 2
+
+
+class Event(NamedTuple):
+    seq: int
+    timestamp: float    # Unix seconds
+    kind: int           # USAGE or SAVINGS
+    user: str
+    department: str
+    tokens: int         # tokens used, or saved
+    energy_wh: float
+    water_liters: float
+    carbon_kg: float
+
+
+def segment_path(directory, first_seq):
+    return os.path.join(directory, f'segment-{first_seq:020d}.log')
+
+
+def segments(directory):
+    """[(first seq, path)] of the segment files in `directory`, in order."""
+    found = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        match = SEGMENT_NAME.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def encode(event):
+    user = event.user.encode('utf-8')
+    department = event.department.encode('utf-8')
+    if len(user) > MAX_NAME_BYTES or len(department) > MAX_NAME_BYTES:
+        raise ValueError(f"user and department must be at most {MAX_NAME_BYTES} bytes (UTF-8)")
+    payload = EVENT.pack(event.seq, event.timestamp, event.kind, len(user), len(department), event.tokens,
+                         event.energy_wh, event.water_liters, event.carbon_kg) + user + department
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+# ==============================================================================
+# Reading
+# ==============================================================================
+
+def iter_segment(path, after=0, verify=False, tail=None):
+    """
+    Events of one segment with seq > `after`, from a memory map. Stops at the
+    first record that is cut short or, with `verify`, whose CRC does not
+    match; `tail`, if given, is set to [end offset of the last whole record,
+    its seq].
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < SEGMENT_HEADER.size:
+            if tail is not None:
+                tail[:] = [0, None]
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, version, _ = SEGMENT_HEADER.unpack_from(view, 0)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                raise ValueError(f"{path}: not a version {SEGMENT_VERSION} journal segment")
+            yield from _decode(view, size, after, verify, tail if tail is not None else [0, None])
+
+
+def _decode(view, size, after, verify, tail):
+    unpack_header = RECORD_HEADER.unpack_from
+    unpack_event = EVENT.unpack_from
+    header_size, event_size = RECORD_HEADER.size, EVENT.size
+    names = {}      # encoded user/department -> str, as they repeat
+    position = SEGMENT_HEADER.size
+    last = None
+    while position + header_size <= size:
+        length, crc = unpack_header(view, position)
+        start = position + header_size
+        end = start + length
+        if length < event_size or end > size:
+            break
+        if verify and zlib.crc32(view[start:end]) != crc:
+            break
+        seq, timestamp, kind, user_length, _, tokens, energy, water, carbon = unpack_event(view, start)
+        position, last = end, seq
+        if seq <= after:
+            continue
+        cut = start + event_size + user_length
+        raw_user = view[start + event_size:cut]
+        raw_department = view[cut:end]
+        user = names.get(raw_user)
+        if user is None:
+            user = names[raw_user] = raw_user.decode('utf-8')
+        department = names.get(raw_department)
+        if department is None:
+            department = names[raw_department] = raw_department.decode('utf-8')
+        yield Event(seq, timestamp, kind, user, department, tokens, energy, water, carbon)
+    tail[:] = [position, last]
+
+
+def read_events(directory, after=0, verify=False):
+    """The events of the journal in `directory` with seq > `after`, in order."""
+    found = segments(directory)
+    for index, (first, path) in enumerate(found):
+        if index + 1 < len(found) and found[index + 1][0] <= after + 1:
+            continue   # every event in this segment is <= after
+        yield from iter_segment(path, after, verify)
+
+
+# ==============================================================================
+# Writing
+# ==============================================================================
+
+class Journal:
+    """
+    Appends events to the segments in `directory`. One writer per directory;
+    thread-safe. Appends are buffered: flush() hands them to the OS and
+    flush(fsync=True) makes them durable; with `fsync`, every append call is.
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, fsync=False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.recovered_bytes = 0    # bytes of torn records cut off on open
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        found = segments(directory)
+        self.next_seq = 1
+        self._file = None
+        if found:
+            first, path = found[-1]
+            tail = [0, None]
+            for _ in iter_segment(path, after=float('inf'), verify=True, tail=tail):
+                pass
+            end, last = tail
+            self.next_seq = last + 1 if last is not None else first
+            with open(path, 'r+b') as f:
+                size = os.fstat(f.fileno()).st_size
+                if end < SEGMENT_HEADER.size:   # the header itself was torn
+                    f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, first))
+                    f.truncate(SEGMENT_HEADER.size)
+                    self.recovered_bytes = max(size - SEGMENT_HEADER.size, 0)
+                    end = SEGMENT_HEADER.size
+                elif size > end:
+                    self.recovered_bytes = size - end
+                    f.truncate(end)
+            self._open(path, end)
+        else:
+            self._roll()
+
+    def _open(self, path, size):
+        self._file = open(path, 'ab')
+        self._size = size
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())   # a sealed segment is complete on disk
+            self._file.close()
+        path = segment_path(self.directory, self.next_seq)
+        with open(path, 'wb') as f:
+            f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, self.next_seq))
+        self._open(path, SEGMENT_HEADER.size)
+
+    def append(self, kind, user, department='', tokens=0, energy_wh=0.0, water_liters=0.0, carbon_kg=0.0,
+               timestamp=None):
+        """Append one event; returns its sequence number."""
+        return self.append_many([(kind, user, department, tokens, energy_wh, water_liters, carbon_kg,
+                                  timestamp)])[-1]
+
+    def append_many(self, events):
+        """
+        Append (kind, user, department, tokens, energy Wh, water L, carbon kg,
+        timestamp or None) tuples; returns their sequence numbers. Every event
+        is encoded before any is written, so a bad one (ValueError) appends none.
+        """
+        now = time.time()
+        with self._lock:
+            records = []
+            for seq, (kind, user, department, tokens, energy, water, carbon, timestamp) in enumerate(
+                    events, self.next_seq):
+                if kind not in (USAGE, SAVINGS):
+                    raise ValueError(f"unknown event kind {kind!r}")
+                records.append(encode(Event(seq, timestamp if timestamp is not None else now, kind,
+                                            user, department, int(tokens), energy, water, carbon)))
+            for record in records:
+                if self._size + len(record) > self.segment_bytes and self._size > SEGMENT_HEADER.size:
+                    self._roll()
+                self._file.write(record)
+                self._size += len(record)
+            seqs = list(range(self.next_seq, self.next_seq + len(records)))
+            self.next_seq += len(records)
+            if self.fsync:
+                self._flush(True)
+        return seqs
+
+    def record_query(self, user, impact, department='', timestamp=None):
+        """Append a usage event for a calculateEnvironmentalImpact result."""
+        return self.append(USAGE, user, department, impact['tokens']['total'], impact['impact']['energy']['wh'],
+                           impact['impact']['water']['liters'], impact['impact']['carbon']['kg'], timestamp)
+
+    def record_savings(self, user, savings, department='', timestamp=None):
+        """Append a savings event for a comparePrompts savings block."""
+        return self.append(SAVINGS, user, department, savings['tokens']['saved'], savings['energy']['wh'],
+                           savings['water']['liters'], savings['carbon']['kg'], timestamp)
+
+    def flush(self, fsync=False):
+        with self._lock:
+            self._flush(fsync)
+
+    def _flush(self, fsync):
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush(self.fsync)
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==============================================================================
+# Projection and snapshots
+# ==============================================================================
+
+def new_totals():
+    return dict.fromkeys(STAT_TOTALS, 0)
+
+
+class UsageProjection:
+    """
+    The dashboards' figures folded from events: stats totals (the
+    storage-manager.js names) overall and per department, user and UTC day.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.totals = new_totals()
+        self.departments = {}
+        self.users = {}
+        self.days = {}
+        self._day_names = {}
+
+    def apply(self, event):
+        day = int(event.timestamp // 86400)
+        name = self._day_names.get(day)
+        if name is None:
+            name = self._day_names[day] = datetime.fromtimestamp(day * 86400, timezone.utc).strftime('%Y-%m-%d')
+        buckets = (self.totals,
+                   self.departments.get(event.department) or self.departments.setdefault(event.department,
+                                                                                          new_totals()),
+                   self.users.get(event.user) or self.users.setdefault(event.user, new_totals()),
+                   self.days.get(name) or self.days.setdefault(name, new_totals()))
+        if event.kind == USAGE:
+            for totals in buckets:
+                totals['totalQueries'] += 1
+                totals['totalTokens'] += event.tokens
+                totals['totalEnergy'] += event.energy_wh
+                totals['totalWater'] += event.water_liters
+                totals['totalCarbon'] += event.carbon_kg
+        else:
+            for totals in buckets:
+                totals['savedEnergy'] += event.energy_wh
+                totals['savedWater'] += event.water_liters
+                totals['savedCarbon'] += event.carbon_kg
+        self.seq = event.seq
+
+    def to_dict(self):
+        return {'seq': self.seq, 'totals': self.totals, 'departments': self.departments, 'users': self.users,
+                'days': self.days}
+
+    @classmethod
+    def from_dict(cls, state):
+        projection = cls()
+        projection.seq = state['seq']
+        projection.totals = state['totals']
+        projection.departments = state['departments']
+        projection.users = state['users']
+        projection.days = state['days']
+        return projection
+
+
+def snapshots(directory, factory=None):
+    """[(seq, path)] of the snapshots in `directory` (of `factory`'s projection, if given), oldest first."""
+    found = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        match = SNAPSHOT_NAME.match(name)
+        if match and (factory is None or (match.group(1) or UsageProjection.__name__) == factory.__name__):
+            found.append((int(match.group(2)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def write_snapshot(directory, projection, keep=KEEP_SNAPSHOTS):
+    """
+    Save `projection` (to_dict()) as of its seq; older snapshots of the same
+    projection beyond `keep` are removed.
+    """
+    factory = type(projection)
+    path = os.path.join(directory, f'snapshot-{factory.__name__}-{projection.seq:020d}.json.z')
+    payload = json.dumps(projection.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(zlib.compress(payload, 6))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    for _, old in snapshots(directory, factory)[:-keep]:
+        os.remove(old)
+    return path
+
+
+def load_snapshot(directory, factory=UsageProjection):
+    """The state of the latest readable snapshot of `factory`'s projection, or None."""
+    for _, path in reversed(snapshots(directory, factory)):
+        try:
+            with open(path, 'rb') as f:
+                return json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            continue   # damaged; try the one before
+    return None
+
+
+def rebuild(directory, factory=UsageProjection, use_snapshot=True):
+    """A projection of the journal in `directory`: its latest snapshot plus the events after it."""
+    state = load_snapshot(directory, factory) if use_snapshot else None
+    projection = factory.from_dict(state) if state else factory()
+    for event in read_events(directory, after=projection.seq):
+        projection.apply(event)
+    return projection
+
+
+def prune(directory, seq):
+    """Remove the segments whose events are all <= `seq` (covered by a snapshot); returns how many."""
+    found = segments(directory)
+    removed = 0
+    for (first, path), (next_first, _) in zip(found, found[1:]):
+        if next_first <= seq + 1:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+# ==============================================================================
+# CLI
+# ==============================================================================
+
+def parse_timestamp(value):
+    """Unix seconds for an ingest timestamp (naive times are UTC), or None."""
+    return None if value is None else ingest.parse_timestamp(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append-only usage journal")
+    commands = parser.add_subparsers(dest='command', required=True)
+    importing = commands.add_parser('import', help="append ecosmart.sync stats lines (impact or savings)")
+    importing.add_argument('directory')
+    importing.add_argument('file')
+    rebuilding = commands.add_parser('rebuild', help="fold the journal into totals")
+    rebuilding.add_argument('directory')
+    rebuilding.add_argument('--snapshot', action='store_true', help="save a snapshot afterwards")
+    rebuilding.add_argument('--full', action='store_true', help="ignore snapshots and replay everything")
+    info = commands.add_parser('info', help="segments and snapshots")
+    info.add_argument('directory')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        batch = []
+        count = 0
+        with Journal(args.directory) as journal, open(args.file, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                user, department = str(record['user']), str(record.get('department', ''))
+                timestamp = parse_timestamp(record.get('timestamp'))
+                if 'impact' in record:
+                    impact = record['impact']
+                    batch.append((USAGE, user, department, impact['tokens']['total'],
+                                  impact['impact']['energy']['wh'], impact['impact']['water']['liters'],
+                                  impact['impact']['carbon']['kg'], timestamp))
+                elif 'savings' in record:
+                    savings = record['savings']
+                    batch.append((SAVINGS, user, department, savings['tokens']['saved'],
+                                  savings['energy']['wh'], savings['water']['liters'], savings['carbon']['kg'],
+                                  timestamp))
+                if len(batch) >= 10_000:
+                    count += len(journal.append_many(batch))
+                    batch = []
+            count += len(journal.append_many(batch))
+            journal.flush(fsync=True)
+            print(f"✅ {count:,} events appended; next seq {journal.next_seq:,}")
+    elif args.command == 'rebuild':
+        start = time.perf_counter()
+        projection = rebuild(args.directory, use_snapshot=not args.full)
+        seconds = time.perf_counter() - start
+        totals = projection.totals
+        print(f"🔁 Rebuilt to seq {projection.seq:,} in {seconds:.2f}s")
+        print(f"   {totals['totalQueries']:,} queries, {totals['totalCarbon']:.3f} kg CO₂, "
+              f"{totals['savedCarbon']:.3f} kg CO₂ saved; {len(projection.departments)} departments, "
+              f"{len(projection.users)} users, {len(projection.days)} days")
+        if args.snapshot:
+            print(f"📸 {write_snapshot(args.directory, projection)}")
+    else:
+        for first, path in segments(args.directory):
+            print(f"📄 {os.path.basename(path)}  {os.path.getsize(path) / 2**20:8.1f} MB  from seq {first:,}")
+        for seq, path in snapshots(args.directory):
+            print(f"📸 {os.path.basename(path)}  {os.path.getsize(path) / 2**10:8.1f} KB  at seq {seq:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""
+Ranked leaderboard for the Tetris and gamification displays
+
+The browser prototypes keep a handful of entries and re-sort the whole array
+on every score change. A ministry-wide board has thousands of participants,
+so here every participant sits in an ordered index keyed on (-score, user):
+
+  update / add / remove      O(log n)
+  rank of one user           O(log n)   (competition ranking: 1, 2, 2, 4)
+  top k, or k around a user  O(log n + k)
+
+Department rollups (members, total, average) are kept incrementally next to
+the user index, with their own ordered standings, so a department table costs
+no more than a top-k query.
+
+The index is sortedcontainers.SortedList when installed (pip install
+sortedcontainers) and the indexable skip list below otherwise; both give the
+bounds above.
+"""
+
+import random
+from typing import NamedTuple, Optional
+
+try:
+    from sortedcontainers import SortedList  # optional, faster
+except ImportError:
+    SortedList = None
+
+
+# ==============================================================================
+# Ordered index
+# ==============================================================================
+
+class _Node:
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value, level):
+        self.value = value
+        self.next = [None] * level
+        self.width = [1] * level   # positions from this node to next[i] (or past the end)
+
+
+class SkipList:
+    """
+    Indexable skip list: add, remove, bisect_left and positional access in
+    O(log n) expected time. Implements the part of SortedList's API the
+    leaderboard needs.
+    """
+
+    MAX_LEVEL = 32
+
+    def __init__(self, iterable=(), seed=None):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random(seed)
+        for value in iterable:
+            self.add(value)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+    def _random_level(self):
+        bits = self._random.getrandbits(self.MAX_LEVEL - 1)
+        return min(self.MAX_LEVEL, (bits & -bits).bit_length()) if bits else self.MAX_LEVEL
+
+    def _predecessors(self, value):
+        """Last node < value on every level, and its position (head = 0)."""
+        update = [self._head] * self._level
+        positions = [0] * self._level
+        node, position = self._head, 0
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].value < value:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = position
+        return update, positions
+
+    def add(self, value):
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                self._head.next[i] = None
+                self._head.width[i] = self._size + 1
+            self._level = level
+        update, positions = self._predecessors(value)
+        new = _Node(value, level)
+        position = positions[0] + 1
+        for i in range(level):
+            previous = update[i]
+            new.next[i] = previous.next[i]
+            previous.next[i] = new
+            new.width[i] = positions[i] + previous.width[i] + 1 - position
+            previous.width[i] = position - positions[i]
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, value):
+        update, _ = self._predecessors(value)
+        target = update[0].next[0]
+        if target is None or target.value != value:
+            raise ValueError(f"{value!r} not in list")
+        for i in range(self._level):
+            if update[i].next[i] is target:
+                update[i].width[i] += target.width[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].width[i] -= 1
+        self._size -= 1
+
+    def bisect_left(self, value):
+        """Number of values < value."""
+        _, positions = self._predecessors(value)
+        return positions[0]
+
+    def _node_at(self, index):
+        node, position = self._head, 0
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and position + node.width[i] <= index + 1:
+                position += node.width[i]
+                node = node.next[i]
+        return node
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('skip list index out of range')
+        return self._node_at(index).value
+
+    def islice(self, start=None, stop=None):
+        """Iterate over values start..stop-1 (positions, like SortedList.islice)."""
+        start = max(0, start or 0)
+        stop = self._size if stop is None else min(stop, self._size)
+        if start >= stop:
+            return
+        node = self._node_at(start)
+        for _ in range(stop - start):
+            yield node.value
+            node = node.next[0]
+
+
+def make_index():
+    return SortedList() if SortedList is not None else SkipList()
+
+
+BACKEND = 'sortedcontainers' if SortedList is not None else 'skiplist'
+
+
+# ==============================================================================
+# Leaderboard
+# ==============================================================================
+
+class Entry(NamedTuple):
+    rank: int
+    user: str
+    name: str
+    department: Optional[str]
+    score: float
+
+
+class Standing(NamedTuple):
+    rank: int
+    department: str
+    members: int
+    total: float
+    average: float
+
+
+class Leaderboard:
+    """
+    Scores per user, ranked highest first, with department rollups.
+
+    Departments are ranked by average score, so a small team competes on
+    equal terms with a large one. `index_factory` chooses the ordered index
+    (default: make_index).
+    """
+
+    def __init__(self, index_factory=make_index):
+        self._make_index = index_factory
+        self._index = index_factory()         # (-score, user)
+        self._by_department = {}              # department -> index of (-score, user)
+        self._users = {}                      # user -> (score, department, name)
+        self._totals = {}                     # department -> [members, total]
+        self._standings = index_factory()     # (-average, department)
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, user):
+        return user in self._users
+
+    # --------------------------------------------------------------------------
+    # Updates
+    # --------------------------------------------------------------------------
+
+    def update(self, user, score, department=None, name=None):
+        """Set `user`'s score; department and name default to their previous values."""
+        previous = self._users.get(user)
+        if previous is not None:
+            self._unlink(user, *previous)
+            department = previous[1] if department is None else department
+            name = name or previous[2]
+        self._users[user] = (score, department, name or user)
+        self._index.add((-score, user))
+        if department is not None:
+            if department not in self._by_department:
+                self._by_department[department] = self._make_index()
+            self._by_department[department].add((-score, user))
+            self._rollup(department, 1, score)
+
+    def add(self, user, points, department=None, name=None):
+        """Add `points` to `user`'s score (starting from 0) and return the new score."""
+        previous = self._users.get(user)
+        score = (previous[0] if previous else 0) + points
+        self.update(user, score, department, name)
+        return score
+
+    def remove(self, user):
+        self._unlink(user, *self._users.pop(user))
+
+    def _unlink(self, user, score, department, name):
+        self._index.remove((-score, user))
+        if department is not None:
+            self._by_department[department].remove((-score, user))
+            self._rollup(department, -1, -score)
+
+    def _rollup(self, department, members, points):
+        totals = self._totals.get(department)
+        if totals is None:
+            totals = self._totals[department] = [0, 0]
+        elif totals[0]:
+            self._standings.remove((-(totals[1] / totals[0]), department))
+        totals[0] += members
+        totals[1] += points
+        if totals[0]:
+            self._standings.add((-(totals[1] / totals[0]), department))
+        else:
+            del self._totals[department]
+            del self._by_department[department]
+
+    # --------------------------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------------------------
+
+    def score(self, user):
+        return self._users[user][0]
+
+    def rank(self, user, within_department=False):
+        """1-based rank; users with equal scores share a rank. KeyError for unknown users."""
+        score, department, _ = self._users[user]
+        index = self._by_department[department] if within_department and department is not None else self._index
+        return index.bisect_left((-score,)) + 1
+
+    def top(self, k=10, department=None):
+        """The `k` highest scores, overall or within `department`."""
+        index = self._index if department is None else self._by_department.get(department)
+        if index is None:
+            return []
+        return self._entries(index, 0, k)
+
+    def around(self, user, radius=2):
+        """`user` with up to `radius` participants either side, for "you are here" views."""
+        score = self._users[user][0]
+        position = self._index.bisect_left((-score, user))
+        return self._entries(self._index, max(0, position - radius), position + radius + 1)
+
+    def _entries(self, index, start, stop):
+        entries = []
+        previous_score = rank = None
+        for position, (negative_score, user) in enumerate(index.islice(start, stop), start):
+            score = -negative_score
+            if previous_score is None:
+                # a run of equal scores may start before the slice
+                rank = index.bisect_left((negative_score,)) + 1
+            elif score != previous_score:
+                rank = position + 1
+            previous_score = score
+            _, department, name = self._users[user]
+            entries.append(Entry(rank, user, name, department, score))
+        return entries
+
+    def department_standings(self, k=None):
+        """Departments by average score, highest first."""
+        standings = []
+        previous_average = rank = None
+        for position, (negative_average, department) in enumerate(self._standings.islice(0, k)):
+            average = -negative_average
+            if average != previous_average:
+                rank, previous_average = position + 1, average
+            members, total = self._totals[department]
+            standings.append(Standing(rank, department, members, total, average))
+        return standings
+
+    def department_rank(self, department):
+        members, total = self._totals[department]
+        return self._standings.bisect_left((-(total / members),)) + 1
+
+    def snapshot(self, k=10):
+        """
+        Top `k` as {user: {...}} for the push hub's 'leaderboard' topic. Write it
+        with ingest.write_json to the file `server.py --push` watches
+        (--leaderboard-data); only the entries that moved are pushed.
+        """
+        return {
+            entry.user: {'name': entry.name, 'score': entry.score, 'rank': entry.rank,
+                         'department': entry.department}
+            for entry in self.top(k)
+        }
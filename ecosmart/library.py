@@ -0,0 +1,684 @@
+"""
+Shared prompt library with an inverted index
+
+storage-manager.js keeps each user's library in chrome.storage.local and
+filters the whole array on every search, tag lookup and tag listing. A
+ministry-wide library has tens of thousands of prompts, so here every prompt
+is indexed when it is saved, updated or deleted:
+
+  terms     lower-cased words of the text and tags -> prompt ids
+  prefixes  first 1-3 characters of those words -> prompt ids
+  tags      tag -> prompt ids (exact, as getPromptsByTags)
+  rank      (use count, order added), most used and then newest first
+
+A query intersects the postings of its words. The last word matches as a
+prefix, so results appear while typing ("optim" finds "optimize"); short
+prefixes have their own postings and longer ones cover a narrow range of the
+sorted vocabulary. Earlier words must match whole. The top results are then
+read off the rank index (leaderboard.make_index), so neither matching nor
+ranking loops over the library in Python.
+
+Prompts have the storage-manager.js schema (id, text, tags, eco_score,
+tokens, impact, saved_at, last_used, use_count) and export/import use its
+JSON format. With a path, every change is appended to a JSONL log, which is
+replayed on start and rewritten by compact(); a save costs one line however
+large the library is.
+
+Run: python3 -m ecosmart.library [--port 8002] [--path prompt_library.jsonl] [--import export.json]
+                                 [--stats usage_stats.json]
+
+  GET    /prompts?q=optim&limit=50   -> {"prompts": [...], "total": n}   (searchPrompts)
+  GET    /prompts?tags=email,short   -> prompts with any of the tags     (getPromptsByTags)
+  GET    /prompts/<id>
+  GET    /tags                       -> sorted tags                      (getAllTags)
+  GET    /export                     -> exportLibraryAsJSON format
+  POST   /prompts                    {"text": ..., "tags": [...], ...}   (savePromptToLibrary)
+  PATCH  /prompts/<id>               {"tags": [...]}                     (updatePromptInLibrary)
+  DELETE /prompts/<id>                                                   (deletePromptFromLibrary)
+  POST   /prompts/<id>/use                                               (incrementPromptUseCount)
+  POST   /import?merge=false         an export                           (importLibraryFromJSON)
+  GET    /export.ndjson              the export streamed as NDJSON       (ecosmart.sync)
+  POST   /import.ndjson?merge=false  an NDJSON export, read in batches
+  POST   /stats                      NDJSON {"user": ..., "impact": ...} or {"user": ..., "savings": ...}
+                                     (updateUsageStats, recordSavings; written in batches)
+  GET    /stats/<user>               that user's usage stats
+"""
+
+import argparse
+import bisect
+import heapq
+import http.server
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+from itertools import islice
+from operator import itemgetter
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from . import sync
+from .leaderboard import make_index
+from .service import MAX_BODY, EstimationHandler, text_field
+
+PORT = 8002
+DEFAULT_PATH = 'prompt_library.jsonl'
+DEFAULT_STATS_PATH = 'usage_stats.json'
+WORD = re.compile(r'\w+')
+PREFIX_LENGTH = 3   # prefixes up to this long have their own postings
+SEARCH_LIMIT = 50
+WALK_COST_RATIO = 6
+EXPORT_VERSION = '1.0'
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def check_prompt(prompt_data):
+    """Raise ValueError unless `prompt_data` is an object with a string text and a list of string tags."""
+    if not isinstance(prompt_data, dict):
+        raise ValueError("each prompt must be an object")
+    if not isinstance(prompt_data.get('text'), str):
+        raise ValueError("'text' must be a string")
+    tags = prompt_data.get('tags') or []
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("'tags' must be a list of strings")
+
+
+def new_prompt(prompt_data, timestamp=None):
+    """A library prompt from `prompt_data`, with a new id and timestamps where it has none."""
+    check_prompt(prompt_data)
+    timestamp = timestamp or now_iso()
+    return {
+        'id': prompt_data.get('id') or str(uuid.uuid4()),
+        'text': prompt_data['text'],
+        'tags': list(prompt_data.get('tags') or []),
+        'eco_score': prompt_data.get('eco_score'),
+        'tokens': prompt_data.get('tokens'),
+        'impact': prompt_data.get('impact'),
+        'saved_at': prompt_data.get('saved_at') or timestamp,
+        'last_used': prompt_data.get('last_used') or timestamp,
+        'use_count': prompt_data.get('use_count') or 0,
+    }
+
+
+def terms_of(prompt):
+    """Index terms of a prompt: the words of its text and of its tags."""
+    text = ' '.join([prompt.get('text') or '', *(prompt.get('tags') or ())])
+    return set(WORD.findall(text.casefold()))
+
+
+def prefixes_of(terms):
+    """The first 1..PREFIX_LENGTH characters of each term."""
+    return {term[:n] for term in terms for n in range(1, min(len(term), PREFIX_LENGTH) + 1)}
+
+
+def unique_ids(prompts, taken):
+    """`prompts`, with the id dropped (so a new one is given) where it is in `taken` or repeated."""
+    seen = set()
+    for prompt in prompts:
+        if prompt.get('id') in taken or prompt.get('id') in seen:
+            prompt = {**prompt, 'id': None}
+        seen.add(prompt.get('id'))
+        yield prompt
+
+
+class PromptLibrary:
+    """
+    Prompts by id, with term and tag postings kept in step on every change.
+    Thread-safe. `path` (optional) is the JSONL change log.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._prompts = {}      # id -> prompt
+        self._terms = {}        # id -> set of terms
+        self._postings = {}     # term -> set of ids
+        self._vocabulary = []   # sorted terms, for longer prefixes
+        self._prefixes = {}     # short prefix -> set of ids
+        self._prompt_prefixes = {}  # id -> set of short prefixes
+        self._tags = {}         # tag -> set of ids
+        self._rank = {}         # id -> (-use count, -order added, id)
+        self._order = make_index()  # rank keys, most used first
+        self._sequence = make_index()  # (order added, id), for exports a chunk at a time
+        self._added = 0
+        self._lock = threading.RLock()
+        self._log = None
+        if path is not None:
+            if os.path.exists(path):
+                self._replay(path)
+            self._log = open(path, 'a', encoding='utf-8')
+
+    def __len__(self):
+        return len(self._prompts)
+
+    def __contains__(self, prompt_id):
+        return prompt_id in self._prompts
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # --------------------------------------------------------------------------
+    # Changes (savePromptToLibrary, updatePromptInLibrary, ...)
+    # --------------------------------------------------------------------------
+
+    def get(self, prompt_id):
+        """The prompt with `prompt_id`; KeyError if there is none."""
+        return self._prompts[prompt_id]
+
+    def save(self, prompt_data):
+        """Add a prompt and return it with its new id and timestamps."""
+        return self.save_many([prompt_data])[0]
+
+    def save_many(self, prompts):
+        """
+        Add several prompts with a single write to the log. Nothing is added
+        if any id is taken (ValueError).
+        """
+        timestamp = now_iso()
+        prompts = [new_prompt(prompt_data, timestamp) for prompt_data in prompts]
+        with self._lock:
+            self._add(prompts)
+        return prompts
+
+    def _add(self, prompts):
+        """Index and log prompts built by new_prompt (under the lock)."""
+        ids = {prompt['id'] for prompt in prompts}
+        if len(ids) < len(prompts) or not ids.isdisjoint(self._prompts):
+            raise ValueError("Prompt IDs must be new and distinct")
+        for prompt in prompts:
+            self._put(prompt)
+        self._append('save', prompts)
+
+    def update(self, prompt_id, updates):
+        """Merge `updates` into a prompt and re-index it; KeyError if it does not exist."""
+        with self._lock:
+            if prompt_id not in self._prompts:
+                raise KeyError(f"Prompt with ID {prompt_id} not found")
+            prompt = {**self._prompts[prompt_id], **updates, 'id': prompt_id}
+            check_prompt(prompt)
+            self._put(prompt)
+            self._append('update', [prompt])
+        return prompt
+
+    def delete(self, prompt_id):
+        """Remove a prompt; returns whether it existed."""
+        with self._lock:
+            if prompt_id not in self._prompts:
+                return False
+            self._remove(prompt_id)
+            self._append('delete', [{'id': prompt_id}])
+        return True
+
+    def clear(self):
+        """Remove every prompt."""
+        with self._lock:
+            for prompt_id in list(self._prompts):
+                self._remove(prompt_id)
+            self._append('clear', [{}])
+
+    def replace(self, prompts):
+        """Swap every prompt for `prompts` (built by new_prompt, ids distinct) in one step."""
+        with self._lock:
+            self.clear()
+            self._add(prompts)
+
+    def increment_use_count(self, prompt_id):
+        with self._lock:
+            prompt = self._prompts[prompt_id]
+            return self.update(prompt_id, {'use_count': (prompt.get('use_count') or 0) + 1, 'last_used': now_iso()})
+
+    # --------------------------------------------------------------------------
+    # Queries (searchPrompts, getPromptsByTags, getAllTags)
+    # --------------------------------------------------------------------------
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """
+        (prompts, total): up to `limit` prompts containing every word of
+        `query` in their text or tags, the last word as a prefix.
+        """
+        words = WORD.findall(query.casefold())
+        if not words:
+            return [], 0
+        *whole, prefix = words
+        with self._lock:
+            sets = [self._postings.get(word) for word in whole]
+            sets.append(self._prefix_ids(prefix))
+            if not all(sets):
+                return [], 0
+            sets.sort(key=len)
+            matches = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+            return self._ranked(matches, limit), len(matches)
+
+    def _prefix_ids(self, prefix):
+        if len(prefix) <= PREFIX_LENGTH:
+            return self._prefixes.get(prefix)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        stop = bisect.bisect_left(self._vocabulary, prefix + '\U0010ffff', start)
+        if stop - start == 1:
+            return self._postings[self._vocabulary[start]]
+        return set().union(*(self._postings[term] for term in self._vocabulary[start:stop]))
+
+    def by_tags(self, tags, limit=None):
+        """Prompts with any of `tags` (exact), most used first."""
+        tags = list(tags)
+        if not tags:
+            return []
+        with self._lock:
+            sets = [self._tags.get(tag, set()) for tag in tags]
+            ids = sets[0] if len(sets) == 1 else set().union(*sets)
+            return self._ranked(ids, limit)
+
+    def top(self, limit=None):
+        """Every prompt (or the first `limit`), most used first."""
+        with self._lock:
+            return self._ranked(self._prompts, limit)
+
+    def texts(self):
+        """The set of prompt texts, for de-duplicating imports."""
+        with self._lock:
+            return {prompt['text'] for prompt in self._prompts.values()}
+
+    def all_tags(self):
+        """Every tag in use, sorted."""
+        with self._lock:
+            return sorted(self._tags)
+
+    def _ranked(self, ids, limit):
+        """
+        The first `limit` of `ids` in rank order. Many matches: walk the rank
+        index until `limit` of them are seen (about limit * n / matches steps);
+        few: sort just those. Both run in C; a sorted match costs about as
+        much as WALK_COST_RATIO walked steps.
+        """
+        if limit is None or limit > len(ids):
+            limit = len(ids)
+        if limit * len(self._prompts) < WALK_COST_RATIO * len(ids) ** 2:
+            ordered = islice(filter(ids.__contains__, map(itemgetter(2), self._order)), limit)
+        else:
+            ordered = map(itemgetter(2), heapq.nsmallest(limit, map(self._rank.__getitem__, ids)))
+        return list(map(self._prompts.__getitem__, ordered))
+
+    # --------------------------------------------------------------------------
+    # Import / export (exportLibraryAsJSON, importLibraryFromJSON)
+    # --------------------------------------------------------------------------
+
+    def export(self):
+        with self._lock:
+            return {**self.export_header(), 'prompts': list(self._prompts.values())}
+
+    def export_header(self):
+        """The export without its prompts."""
+        return {'version': EXPORT_VERSION, 'exported_at': now_iso(), 'prompt_count': len(self._prompts)}
+
+    def iter_prompts(self, chunk_size):
+        """
+        Lists of up to `chunk_size` prompts, in the order they were added. The
+        lock is taken once per chunk, so the library can change between chunks:
+        prompts deleted by then are left out, prompts added are included.
+        """
+        after = (0,)
+        while True:
+            with self._lock:
+                start = self._sequence.bisect_left(after)
+                keys = list(self._sequence.islice(start, start + chunk_size))
+                chunk = [self._prompts[prompt_id] for _, prompt_id in keys]
+            if not chunk:
+                return
+            after = (keys[-1][0] + 1,)
+            yield chunk
+
+    def import_prompts(self, data, merge=True):
+        """
+        Add the prompts of an export. With `merge`, prompts whose text is
+        already in the library are skipped; otherwise the library is replaced.
+        Returns the number of prompts in the library afterwards.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('prompts'), list):
+            raise ValueError('Invalid import format')
+        for prompt_data in data['prompts']:
+            check_prompt(prompt_data)
+        timestamp = now_iso()
+        with self._lock:
+            # every prompt is built before anything changes, so a bad import leaves the library as it was
+            texts = self.texts() if merge else set()
+            fresh = (prompt for prompt in data['prompts'] if prompt['text'] not in texts)
+            prompts = [new_prompt(prompt_data, timestamp)
+                       for prompt_data in unique_ids(fresh, self._prompts if merge else ())]
+            if merge:
+                self._add(prompts)
+            else:
+                self.replace(prompts)
+            return len(self._prompts)
+
+    # --------------------------------------------------------------------------
+    # Index maintenance
+    # --------------------------------------------------------------------------
+
+    def _put(self, prompt):
+        prompt_id = prompt['id']
+        old = self._prompts.get(prompt_id)
+        new_terms = terms_of(prompt)
+        new_prefixes = prefixes_of(new_terms)
+        new_tags = set(prompt['tags'])
+        if old is None:
+            old_terms = old_prefixes = old_tags = set()
+            self._added += 1
+            self._sequence.add((self._added, prompt_id))
+            rank = (-(prompt.get('use_count') or 0), -self._added, prompt_id)
+        else:
+            old_terms, old_prefixes, old_tags = (self._terms[prompt_id], self._prompt_prefixes[prompt_id],
+                                                 set(old['tags']))
+            old_rank = self._rank[prompt_id]
+            rank = (-(prompt.get('use_count') or 0), old_rank[1], prompt_id)
+            if rank != old_rank:
+                self._order.remove(old_rank)
+        self._reindex(self._postings, old_terms, new_terms, prompt_id, vocabulary=True)
+        self._reindex(self._prefixes, old_prefixes, new_prefixes, prompt_id)
+        self._reindex(self._tags, old_tags, new_tags, prompt_id)
+        if old is None or rank != old_rank:
+            self._order.add(rank)
+        self._rank[prompt_id] = rank
+        self._prompts[prompt_id] = prompt
+        self._terms[prompt_id] = new_terms
+        self._prompt_prefixes[prompt_id] = new_prefixes
+
+    def _remove(self, prompt_id):
+        prompt = self._prompts.pop(prompt_id)
+        self._reindex(self._postings, self._terms.pop(prompt_id), set(), prompt_id, vocabulary=True)
+        self._reindex(self._prefixes, self._prompt_prefixes.pop(prompt_id), set(), prompt_id)
+        self._reindex(self._tags, set(prompt['tags']), set(), prompt_id)
+        rank = self._rank.pop(prompt_id)
+        self._order.remove(rank)
+        self._sequence.remove((-rank[1], prompt_id))
+
+    def _reindex(self, index, old_keys, new_keys, prompt_id, vocabulary=False):
+        for key in old_keys - new_keys:
+            self._unpost(index, key, prompt_id, vocabulary)
+        for key in new_keys - old_keys:
+            self._post(index, key, prompt_id, vocabulary)
+
+    def _post(self, index, key, prompt_id, vocabulary=False):
+        ids = index.get(key)
+        if ids is None:
+            ids = index[key] = set()
+            if vocabulary:
+                bisect.insort(self._vocabulary, key)
+        ids.add(prompt_id)
+
+    def _unpost(self, index, key, prompt_id, vocabulary=False):
+        ids = index[key]
+        ids.discard(prompt_id)
+        if not ids:
+            del index[key]
+            if vocabulary:
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, key)]
+
+    # --------------------------------------------------------------------------
+    # Change log
+    # --------------------------------------------------------------------------
+
+    def _append(self, op, prompts):
+        if self._log is not None:
+            self._log.write(''.join(json.dumps({'op': op, 'prompt': prompt}, ensure_ascii=False) + '\n'
+                                    for prompt in prompts))
+            self._log.flush()
+
+    def _replay(self, path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                prompt = change['prompt']
+                if change['op'] == 'clear':
+                    for prompt_id in list(self._prompts):
+                        self._remove(prompt_id)
+                elif change['op'] == 'delete':
+                    if prompt['id'] in self._prompts:
+                        self._remove(prompt['id'])
+                else:
+                    self._put(prompt)
+
+    def compact(self):
+        """Rewrite the log as one 'save' per prompt."""
+        if self.path is None:
+            return
+        with self._lock:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for prompt in self._prompts.values():
+                    f.write(json.dumps({'op': 'save', 'prompt': prompt}, ensure_ascii=False) + '\n')
+            self._log.close()
+            os.replace(tmp, self.path)
+            self._log = open(self.path, 'a', encoding='utf-8')
+
+
+# ==============================================================================
+# HTTP
+# ==============================================================================
+
+class LibraryHandler(EstimationHandler):
+    """The library as a JSON API, with the estimation service's CORS and keep-alive handling."""
+
+    def do_OPTIONS(self):
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PATCH, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Max-Age', '86400')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def route(self):
+        """(path parts, query) of the request URL."""
+        url = urlsplit(self.path)
+        return [unquote(part) for part in url.path.strip('/').split('/') if part], parse_qs(url.query)
+
+    def do_GET(self):
+        library = self.server.library
+        parts, query = self.route()
+        try:
+            limit = int(query['limit'][0]) if 'limit' in query else SEARCH_LIMIT
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            self.send_json({'error': 'limit must be a non-negative integer'}, HTTPStatus.BAD_REQUEST)
+            return
+        if parts == ['prompts']:
+            if 'q' in query:
+                prompts, total = library.search(query['q'][0], limit)
+            else:
+                tags = [tag for value in query.get('tags', ()) for tag in value.split(',') if tag]
+                prompts = library.by_tags(tags) if tags else library.top()
+                total = len(prompts)
+                prompts = prompts[:limit]
+            self.send_json({'prompts': prompts, 'total': total})
+        elif len(parts) == 2 and parts[0] == 'prompts':
+            self.send_prompt(parts[1], library.get)
+        elif parts == ['tags']:
+            self.send_json({'tags': library.all_tags()})
+        elif parts == ['export']:
+            self.send_json(library.export())
+        elif parts == ['export.ndjson']:
+            self.send_chunks(sync.library_chunks(library))
+        elif len(parts) == 2 and parts[0] == 'stats':
+            self.send_json(self.server.stats.get(parts[1]))
+        else:
+            self.send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+
+    def do_POST(self):
+        library = self.server.library
+        parts, query = self.route()
+        if len(parts) == 3 and parts[0] == 'prompts' and parts[2] == 'use':
+            self.send_prompt(parts[1], library.increment_use_count)
+            return
+        if parts == ['import.ndjson']:
+            self.import_ndjson(query.get('merge', ['true'])[0] != 'false')
+            return
+        if parts == ['stats']:
+            self.record_stats()
+            return
+        if parts not in (['prompts'], ['import']):
+            self.send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+            return
+        try:
+            body = self.read_json()
+            if parts == ['prompts']:
+                text_field(body, 'text')
+                self.send_json(library.save(body), HTTPStatus.CREATED)
+            else:
+                merge = query.get('merge', ['true'])[0] != 'false'
+                self.send_json({'prompt_count': library.import_prompts(body, merge)})
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+
+    def do_PATCH(self):
+        parts, _ = self.route()
+        if len(parts) != 2 or parts[0] != 'prompts':
+            self.send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+            return
+        try:
+            updates = self.read_json()
+            if 'text' in updates:
+                text_field(updates, 'text')
+        except ValueError as e:
+            self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+            return
+        self.send_prompt(parts[1], lambda prompt_id: self.server.library.update(prompt_id, updates))
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) == 2 and parts[0] == 'prompts' and self.server.library.delete(parts[1]):
+            self.send_json({'deleted': parts[1]})
+        else:
+            self.send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+
+    def import_ndjson(self, merge):
+        """
+        Stream an NDJSON library export from the request body into the library,
+        in batches. Without `merge`, the body is read into a new library that
+        replaces this one only once every line has been read.
+        """
+        library = self.server.library
+        try:
+            body = self.body_lines(self.content_length())
+            target = library if merge else PromptLibrary()
+            imported, skipped, lines = sync.import_library_lines(target, body, merge)
+            if not merge:
+                library.replace(target.export()['prompts'])
+        except ValueError as e:
+            self.close_connection = True  # the rest of the body is not read
+            self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+            return
+        self.send_json({'imported': imported, 'skipped': skipped, 'lines': lines, 'prompt_count': len(library)})
+
+    def record_stats(self):
+        """Stats events (NDJSON, or one JSON object) for the batcher: {"user": ..., "impact" or "savings": ...}."""
+        accepted = 0
+        try:
+            for line, _ in self.body_lines(self.content_length()):
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if not isinstance(event, dict) or 'user' not in event:
+                    raise ValueError("each stats event needs a 'user'")
+                self.server.stats.add(str(event['user']), sync.stats_delta(event))
+                accepted += 1
+        except (ValueError, KeyError, TypeError) as e:
+            self.close_connection = True
+            self.send_json({'error': f'event {accepted + 1}: {e}', 'accepted': accepted}, HTTPStatus.BAD_REQUEST)
+            return
+        self.send_json({'accepted': accepted}, HTTPStatus.ACCEPTED)
+
+    def body_lines(self, remaining):
+        """(line, bytes read) for each line of the `remaining` bytes of request body, read as they arrive."""
+        position = 0
+        while remaining > 0:
+            line = self.rfile.readline(min(remaining, MAX_BODY))
+            if not line:
+                break
+            remaining -= len(line)
+            position += len(line)
+            yield line, position
+
+    def send_chunks(self, chunks, content_type='application/x-ndjson; charset=utf-8'):
+        """Stream `chunks` with chunked transfer encoding."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def send_prompt(self, prompt_id, action):
+        try:
+            prompt = action(prompt_id)
+        except KeyError:
+            self.send_json({'error': f'prompt {prompt_id} not found'}, HTTPStatus.NOT_FOUND)
+            return
+        except (ValueError, TypeError) as e:
+            self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+            return
+        self.send_json(prompt)
+
+
+class LibraryServer(http.server.ThreadingHTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, library, stats=None, handler_class=LibraryHandler):
+        self.library = library
+        self.stats = stats if stats is not None else sync.StatsBatcher(sync.UsageStatsStore())
+        super().__init__(server_address, handler_class)
+
+    def server_close(self):
+        super().server_close()
+        self.stats.close()
+
+
+def make_server(port=PORT, path=None, host='', stats_path=None):
+    """
+    Create (but do not start) the library service on `port`, logging
+    library changes to `path` and batching usage stats into `stats_path`.
+    """
+    stats = sync.StatsBatcher(sync.UsageStatsStore(stats_path))
+    stats.flush_every()
+    return LibraryServer((host, port), PromptLibrary(path), stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an indexed prompt library over HTTP")
+    parser.add_argument('--port', type=int, default=PORT, help="port to listen on")
+    parser.add_argument('--path', default=DEFAULT_PATH, help="JSONL change log ('' keeps the library in memory)")
+    parser.add_argument('--import', dest='import_file', help="library export (JSON) to merge in on start")
+    parser.add_argument('--stats', default=DEFAULT_STATS_PATH, help="usage stats file ('' keeps them in memory)")
+    args = parser.parse_args(argv)
+
+    with make_server(args.port, args.path or None, stats_path=args.stats or None) as httpd:
+        library = httpd.library
+        if args.import_file:
+            with open(args.import_file, encoding='utf-8') as f:
+                library.import_prompts(json.load(f))
+        library.compact()
+        print(f"📚 Prompt library on http://localhost:{args.port}/prompts")
+        print(f"🔎 {len(library):,} prompts, {len(library.all_tags()):,} tags"
+              f"{f', changes logged to {args.path}' if args.path else ', in memory'}")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Service stopped")
+        finally:
+            library.close()
+
+
+if __name__ == '__main__':
+    main()
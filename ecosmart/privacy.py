@@ -0,0 +1,253 @@
+"""
+Privacy-preserving department rollup for the displays (k-anonymity)
+
+The partner feedback asks for department-level aggregation and no personal
+data on any display. ecosmart.ingest rolls usage up per department, but a
+department, or a single day, with one or two active people still shows what
+those people did. This stage makes the same single streaming pass and also
+counts the distinct users behind every figure. Each figure must have at
+least K of them before it is written:
+
+  department   published when its week and its month each have >= K users;
+               otherwise merged into OTHER with the other small departments,
+               and OTHER is dropped too if it still has < K users
+  trend        null when the week (or month) before has < K users, since
+               the current value minus the trend would give that period away
+  chart day    null when the day has < K users
+  week figure  energyUsage and promptEfficiency (and their trends) null
+               when any chart day is, since the week minus the days shown
+               would give that day away (its carbon is the week's energy
+               times the grid's intensity)
+
+The score stays: it is a whole number blended from efficiency, eco-scores
+and tool count, and no day can be taken back out of it. CO2 covers the
+month, whose other 23 days are not shown.
+
+The views that pass are written as files, one per display, so displays and
+the push server only ever read checked figures and nothing is checked at
+read time. User ids are held, as hashes, in memory during the pass only.
+Events without a user count for nobody, so figures made of them alone are
+withheld.
+
+Run: python3 -m ecosmart.privacy logs/usage-*.jsonl.gz --k 5 \\
+         --mirror prototypes/magic-mirror-department/department-data.json \\
+         --forest prototypes/digital-forest/forest-data.json
+"""
+
+import argparse
+from datetime import date, datetime
+from typing import NamedTuple
+
+from . import core_engine as engine
+from .ingest import CHUNK_SIZE, EPOCH_ORDINAL, TREND_KEYS, DepartmentRollup, ingest, write_json
+
+K_ANONYMITY = 5             # minimum distinct users behind any published figure
+OTHER = 'other'             # key and name of the merged small departments
+OTHER_NAME = 'Other departments'
+HORIZON_DAYS = 60           # the snapshot looks back over a month and the month before
+
+WEEK_TRENDS = tuple(key for key in TREND_KEYS if key != 'co2Impact')   # week vs the week before
+MONTH_TRENDS = ('co2Impact',)                                         # month vs the month before
+WEEK_TOTALS = ('promptEfficiency', 'energyUsage')                      # what the chart days add up to
+
+
+# ==============================================================================
+# Distinct users per department and day
+# ==============================================================================
+
+class Contributors:
+    """
+    Distinct users per department and day, kept for the `horizon` days up to
+    day ordinal `last_day` (events outside them are not counted), or without
+    one for the newest `horizon` days seen.
+    """
+
+    def __init__(self, horizon=HORIZON_DAYS, last_day=None):
+        self.horizon = horizon
+        self.last_day = last_day
+        self._days = {}         # day ordinal -> {department: set of user hashes}
+        self._newest = None
+
+    def add(self, events):
+        """Count the users of UsageEvents (events without a user are not counted)."""
+        days = self._days
+        last_day = self.last_day
+        for event in events:
+            if event.user is None:
+                continue
+            day = int(event.timestamp.timestamp()) // 86400 + EPOCH_ORDINAL
+            if last_day is not None and not last_day - self.horizon < day <= last_day:
+                continue
+            departments = days.get(day)
+            if departments is None:
+                departments = days[day] = {}
+            users = departments.get(event.department)
+            if users is None:
+                users = departments[event.department] = set()
+            users.add(hash(event.user))
+        newest = max(days, default=None)
+        if last_day is None and newest is not None and newest != self._newest:
+            self._newest = newest
+            for day in [day for day in days if day <= newest - self.horizon]:
+                del days[day]
+
+    def covers(self, end):
+        """Whether the users of the `horizon` days up to day ordinal `end` are all still counted."""
+        if self.last_day is not None:
+            return end == self.last_day
+        return self._newest is None or end >= self._newest
+
+    def count(self, departments, first, last):
+        """Distinct users of `departments` (a list of keys) from day ordinal `first` to `last`."""
+        users = set()
+        for day in range(first, last + 1):
+            cells = self._days.get(day)
+            if cells:
+                for department in departments:
+                    users.update(cells.get(department, ()))
+        return len(users)
+
+
+# ==============================================================================
+# Rollup
+# ==============================================================================
+
+class Cells(NamedTuple):
+    published: list     # departments shown under their own key
+    merged: list        # departments shown together as OTHER
+    suppressed: list    # departments not shown at all
+
+
+class PrivateRollup(DepartmentRollup):
+    """
+    DepartmentRollup whose snapshot() only holds figures backed by at least
+    `k` distinct users. The totals are kept in memory: contributor counts
+    are not persisted, so the logs of the horizon are ingested in one pass.
+    Users are counted for the days before `as_of` (default: the newest
+    event), which is then the only day a snapshot can be taken for.
+    """
+
+    def __init__(self, k=K_ANONYMITY, grid_profile=engine.DEFAULT_GRID_PROFILE, as_of=None):
+        super().__init__(grid_profile)
+        self.k = k
+        self.as_of = as_of
+        self.contributors = Contributors(last_day=as_of.date().toordinal() if as_of else None)
+
+    def add_chunk(self, marked_events):
+        super().add_chunk(marked_events)
+        self.contributors.add(event for event, _ in marked_events)
+
+    def _enough(self, departments, first, last):
+        return self.contributors.count(departments, first, last) >= self.k
+
+    def cells(self, end):
+        """Which departments are published, merged or suppressed for the report day `end`."""
+        published, small = [], []
+        for department in self.departments:
+            fits = self._enough([department], end - 6, end) and self._enough([department], end - 29, end)
+            (published if fits else small).append(department)
+        if small and self._enough(small, end - 6, end) and self._enough(small, end - 29, end):
+            return Cells(published, small, [])
+        return Cells(published, [], small)
+
+    def end(self, as_of=None):
+        return super().end(as_of or self.as_of)
+
+    def snapshot(self, as_of=None):
+        """
+        The departmentData object for mirror.js, with every figure below k
+        users withheld. ValueError if the users of the days it covers were
+        not all counted (a report day other than the rollup's `as_of`).
+        """
+        end = self.end(as_of)
+        if not self.contributors.covers(end):
+            raise ValueError(f"users were not counted for the {self.contributors.horizon} days up to "
+                             f"{date.fromordinal(end)}; give that day as as_of when creating the rollup")
+        cells = self.cells(end)
+        groups = [(department, self.store.department_name(department), [department])
+                  for department in cells.published]
+        if cells.merged:
+            groups.append((OTHER, OTHER_NAME, cells.merged))
+
+        data = {}
+        for key, name, departments in groups:
+            entry = self.entry(departments, end)
+            trends = entry['trends']
+            if not self._enough(departments, end - 13, end - 7):
+                trends.update(dict.fromkeys(WEEK_TRENDS))
+            if not self._enough(departments, end - 59, end - 30):
+                trends.update(dict.fromkeys(MONTH_TRENDS))
+            weekly = entry['weekly']
+            for index, day in enumerate(range(end - 6, end + 1)):
+                if not self._enough(departments, day, day):
+                    weekly['promptEfficiency'][index] = weekly['co2Impact'][index] = None
+            if None in weekly['co2Impact']:
+                entry.update(dict.fromkeys(WEEK_TOTALS))
+                trends.update(dict.fromkeys(WEEK_TOTALS))
+            data[key] = {'name': name, **entry}
+        return data
+
+
+# ==============================================================================
+# Views
+# ==============================================================================
+
+def forest_view(departments):
+    """Department health for the Digital Forest, in the push hub's forest format."""
+    return {key: {'name': department['name'], 'health': department['score']}
+            for key, department in departments.items()}
+
+
+# display -> view of the checked departmentData (mirror.js and the push hub's 'departments' topic
+# read the snapshot as it is)
+VIEWS = {
+    'mirror': lambda departments: departments,
+    'forest': forest_view,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roll usage logs up into k-anonymous views for the displays")
+    parser.add_argument('logs', nargs='+', help="JSONL/CSV usage exports (.gz allowed, '-' for stdin)")
+    parser.add_argument('--k', type=int, default=K_ANONYMITY, help="minimum distinct users behind a figure")
+    for display in VIEWS:
+        parser.add_argument(f'--{display}', metavar='FILE', help=f"write the {display} view to FILE")
+    parser.add_argument('--as-of', type=date.fromisoformat, help="report date (default: newest event)")
+    parser.add_argument('--grid-profile', default=engine.DEFAULT_GRID_PROFILE, choices=engine.GRID_PROFILES,
+                        help="grid profile for records without one")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="events per vectorized batch")
+    args = parser.parse_args(argv)
+    outputs = {display: getattr(args, display) for display in VIEWS if getattr(args, display)}
+    if not outputs:
+        parser.error(f"give at least one of {', '.join('--' + display for display in VIEWS)}")
+    if args.k < 1:
+        parser.error("--k must be at least 1")
+
+    errors = {}
+    as_of = datetime.combine(args.as_of, datetime.min.time()) if args.as_of else None
+    rollup = ingest(args.logs, PrivateRollup(args.k, args.grid_profile, as_of), args.chunk_size, errors)
+    try:
+        departments = rollup.snapshot()
+    except ValueError as exc:   # the 60 days before --as-of are no longer in the day ring
+        raise SystemExit(f"❌ --as-of {args.as_of} is too long before the newest event: {exc}")
+    for display, path in outputs.items():
+        write_json(VIEWS[display](departments), path)
+
+    cells = rollup.cells(rollup.end())
+    print(f"✅ {rollup.events:,} events, k = {args.k} → {', '.join(outputs.values())}")
+    print(f"🏢 Published: {', '.join(cells.published) or 'none'}")
+    if cells.merged:
+        print(f"🔀 Merged into '{OTHER}': {', '.join(cells.merged)}")
+    if cells.suppressed:
+        print(f"🙈 Suppressed (fewer than {args.k} users): {', '.join(cells.suppressed)}")
+    withheld = sum(value is None for department in departments.values()
+                   for value in (*(department[key] for key in WEEK_TOTALS), *department['trends'].values(),
+                                 *department['weekly']['co2Impact']))
+    if withheld:
+        print(f"🔒 Withheld {withheld} figures, trends and chart days with fewer than {args.k} users")
+    if errors:
+        print(f"⚠️  Skipped: {', '.join(f'{count:,} {kind}' for kind, count in errors.items())}")
+
+
+if __name__ == '__main__':
+    main()
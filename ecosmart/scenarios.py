@@ -0,0 +1,454 @@
+"""
+Carbon-aware what-if simulator: a quarter of usage under every scenario
+
+Replays usage logs under a grid of scenarios and reports, for each, the
+energy, water and carbon of the whole period and what it saves against the
+baseline (the default grid profile, the logged output tokens, the profile's
+flat carbon intensity, no load shifted):
+
+  grid profile   every ENVIRONMENTAL_CONSTANTS profile
+  output type    the logged output tokens ('observed'), or every prompt
+                 answered at one OUTPUT_RATIOS ratio (estimate_output_tokens)
+  curve          'flat' (the profile's CIF) or an hourly carbon-intensity
+                 curve loaded from a local CSV file (see load_curve)
+  shift          share of each day's energy moved to the day's cleanest hour
+                 of the curve (deferrable batch work, carbon-aware scheduling)
+
+An event's energy depends only on its tokens, so only the output type needs a
+pass over the events. Those passes run in a process pool whose workers read
+the event arrays from shared memory and return energy per department and
+hour. Profiles, curves and shifts then act on those hourly totals only, as a
+few small matrix products, so the grid costs about as much as its output types.
+
+Run: python3 -m ecosmart.scenarios logs/usage-2026-q3-*.jsonl.gz --usage q3.npz \\
+         --curves grid/nl-2025.csv grid/se-2025.csv --shift 0,0.25,0.5 --out savings.csv
+     python3 -m ecosmart.scenarios --usage q3.npz --curves grid/nl-2025.csv --shape --top 20
+
+The first run parses the logs and keeps their arrays in --usage; later runs
+start from there.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from . import core_engine as engine
+from . import ingest
+
+OBSERVED = 'observed'       # output-type scenario: the logged output tokens
+FLAT = 'flat'               # curve: the grid profile's constant CIF
+TASK_EVENTS = 1 << 20       # events per worker task
+DEFAULT_SHIFTS = (0.0, 0.25, 0.5)
+
+# CSV columns a curve file may use (ElectricityMaps exports included)
+TIME_COLUMNS = ('hour', 'datetime', 'timestamp', 'Datetime (UTC)')
+INTENSITY_COLUMNS = ('carbon_intensity', 'intensity', 'gco2_per_kwh', 'Carbon Intensity gCO₂eq/kWh (direct)',
+                     'Carbon Intensity gCO₂eq/kWh (LCA)')
+
+
+# ==============================================================================
+# Usage
+# ==============================================================================
+
+class Usage(NamedTuple):
+    """A period of usage as parallel arrays, one entry per logged prompt."""
+    start: datetime             # midnight (UTC) before the first event: hour 0
+    hours: int                  # whole days, so load can be shifted within a day
+    departments: tuple
+    input_tokens: np.ndarray    # int64
+    output_tokens: np.ndarray   # int64, 0 where the log has none
+    hour: np.ndarray            # int32 hours since `start`
+    department: np.ndarray      # int16 index into `departments`
+
+    @property
+    def events(self):
+        return len(self.input_tokens)
+
+    @property
+    def days(self):
+        return self.hours // 24
+
+    @classmethod
+    def from_events(cls, events, chunk_size=ingest.CHUNK_SIZE):
+        """Usage of ingest.UsageEvents, read in chunks."""
+        codes = {}
+        columns = ([], [], [], [])
+        iterator = iter(events)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            columns[0].append(np.fromiter((e.input_tokens for e in chunk), np.int64, len(chunk)))
+            columns[1].append(np.fromiter((e.output_tokens for e in chunk), np.int64, len(chunk)))
+            columns[2].append(np.fromiter((int(e.timestamp.timestamp()) for e in chunk), np.int64, len(chunk)))
+            columns[3].append(np.fromiter((codes.setdefault(e.department, len(codes)) for e in chunk),
+                                          np.int16, len(chunk)))
+        if not columns[0]:
+            raise ValueError("no usage events")
+        inputs, outputs, seconds, department = (np.concatenate(column) for column in columns)
+        first = int(seconds.min()) // 86400 * 86400
+        days = (int(seconds.max()) - first) // 86400 + 1
+        return cls(datetime.fromtimestamp(first, tz=timezone.utc), days * 24, tuple(codes),
+                   inputs, outputs, ((seconds - first) // 3600).astype(np.int32), department)
+
+    def save(self, path):
+        np.savez(path, start=self.start.timestamp(), hours=self.hours, departments=np.array(self.departments),
+                 input_tokens=self.input_tokens, output_tokens=self.output_tokens, hour=self.hour,
+                 department=self.department)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(datetime.fromtimestamp(float(data['start']), tz=timezone.utc), int(data['hours']),
+                       tuple(data['departments'].tolist()), data['input_tokens'], data['output_tokens'],
+                       data['hour'], data['department'])
+
+
+def load_usage(paths, errors=None):
+    """Usage from JSONL/CSV usage logs, through the ingest parser."""
+    records = (record for path in paths for record in ingest.read_records(path, errors=errors))
+    return Usage.from_events(ingest.parse_events(records, errors))
+
+
+# ==============================================================================
+# Carbon-intensity curves
+# ==============================================================================
+
+class Curve(NamedTuple):
+    """
+    Carbon intensity in kg CO2e/kWh by hour of day (24 values), hour of week
+    (168, Monday 00:00 first) or for given hours (`times`, a series).
+    """
+    name: str
+    values: np.ndarray
+    times: Optional[np.ndarray] = None      # epoch hours, for a series
+
+    def hourly(self, start, hours):
+        """(intensity for each hour from `start`, share of those hours the curve covers)."""
+        if self.times is None:
+            offset = start.hour if len(self.values) == 24 else start.weekday() * 24 + start.hour
+            return self.values[(offset + np.arange(hours)) % len(self.values)], 1.0
+        first = int(start.timestamp()) // 3600
+        intensity = np.full(hours, np.nan)
+        inside = (self.times >= first) & (self.times < first + hours)
+        intensity[self.times[inside] - first] = self.values[inside]
+        covered = ~np.isnan(intensity)
+        if not covered.any():
+            raise ValueError(f"curve {self.name} has no values between {start:%Y-%m-%d} and "
+                             f"{start + timedelta(hours=hours):%Y-%m-%d}")
+        intensity[~covered] = intensity[covered].mean()
+        return intensity, covered.mean()
+
+
+def load_curve(path, name=None):
+    """
+    A Curve from a CSV file with a time column (TIME_COLUMNS) and an intensity
+    column in g CO2e/kWh (INTENSITY_COLUMNS). Times are either hours 0-23 or
+    0-167 (a typical day or week) or timestamps (a series, e.g. an
+    ElectricityMaps hourly export).
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"{path}: no rows")
+    time_column = next((column for column in TIME_COLUMNS if column in rows[0]), None)
+    intensity_column = next((column for column in INTENSITY_COLUMNS if column in rows[0]), None)
+    if time_column is None or intensity_column is None:
+        raise ValueError(f"{path}: needs a time column ({', '.join(TIME_COLUMNS)}) and an intensity column "
+                         f"({', '.join(INTENSITY_COLUMNS)})")
+    rows = [row for row in rows if row[intensity_column].strip()]
+    values = np.array([float(row[intensity_column]) for row in rows]) / 1000   # g -> kg per kWh
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    stamps = [row[time_column].strip() for row in rows]
+    if all(stamp.isdigit() for stamp in stamps):
+        positions = np.array([int(stamp) for stamp in stamps])
+        length = 24 if positions.max() < 24 else 168
+        if positions.max() >= 168 or len(set(positions.tolist())) != length:
+            raise ValueError(f"{path}: hours must cover 0-23 or 0-167 exactly once")
+        ordered = np.empty(length)
+        ordered[positions] = values
+        return Curve(name, ordered)
+    hours = np.array([int(ingest.parse_timestamp(stamp).timestamp()) // 3600 for stamp in stamps])
+    order = np.argsort(hours, kind='stable')
+    return Curve(name, values[order], hours[order])
+
+
+# ==============================================================================
+# Hourly energy (the only pass over the events)
+# ==============================================================================
+
+_shared = None  # worker state: (arrays, shared memory blocks, output types, departments, hours)
+
+
+def _share(arrays):
+    """Copy `arrays` into new shared memory blocks; returns (blocks, specs for _attach)."""
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach(specs, output_types, departments, hours):
+    """
+    Pool initializer: map the shared event arrays (no copy). Pool workers
+    share the parent's resource tracker, so the parent's unlink is the only
+    cleanup needed.
+    """
+    global _shared
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in specs.items():
+        block = SharedMemory(name=block_name)
+        arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+        blocks.append(block)
+    _shared = (arrays, blocks, output_types, departments, hours)
+
+
+def _energy_task(start, stop):
+    """Energy (Wh) of events start:stop by output type, department and hour."""
+    arrays, _, output_types, departments, hours = _shared
+    inputs = arrays['input_tokens'][start:stop]
+    cells = arrays['department'][start:stop].astype(np.intp) * hours + arrays['hour'][start:stop]
+    energy = np.empty((len(output_types), departments * hours))
+    for i, output_type in enumerate(output_types):
+        if output_type == OBSERVED:
+            logged = arrays['output_tokens'][start:stop]
+            outputs = np.where(logged != 0, logged, engine.estimate_output_tokens(inputs))
+        else:
+            outputs = engine.estimate_output_tokens(inputs, output_type)
+        energy[i] = np.bincount(cells, engine.calculate_energy(inputs, outputs), departments * hours)
+    return energy.reshape(len(output_types), departments, hours)
+
+
+def hourly_energy(usage, output_types, workers=None):
+    """
+    Energy in Wh as an (output type, department, hour) array. With more than
+    one worker the events are split into TASK_EVENTS tasks over a process
+    pool that shares the event arrays; otherwise they run in this process.
+    """
+    arrays = {'input_tokens': usage.input_tokens, 'output_tokens': usage.output_tokens,
+              'hour': usage.hour, 'department': usage.department}
+    ranges = [(start, min(start + TASK_EVENTS, usage.events)) for start in range(0, usage.events, TASK_EVENTS)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        global _shared
+        _shared = (arrays, [], tuple(output_types), len(usage.departments), usage.hours)
+        try:
+            return sum(_energy_task(start, stop) for start, stop in ranges)
+        finally:
+            _shared = None
+
+    blocks, specs = _share(arrays)
+    try:
+        with ProcessPoolExecutor(workers, initializer=_attach,
+                                 initargs=(specs, tuple(output_types), len(usage.departments), usage.hours)) as pool:
+            return sum(pool.map(_energy_task, *zip(*ranges)))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+# ==============================================================================
+# Scenario grid
+# ==============================================================================
+
+class ScenarioGrid(NamedTuple):
+    """
+    Totals for every scenario. Arrays are indexed [profile, output type,
+    curve, shift, department]; energy does not depend on profile, curve or
+    shift and water not on curve or shift, so those axes are left out.
+    """
+    profiles: tuple
+    output_types: tuple
+    curves: tuple               # FLAT first
+    shifts: tuple               # 0.0 first
+    departments: tuple
+    energy_wh: np.ndarray       # [output type, department]
+    water_liters: np.ndarray    # [profile, output type, department]
+    carbon_kg: np.ndarray       # [profile, output type, curve, shift, department]
+    coverage: dict              # curve -> share of the period's hours it had values for
+
+    @property
+    def size(self):
+        return len(self.profiles) * len(self.output_types) * len(self.curves) * len(self.shifts)
+
+    @property
+    def baseline(self):
+        """(profile, output type, curve, shift) indices savings are measured against."""
+        profile = self.profiles.index(engine.DEFAULT_GRID_PROFILE) if engine.DEFAULT_GRID_PROFILE in self.profiles else 0
+        output = self.output_types.index(OBSERVED) if OBSERVED in self.output_types else 0
+        return profile, output, 0, 0
+
+    def totals(self, department=None):
+        """(energy, water, carbon) broadcast to [profile, output type, curve, shift]."""
+        select = (lambda array: array.sum(-1)) if department is None else \
+            (lambda array: array[..., self.departments.index(department)])
+        shape = (len(self.profiles), len(self.output_types), len(self.curves), len(self.shifts))
+        energy = np.broadcast_to(select(self.energy_wh)[None, :, None, None], shape)
+        water = np.broadcast_to(select(self.water_liters)[:, :, None, None], shape)
+        return energy, water, select(self.carbon_kg)
+
+    def savings(self, metric='carbon_kg', department=None):
+        """Baseline minus each scenario for `metric`, as a [profile, output type, curve, shift] array."""
+        values = self.totals(department)[('energy_wh', 'water_liters', 'carbon_kg').index(metric)]
+        return values[self.baseline] - values
+
+    def rows(self, by_department=False):
+        """One dict per scenario (and department), with totals and savings against the baseline."""
+        for department in (self.departments if by_department else (None,)):
+            energy, water, carbon = self.totals(department)
+            base = self.baseline
+            for index in np.ndindex(carbon.shape):
+                p, o, c, s = index
+                row = {'profile': self.profiles[p], 'output_type': self.output_types[o],
+                       'curve': self.curves[c], 'shift': self.shifts[s]}
+                if by_department:
+                    row['department'] = department
+                for name, values in (('energy_wh', energy), ('water_liters', water), ('carbon_kg', carbon)):
+                    value, before = float(values[index]), float(values[base])
+                    row[name] = value
+                    row[f'{name}_saved'] = before - value
+                    row[f'{name}_saved_pct'] = round((before - value) / before * 100, 1) + 0.0 if before else None
+                yield row
+
+
+def simulate(usage, profiles=engine.GRID_PROFILES, output_types=(OBSERVED, *engine.OUTPUT_TYPES), curves=(),
+             shifts=DEFAULT_SHIFTS, shape=False, workers=None):
+    """
+    Evaluate every combination of `profiles`, `output_types`, `curves`
+    (Curve objects; FLAT is always included) and `shifts` (0 is always
+    included) over `usage`. With `shape`, each curve only gives the hourly
+    pattern, scaled so that its mean is the profile's CIF.
+    """
+    unknown = [name for name in profiles if name not in engine.ENVIRONMENTAL_CONSTANTS] + \
+              [name for name in output_types if name != OBSERVED and name not in engine.OUTPUT_RATIOS]
+    if unknown:
+        raise ValueError(f"unknown profile or output type: {', '.join(unknown)}")
+    shifts = (0.0, *sorted({float(share) for share in shifts} - {0.0}))
+    if not all(0 <= share <= 1 for share in shifts):
+        raise ValueError("shifts must be between 0 and 1")
+
+    energy = hourly_energy(usage, output_types, workers)        # [output type, department, hour]
+    cif = np.array([engine.ENVIRONMENTAL_CONSTANTS[name]['CIF'] for name in profiles])
+    intensity = np.empty((len(profiles), len(curves) + 1, usage.hours))   # kg/kWh [profile, curve, hour]
+    intensity[:, 0] = cif[:, None]
+    coverage = {FLAT: 1.0}
+    for c, curve in enumerate(curves, 1):
+        hourly, coverage[curve.name] = curve.hourly(usage.start, usage.hours)
+        intensity[:, c] = cif[:, None] * (hourly / hourly.mean()) if shape else hourly
+
+    # carbon as used, and with all of a day's energy in the day's cleanest hour
+    days = usage.days
+    as_used = np.einsum('odh,pch->pocd', energy, intensity) / 1000
+    daily_energy = energy.reshape(len(output_types), -1, days, 24).sum(-1)
+    cleanest = intensity.reshape(len(profiles), -1, days, 24).min(-1)
+    shifted = np.einsum('odk,pck->pocd', daily_energy, cleanest) / 1000
+    share = np.array(shifts)[None, None, None, :, None]
+    carbon = (1 - share) * as_used[:, :, :, None] + share * shifted[:, :, :, None]
+
+    totals = energy.sum(-1)                                     # [output type, department]
+    water = np.stack([engine.calculate_water(totals, name) for name in profiles])
+    return ScenarioGrid(tuple(profiles), tuple(output_types), (FLAT, *(curve.name for curve in curves)), shifts,
+                        usage.departments, totals, water, carbon, coverage)
+
+
+# ==============================================================================
+# Output
+# ==============================================================================
+
+def write_rows(rows, path):
+    """Write scenario rows as CSV, or JSON for a .json path, atomically."""
+    rows = list(rows)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        if path.endswith('.json'):
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def parse_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay usage under every grid profile, output type, "
+                                                 "carbon-intensity curve and load shift")
+    parser.add_argument('logs', nargs='*', help="JSONL/CSV usage exports (.gz allowed)")
+    parser.add_argument('--usage', metavar='NPZ', help="parsed usage arrays: written when logs are given, "
+                                                      "read otherwise")
+    parser.add_argument('--curves', nargs='+', default=[], metavar='CSV', help="hourly carbon-intensity curves")
+    parser.add_argument('--shape', action='store_true',
+                        help="use the curves' hourly pattern around each profile's CIF, not their level")
+    parser.add_argument('--profiles', type=parse_list, default=list(engine.GRID_PROFILES))
+    parser.add_argument('--output-types', type=parse_list, default=[OBSERVED, *engine.OUTPUT_TYPES])
+    parser.add_argument('--shift', type=parse_list, default=[str(share) for share in DEFAULT_SHIFTS],
+                        help="shares of daily energy moved to the cleanest hour (comma-separated)")
+    parser.add_argument('--workers', type=int, help="processes for the pass over the events (default: one per CPU)")
+    parser.add_argument('--by-department', action='store_true', help="one row per scenario and department")
+    parser.add_argument('--out', help="savings matrix as CSV (or JSON for a .json path)")
+    parser.add_argument('--top', type=int, default=10, help="scenarios to print, by carbon saved")
+    args = parser.parse_args(argv)
+    if not args.logs and not args.usage:
+        parser.error("give usage logs, --usage, or both")
+
+    start = time.perf_counter()
+    if args.logs:
+        errors = {}
+        usage = load_usage(args.logs, errors)
+        if args.usage:
+            usage.save(args.usage)
+        if errors:
+            print(f"⚠️  Skipped: {', '.join(f'{count:,} {kind}' for kind, count in errors.items())}")
+    else:
+        usage = Usage.load(args.usage)
+    loaded = time.perf_counter()
+    try:
+        curves = [load_curve(path) for path in args.curves]
+        grid = simulate(usage, args.profiles, args.output_types, curves, [float(share) for share in args.shift],
+                        args.shape, args.workers)
+    except ValueError as exc:
+        raise SystemExit(f"❌ {exc}")
+    done = time.perf_counter()
+
+    print(f"✅ {usage.events:,} events, {len(usage.departments)} departments, {usage.days} days "
+          f"from {usage.start:%Y-%m-%d} (loaded in {loaded - start:.1f}s)")
+    print(f"🧮 {grid.size:,} scenarios in {done - loaded:.2f}s")
+    for name, share in grid.coverage.items():
+        if share < 1:
+            print(f"⚠️  Curve {name} covers {share:.0%} of the hours; the rest use its mean")
+
+    energy, water, carbon = grid.totals()
+    base = grid.baseline
+    print(f"📍 Baseline {grid.profiles[base[0]]}, {grid.output_types[base[1]]}: {energy[base] / 1000:,.1f} kWh, "
+          f"{water[base]:,.0f} L, {carbon[base]:,.1f} kg CO2e")
+    rows = list(grid.rows())
+    print(f"\n{'profile':<16}{'output':<10}{'curve':<14}{'shift':>6}{'kg CO2e':>12}{'saved':>10}{'kWh':>10}"
+          f"{'water L':>11}")
+    for row in sorted(rows, key=lambda row: -row['carbon_kg_saved'])[:args.top]:
+        saved = f"{row['carbon_kg_saved_pct']:+.1f}%" if row['carbon_kg_saved_pct'] is not None else '—'
+        print(f"{row['profile']:<16}{row['output_type']:<10}{row['curve']:<14}{row['shift']:>6.2f}"
+              f"{row['carbon_kg']:>12,.1f}{saved:>10}{row['energy_wh'] / 1000:>10,.1f}{row['water_liters']:>11,.0f}")
+
+    if args.out:
+        write_rows(grid.rows(args.by_department), args.out)
+        print(f"\n💾 Savings matrix → {args.out}")
+
+
+if __name__ == '__main__':
+    main()
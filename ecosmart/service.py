@@ -0,0 +1,295 @@
+"""
+Impact-estimation HTTP service with a shared result cache
+
+The extension and the dashboard both run calculateEnvironmentalImpact on
+every keystroke, and comparePrompts runs it twice. Library prompts are
+estimated over and over. This service computes each estimate once and serves
+it to every client from a bounded LRU cache with a time-to-live.
+
+The cache key is the SHA-256 of the normalized prompt text (Unicode NFC,
+newlines as \\n, surrounding whitespace stripped) plus the output type, grid
+profile and custom output token count. Unknown types and profiles count as
+'general' and AZURE_OPENAI, as in the engine. The estimate is made for the
+normalized text, so a cached result is always the one a fresh calculation
+would give.
+
+Run: python3 -m ecosmart.service [--port 8001] [--cache-size 10000] [--ttl 3600] [--tokenizer bpe]
+     (with --tokenizer bpe, ECOSMART_BPE_VOCAB names a model's .tiktoken file)
+
+  POST /estimate  {"prompt": "...", "outputType": "code", "gridProfile": "AZURE_OPENAI"}
+                  -> calculateEnvironmentalImpact result
+  POST /compare   {"original": "...", "optimized": "...", "outputType": ..., "gridProfile": ...}
+                  -> comparePrompts result
+  GET  /metrics   -> cache size, hits, misses, hit rate, evictions, expirations
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from . import core_engine as engine
+
+PORT = 8001
+CACHE_SIZE = 10_000     # estimates kept; one is about 2 KB
+CACHE_TTL = 3600        # seconds before an estimate is computed again
+MAX_BODY = 1 << 20      # bytes accepted in a request body
+
+
+def normalize_prompt(text):
+    """The form of `text` that is estimated and hashed."""
+    text = unicodedata.normalize('NFC', text)
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+def cache_key(prompt, output_type='general', grid_profile=engine.DEFAULT_GRID_PROFILE,
+              custom_output_tokens=None):
+    """(prompt hash, output type, grid profile, custom output tokens), with names canonicalized."""
+    digest = hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+    output_type = output_type if output_type in engine.OUTPUT_RATIOS else 'general'
+    grid_profile = grid_profile if grid_profile in engine.ENVIRONMENTAL_CONSTANTS else engine.DEFAULT_GRID_PROFILE
+    return digest, output_type, grid_profile, custom_output_tokens or None
+
+
+class TTLCache:
+    """
+    LRU cache bounded by entry count, whose entries also expire after `ttl`
+    seconds. Thread-safe; counts hits, misses, evictions and expirations.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires, value), least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The cached value for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.maxsize,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class ImpactEstimator:
+    """
+    calculate_environmental_impact and compare_prompts behind a TTLCache.
+    `token_counter` is passed on to the engine (default: chars/4, as in the browser).
+    """
+
+    def __init__(self, cache=None, token_counter=None):
+        self.cache = cache if cache is not None else TTLCache()
+        self.token_counter = token_counter
+
+    def estimate(self, prompt, output_type='general', grid_profile=engine.DEFAULT_GRID_PROFILE,
+                 custom_output_tokens=None):
+        """
+        Impact of the normalized `prompt`, shaped like the JS result. The
+        timestamp is the time of this call; everything below 'tokens',
+        'impact' and 'metadata' is shared with the cache and must not be modified.
+        """
+        key = cache_key(prompt, output_type, grid_profile, custom_output_tokens)
+        result = self.cache.get(key)
+        if result is None:
+            result = engine.calculate_environmental_impact(normalize_prompt(prompt), key[1], key[2], key[3],
+                                                           self.token_counter)
+            self.cache.put(key, result)
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        return {**result, 'metadata': {**result['metadata'], 'timestamp': timestamp}}
+
+    def compare(self, original_prompt, optimized_prompt, **options):
+        """compare_prompts, with both sides looked up in the cache."""
+        original = self.estimate(original_prompt, **options)
+        optimized = self.estimate(optimized_prompt, **options)
+        return {'original': original, 'optimized': optimized,
+                'savings': engine.savings_between(original, optimized)}
+
+    def metrics(self):
+        return self.cache.metrics()
+
+
+# ==============================================================================
+# HTTP
+# ==============================================================================
+
+def estimate_options(body):
+    """Keyword arguments for ImpactEstimator.estimate from a request body."""
+    output_tokens = body.get('customOutputTokens')
+    if output_tokens is not None and (type(output_tokens) is not int or output_tokens < 0):
+        raise ValueError("customOutputTokens must be a non-negative integer")
+    return {
+        'output_type': str(body.get('outputType', 'general')),
+        'grid_profile': str(body.get('gridProfile', engine.DEFAULT_GRID_PROFILE)),
+        'custom_output_tokens': output_tokens,
+    }
+
+
+def text_field(body, name):
+    value = body.get(name)
+    if not isinstance(value, str):
+        raise ValueError(f"'{name}' must be a string")
+    return value
+
+
+class EstimationHandler(http.server.BaseHTTPRequestHandler):
+    """JSON API over HTTP/1.1 keep-alive; CORS is open so the extension can call it."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_OPTIONS(self):
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Max-Age', '86400')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/metrics':
+            self.send_json(self.server.estimator.metrics())
+        else:
+            self.send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        if path not in ('/estimate', '/compare'):
+            self.send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+            return
+        try:
+            body = self.read_json()
+            options = estimate_options(body)
+            estimator = self.server.estimator
+            if path == '/estimate':
+                result = estimator.estimate(text_field(body, 'prompt'), **options)
+            else:
+                result = estimator.compare(text_field(body, 'original'), text_field(body, 'optimized'), **options)
+        except ValueError as e:
+            self.send_json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
+            return
+        self.send_json(result)
+
+    def content_length(self):
+        """The request's Content-Length (0 without one); ValueError unless it is a byte count."""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # where the body ends is unknown
+            raise ValueError("Content-Length must be a non-negative integer")
+        return length
+
+    def read_json(self):
+        length = self.content_length()
+        if length > MAX_BODY:
+            self.close_connection = True  # the body is not read
+            raise ValueError(f"request body larger than {MAX_BODY} bytes")
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    def send_json(self, data, status=HTTPStatus.OK):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def end_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-store')
+        super().end_headers()
+
+
+class EstimationServer(http.server.ThreadingHTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, estimator, handler_class=EstimationHandler):
+        self.estimator = estimator
+        super().__init__(server_address, handler_class)
+
+
+def make_server(port=PORT, cache_size=CACHE_SIZE, ttl=CACHE_TTL, host='', token_counter=None):
+    """Create (but do not start) the service on `port`."""
+    return EstimationServer((host, port), ImpactEstimator(TTLCache(cache_size, ttl), token_counter))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve cached impact estimates over HTTP")
+    parser.add_argument('--port', type=int, default=PORT, help="port to listen on")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help="estimates kept in memory")
+    parser.add_argument('--ttl', type=float, default=CACHE_TTL, help="seconds an estimate stays cached")
+    parser.add_argument('--tokenizer', choices=('chars', 'bpe'), default='chars',
+                        help="token counts from chars/4 (as in the browser) or BPE (ecosmart.tokenizer, "
+                             "with the model vocabulary at $ECOSMART_BPE_VOCAB)")
+    args = parser.parse_args(argv)
+
+    token_counter = None
+    if args.tokenizer == 'bpe':
+        from .tokenizer import count_tokens as token_counter, get_tokenizer
+        try:
+            get_tokenizer()     # fail now, not on the first request
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f"❌ {exc}")
+    with make_server(args.port, args.cache_size, args.ttl, token_counter=token_counter) as httpd:
+        print(f"🌱 Impact estimation service on http://localhost:{args.port}")
+        print(f"🗃️  Cache: {args.cache_size:,} estimates, {args.ttl:g}s TTL, {args.tokenizer} token counts")
+        print(f"📈 Metrics: http://localhost:{args.port}/metrics")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Service stopped")
+
+
+if __name__ == '__main__':
+    main()
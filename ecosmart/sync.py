@@ -0,0 +1,460 @@
+"""
+Bulk sync of prompt libraries and usage stats as streamed NDJSON
+
+exportLibraryAsJSON and importLibraryFromJSON build and parse the whole
+library as one JSON string, and updateUsageStats / recordSavings read and
+rewrite the whole stats object for every query and every optimization. For a
+department moving tens of thousands of prompts and months of stats, that is a
+memory spike on both ends and one full write per event. Here:
+
+- A library travels as NDJSON: a header line (version, exported_at and
+  prompt_count, as in the JSON export), then one prompt per line. Exports
+  are written and imports read a chunk of lines at a time, so neither end
+  holds the serialized library. Importing a file records its progress in
+  FILE.checkpoint after every batch, and running the import again continues
+  from there. A replacing import is read into a new library and swapped in
+  once the whole file has been read.
+
+- Usage stats are the storage-manager.js stats object, one per user.
+  StatsBatcher merges query and savings deltas in memory and hands them to a
+  UsageStatsStore as one atomic file write per batch. Stats imports use the
+  same batches, and the store saves how far each import file has been read
+  in the same write as the totals. An interrupted import therefore resumes
+  without counting anything twice, and lines appended to the file later are
+  picked up by the next run.
+
+Run: python3 -m ecosmart.sync export-library --library prompt_library.jsonl --out library.ndjson
+     python3 -m ecosmart.sync import-library library.ndjson --library prompt_library.jsonl [--replace]
+     python3 -m ecosmart.sync export-stats --stats usage_stats.json --out stats.ndjson
+     python3 -m ecosmart.sync import-stats events.ndjson --stats usage_stats.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+CHUNK_LINES = 1000      # NDJSON lines per exported chunk
+BATCH_SIZE = 1000       # imported prompts per library write
+STATS_BATCH = 10_000    # stats events merged into one store write
+STATS_DELAY = 5.0       # seconds a stats event may wait for its write
+
+STAT_TOTALS = ('totalQueries', 'totalTokens', 'totalEnergy', 'totalWater', 'totalCarbon',
+               'savedEnergy', 'savedWater', 'savedCarbon')
+DEFAULT_STATS = {**dict.fromkeys(STAT_TOTALS, 0), 'firstUsed': None, 'lastUsed': None}
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def ndjson_line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def read_lines(path, offset=0):
+    """(line, offset after it) for each line of `path` from byte `offset`."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            yield line, offset
+
+
+def source_id(path):
+    """SHA-256 of the first line of `path`, which tells one export from another."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.readline()).hexdigest()
+
+
+def write_atomic(path, chunks):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+# ==============================================================================
+# Prompt library
+# ==============================================================================
+
+class ImportResult(NamedTuple):
+    imported: int
+    skipped: int    # duplicates of a prompt already in the library
+    lines: int      # prompt lines read
+    resumed: bool
+
+
+def library_chunks(library, chunk_lines=CHUNK_LINES):
+    """The library as NDJSON bytes: the header line, then `chunk_lines` prompts per chunk."""
+    yield ndjson_line(library.export_header())
+    for prompts in library.iter_prompts(chunk_lines):
+        yield b''.join(map(ndjson_line, prompts))
+
+
+def export_library(library, path, chunk_lines=CHUNK_LINES):
+    """Write the library to `path` as NDJSON; returns the number of prompts."""
+    write_atomic(path, library_chunks(library, chunk_lines))
+    return len(library)
+
+
+def import_library_lines(library, lines, merge=True, batch_size=BATCH_SIZE, on_batch=None, resuming=False):
+    """
+    Add the prompts of NDJSON `lines`, given as (line, position) pairs, to
+    `library`, `batch_size` at a time. Header lines are skipped.
+
+    With `merge`, a prompt whose text is already in the library, or earlier
+    in the lines, is skipped. Prompts whose id is taken get a new one; when
+    `resuming`, they are taken to be from the interrupted run and skipped.
+    After each batch, on_batch(position, imported, skipped, lines) is called
+    with the position of the last line read. Returns (imported, skipped, lines).
+    """
+    texts = library.texts() if merge else None
+    seen = set()
+    batch = []
+    imported = skipped = count = 0
+    position = None
+    for number, (line, position) in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f"line {number}: not valid JSON") from None
+        if not isinstance(record, dict) or not isinstance(record.get('text'), str):
+            if isinstance(record, dict) and 'version' in record:
+                continue   # export header
+            raise ValueError(f"line {number}: expected a prompt with a 'text' string")
+        count += 1
+        prompt_id = record.get('id')
+        if (texts is not None and record['text'] in texts) or (resuming and prompt_id in library):
+            skipped += 1
+        else:
+            if prompt_id in library or prompt_id in seen:
+                record = {**record, 'id': None}
+            seen.add(prompt_id)
+            if texts is not None:
+                texts.add(record['text'])
+            batch.append(record)
+        if len(batch) >= batch_size:
+            imported += len(library.save_many(batch))
+            batch = []
+            if on_batch:
+                on_batch(position, imported, skipped, count)
+    if batch:
+        imported += len(library.save_many(batch))
+    if on_batch and position is not None:
+        on_batch(position, imported, skipped, count)
+    return imported, skipped, count
+
+
+def import_library(library, path, merge=True, batch_size=BATCH_SIZE, checkpoint=None):
+    """
+    Import an NDJSON library file. Progress is saved to `checkpoint`
+    (default FILE.checkpoint) after every batch; when it exists and belongs
+    to the same export, the import continues after the last batch. The
+    checkpoint is removed once the file has been read. Without `merge`, the
+    file is read into a new library that replaces this one only once every
+    line has been read, so a bad line leaves the library as it was; there is
+    no checkpoint to resume from.
+    """
+    if not merge:
+        from .library import PromptLibrary
+        staged = PromptLibrary()
+        imported, skipped, lines = import_library_lines(staged, read_lines(path), False, batch_size)
+        library.replace(staged.export()['prompts'])
+        return ImportResult(imported, skipped, lines, False)
+    checkpoint = checkpoint or f'{path}.checkpoint'
+    source = source_id(path)
+    state = None
+    if os.path.exists(checkpoint):
+        with open(checkpoint, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('source') != source:
+            state = None   # left over from another export
+    resuming = state is not None
+    if not resuming:
+        state = {'source': source, 'offset': 0, 'imported': 0, 'skipped': 0, 'lines': 0}
+    base = dict(state)
+
+    def save_progress(offset, imported, skipped, lines):
+        state.update(offset=offset, imported=base['imported'] + imported, skipped=base['skipped'] + skipped,
+                     lines=base['lines'] + lines)
+        write_atomic(checkpoint, [json.dumps(state).encode('utf-8')])
+
+    import_library_lines(library, read_lines(path, state['offset']), True, batch_size, save_progress, resuming)
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return ImportResult(state['imported'], state['skipped'], state['lines'], resuming)
+
+
+# ==============================================================================
+# Usage stats
+# ==============================================================================
+
+def query_delta(impact, timestamp=None):
+    """What updateUsageStats adds for one calculateEnvironmentalImpact result."""
+    timestamp = timestamp or now_iso()
+    return {
+        'totalQueries': 1,
+        'totalTokens': impact['tokens']['total'],
+        'totalEnergy': impact['impact']['energy']['wh'],
+        'totalWater': impact['impact']['water']['liters'],
+        'totalCarbon': impact['impact']['carbon']['kg'],
+        'firstUsed': timestamp,
+        'lastUsed': timestamp,
+    }
+
+
+def savings_delta(savings):
+    """What recordSavings adds for one comparePrompts savings block."""
+    return {
+        'savedEnergy': savings['energy']['wh'],
+        'savedWater': savings['water']['liters'],
+        'savedCarbon': savings['carbon']['kg'],
+    }
+
+
+def stats_delta(record):
+    """The delta of one stats NDJSON line: a query ('impact'), savings ('savings') or stats totals."""
+    if 'impact' in record:
+        return query_delta(record['impact'], record.get('timestamp'))
+    if 'savings' in record:
+        return savings_delta(record['savings'])
+    return {field: record[field] for field in (*STAT_TOTALS, 'firstUsed', 'lastUsed') if field in record}
+
+
+def merge_stats(stats, delta):
+    """Add `delta` into `stats` (totals summed, firstUsed earliest, lastUsed latest); returns `stats`."""
+    for field in STAT_TOTALS:
+        if field in delta:
+            stats[field] = stats.get(field, 0) + delta[field]
+    first, last = delta.get('firstUsed'), delta.get('lastUsed')
+    if first and (not stats.get('firstUsed') or first < stats['firstUsed']):
+        stats['firstUsed'] = first
+    if last and (not stats.get('lastUsed') or last > stats['lastUsed']):
+        stats['lastUsed'] = last
+    return stats
+
+
+class UsageStatsStore:
+    """
+    Stats per user, and the progress of stats imports, in one JSON file that
+    is replaced atomically on every write. Without a path, kept in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.writes = 0
+        self._lock = threading.Lock()
+        data = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        self._users = data.get('users', {})
+        self._imports = data.get('imports', {})
+
+    def __len__(self):
+        return len(self._users)
+
+    def get(self, user):
+        """A copy of `user`'s stats (the defaults if there are none)."""
+        with self._lock:
+            return dict(self._users.get(user, DEFAULT_STATS))
+
+    def users(self):
+        with self._lock:
+            return list(self._users)
+
+    def import_progress(self, key):
+        with self._lock:
+            return self._imports.get(key)
+
+    def apply(self, deltas, imports=None):
+        """Merge {user: delta} and record `imports` progress in a single write."""
+        with self._lock:
+            for user, delta in deltas.items():
+                merge_stats(self._users.setdefault(user, dict(DEFAULT_STATS)), delta)
+            self._imports.update(imports or {})
+            self._save()
+
+    def _save(self):
+        if self.path is None:
+            return
+        payload = json.dumps({'users': self._users, 'imports': self._imports}, ensure_ascii=False)
+        write_atomic(self.path, [payload.encode('utf-8')])
+        self.writes += 1
+
+
+class StatsBatcher:
+    """
+    Collects stats deltas per user and writes them to `store` together, once
+    `max_events` are pending or the oldest has waited `max_delay` seconds
+    (checked as events arrive, or every `max_delay` by flush_every).
+    Thread-safe; flushes on close.
+    """
+
+    def __init__(self, store, max_events=STATS_BATCH, max_delay=STATS_DELAY, clock=time.monotonic):
+        self.store = store
+        self.max_events = max_events
+        self.max_delay = max_delay
+        self.pending = 0
+        self._clock = clock
+        self._since = None
+        self._deltas = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add(self, user, delta):
+        with self._lock:
+            merge_stats(self._deltas.setdefault(user, {}), delta)
+            self.pending += 1
+            if self._since is None:
+                self._since = self._clock()
+            due = self.pending >= self.max_events or self._clock() - self._since >= self.max_delay
+        if due:
+            self.flush()
+
+    def record_query(self, user, impact, timestamp=None):
+        self.add(user, query_delta(impact, timestamp))
+
+    def record_savings(self, user, savings):
+        self.add(user, savings_delta(savings))
+
+    def get(self, user):
+        """`user`'s stats including the deltas not yet written."""
+        with self._lock:
+            return merge_stats(self.store.get(user), self._deltas.get(user, {}))
+
+    def flush(self, imports=None):
+        """Write the pending deltas (and `imports` progress, if any)."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            self.pending = 0
+            self._since = None
+            if deltas or imports:
+                self.store.apply(deltas, imports)
+
+    def flush_every(self, seconds=None):
+        """Flush from a daemon thread every `seconds` (default max_delay) until close."""
+        seconds = seconds or self.max_delay
+
+        def run():
+            while not self._stop.wait(seconds):
+                self.flush()
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stats_chunks(store, chunk_lines=CHUNK_LINES):
+    """The store as NDJSON bytes, one {"user": ..., stats} line per user."""
+    users = store.users()
+    for start in range(0, len(users), chunk_lines):
+        yield b''.join(ndjson_line({'user': user, **store.get(user)}) for user in users[start:start + chunk_lines])
+
+
+def export_stats(store, path, chunk_lines=CHUNK_LINES):
+    write_atomic(path, stats_chunks(store, chunk_lines))
+    return len(store)
+
+
+def import_stats(store, path, batch_size=STATS_BATCH):
+    """
+    Merge the stats lines of `path` ({"user": ..., and "impact", "savings" or
+    stats totals}) into `store`, one write per `batch_size` lines. Each write
+    also saves how far the file has been read, so running the import again
+    only reads lines added since. Returns (lines read this run, total lines).
+    """
+    key = f'{os.path.abspath(path)}#{source_id(path)[:16]}'
+    progress = store.import_progress(key) or {'offset': 0, 'lines': 0}
+    offset, lines = progress['offset'], progress['lines']
+    batcher = StatsBatcher(store, max_events=math.inf, max_delay=math.inf)
+    read = 0
+    for line, end in read_lines(path, offset):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict) or 'user' not in record:
+            raise ValueError(f"{path}: line {lines + 1} has no 'user'")
+        batcher.add(str(record['user']), stats_delta(record))
+        read += 1
+        lines += 1
+        if batcher.pending >= batch_size:
+            batcher.flush({key: {'offset': end, 'lines': lines}})
+        offset = end
+    batcher.flush({key: {'offset': offset, 'lines': lines}})
+    return read, lines
+
+
+# ==============================================================================
+# CLI
+# ==============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export of prompt libraries and usage stats")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_lib = commands.add_parser('export-library', help="write a library as NDJSON")
+    export_lib.add_argument('--library', required=True, help="library change log (ecosmart.library)")
+    export_lib.add_argument('--out', required=True)
+    import_lib = commands.add_parser('import-library', help="read an NDJSON (or JSON) library export")
+    import_lib.add_argument('file')
+    import_lib.add_argument('--library', required=True, help="library change log (ecosmart.library)")
+    import_lib.add_argument('--replace', action='store_true', help="replace the library instead of merging")
+    import_lib.add_argument('--batch', type=int, default=BATCH_SIZE, help="prompts per write")
+    export_st = commands.add_parser('export-stats', help="write usage stats as NDJSON")
+    export_st.add_argument('--stats', required=True, help="usage stats file")
+    export_st.add_argument('--out', required=True)
+    import_st = commands.add_parser('import-stats', help="merge NDJSON stats events or totals")
+    import_st.add_argument('file')
+    import_st.add_argument('--stats', required=True, help="usage stats file")
+    import_st.add_argument('--batch', type=int, default=STATS_BATCH, help="lines per write")
+    args = parser.parse_args(argv)
+
+    if args.command in ('export-library', 'import-library'):
+        from .library import PromptLibrary
+        library = PromptLibrary(args.library)
+        try:
+            if args.command == 'export-library':
+                count = export_library(library, args.out)
+                print(f"✅ {count:,} prompts → {args.out}")
+                return
+            if args.file.endswith('.json'):
+                with open(args.file, encoding='utf-8') as f:
+                    count = library.import_prompts(json.load(f), merge=not args.replace)
+                print(f"✅ Library now has {count:,} prompts")
+                return
+            result = import_library(library, args.file, not args.replace, args.batch)
+            print(f"{'🔁 Resumed: ' if result.resumed else '✅ '}{result.imported:,} prompts imported, "
+                  f"{result.skipped:,} duplicates skipped ({result.lines:,} lines); library has {len(library):,}")
+            library.compact()
+        finally:
+            library.close()
+        return
+
+    store = UsageStatsStore(args.stats)
+    if args.command == 'export-stats':
+        count = export_stats(store, args.out)
+        print(f"✅ Stats of {count:,} users → {args.out}")
+    else:
+        read, lines = import_stats(store, args.file, args.batch)
+        print(f"✅ {read:,} new lines merged ({lines:,} read from this file so far) in {store.writes} writes; "
+              f"{len(store):,} users")
+
+
+if __name__ == '__main__':
+    main()
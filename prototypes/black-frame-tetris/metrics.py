@@ -0,0 +1,369 @@
+"""
+Request instrumentation for server.py: Prometheus metrics, access log, profiler
+
+Every request served by the pooled server is timed and counted per route:
+
+  http_requests_total               by route, method and status
+  http_request_duration_seconds     latency histogram by route
+  http_response_bytes_total         body bytes sent by route
+  http_connections_active           connections held by a worker right now
+  asset_cache_*                     --production memory cache hits, misses, size
+  push_*                            --push subscribers and messages
+
+GET /metrics returns them in the Prometheus text format. A route is the URL
+path of a file that was served, so hot files show up by name; at most
+MAX_ROUTES are tracked, and everything beyond them and every 4xx/5xx path
+counts as "(other)", so a crawler cannot blow up the label set.
+
+Recording a request takes one lock and a few dict updates. The access log
+is a JSON line per request, formatted and written by a background thread:
+workers only append a tuple to a bounded queue and drop it (counted in
+access_log_dropped_total) if the writer falls behind.
+
+The profiler runs cProfile around a sample of requests, in whichever worker
+serves them, and merges the results. Start, stop and read it at runtime:
+
+  curl -X POST 'localhost:8000/metrics/profile?action=start&rate=0.1'
+  curl localhost:8000/metrics/profile?sort=tottime     # top functions so far
+  curl -X POST 'localhost:8000/metrics/profile?action=stop'
+
+or toggle it with `kill -USR1 <pid>`. Only loopback clients may change it.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import signal
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+# Latency bucket upper bounds (seconds); static files are mostly sub-millisecond
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_ROUTES = 200        # distinct routes tracked before new ones count as OTHER
+OTHER = '(other)'
+LOG_QUEUE = 10_000      # access-log entries waiting for the writer before new ones are dropped
+FLUSH_INTERVAL = 0.2    # seconds between access-log writes
+PROFILE_RATE = 0.1      # share of requests profiled by default
+PROFILE_LIMIT = 40      # functions listed in a profile report
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_label(value)}"' for name, value in labels.items()) + '}'
+
+
+class Histogram:
+    """Cumulative-on-export latency histogram with fixed BUCKETS."""
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def lines(self, name, **labels):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}'
+        yield f'{name}_sum{_labels(**labels)} {self.sum:.6f}'
+        yield f'{name}_count{_labels(**labels)} {self.count}'
+
+
+class Metrics:
+    """Counters for one server; record() and the connection gauge are called from the workers."""
+
+    def __init__(self, max_routes=MAX_ROUTES):
+        self.max_routes = max_routes
+        self.started = time.time()
+        self.requests = {}          # (route, method, status) -> count
+        self.latency = {}           # route -> Histogram
+        self.bytes_sent = {}        # route -> bytes
+        self.active_connections = 0
+        self.connections = 0
+        self.profiler = Profiler()
+        self.access_log = None      # set by start_access_log
+        self._lock = threading.Lock()
+
+    def connection_opened(self):
+        with self._lock:
+            self.active_connections += 1
+            self.connections += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.active_connections -= 1
+
+    def route(self, path, status):
+        """The route label for a request: its path if it was served and there is room, else OTHER."""
+        if status >= 400 or (path not in self.latency and len(self.latency) >= self.max_routes):
+            return OTHER
+        return path
+
+    def record(self, path, method, status, seconds, nbytes):
+        route = self.route(path, status)
+        key = (route, method, status)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = Histogram()
+            histogram.observe(seconds)
+            self.bytes_sent[route] = self.bytes_sent.get(route, 0) + nbytes
+
+    def render(self, asset_cache=None, push_hub=None):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            requests = sorted(self.requests.items())
+            latency = sorted((route, histogram.counts[:], histogram.sum, histogram.count)
+                             for route, histogram in self.latency.items())
+            bytes_sent = sorted(self.bytes_sent.items())
+            active, connections = self.active_connections, self.connections
+
+        out = ['# HELP http_requests_total Requests answered, by route, method and status.',
+               '# TYPE http_requests_total counter']
+        out += [f'http_requests_total{_labels(route=route, method=method, status=status)} {count}'
+                for (route, method, status), count in requests]
+        out += ['# HELP http_request_duration_seconds Time from parsing the request to the last body byte.',
+                '# TYPE http_request_duration_seconds histogram']
+        for route, counts, total, count in latency:
+            histogram = Histogram()
+            histogram.counts, histogram.sum, histogram.count = counts, total, count
+            out += histogram.lines('http_request_duration_seconds', route=route)
+        out += ['# HELP http_response_bytes_total Response body bytes sent, by route.',
+                '# TYPE http_response_bytes_total counter']
+        out += [f'http_response_bytes_total{_labels(route=route)} {nbytes}' for route, nbytes in bytes_sent]
+        out += ['# HELP http_connections_active Connections currently held by a worker.',
+                '# TYPE http_connections_active gauge',
+                f'http_connections_active {active}',
+                '# HELP http_connections_total Connections accepted.',
+                '# TYPE http_connections_total counter',
+                f'http_connections_total {connections}']
+
+        if asset_cache is not None:
+            lookups = asset_cache.hits + asset_cache.misses
+            out += ['# HELP asset_cache_hits_total Memory cache lookups answered from memory.',
+                    '# TYPE asset_cache_hits_total counter',
+                    f'asset_cache_hits_total {asset_cache.hits}',
+                    '# HELP asset_cache_misses_total Memory cache lookups that read the file.',
+                    '# TYPE asset_cache_misses_total counter',
+                    f'asset_cache_misses_total {asset_cache.misses}',
+                    '# HELP asset_cache_hit_ratio Share of lookups answered from memory.',
+                    '# TYPE asset_cache_hit_ratio gauge',
+                    f'asset_cache_hit_ratio {asset_cache.hits / lookups if lookups else 0:.4f}',
+                    '# HELP asset_cache_bytes Bytes held, compressed variants included.',
+                    '# TYPE asset_cache_bytes gauge',
+                    f'asset_cache_bytes {asset_cache.nbytes}']
+        if push_hub is not None:
+            out += ['# HELP push_subscribers Open Server-Sent Events connections.',
+                    '# TYPE push_subscribers gauge',
+                    f'push_subscribers {push_hub.connections}',
+                    '# HELP push_messages_sent_total Messages written to subscribers.',
+                    '# TYPE push_messages_sent_total counter',
+                    f'push_messages_sent_total {push_hub.sent}',
+                    '# HELP push_clients_dropped_total Subscribers dropped for not reading.',
+                    '# TYPE push_clients_dropped_total counter',
+                    f'push_clients_dropped_total {push_hub.dropped}']
+
+        dropped = self.access_log.dropped if self.access_log is not None else 0
+        out += ['# HELP access_log_dropped_total Access-log entries dropped because the writer fell behind.',
+                '# TYPE access_log_dropped_total counter',
+                f'access_log_dropped_total {dropped}',
+                '# HELP profiler_active 1 while requests are being profiled.',
+                '# TYPE profiler_active gauge',
+                f'profiler_active {int(self.profiler.active)}',
+                '# HELP process_start_time_seconds Start time of the server, seconds since the epoch.',
+                '# TYPE process_start_time_seconds gauge',
+                f'process_start_time_seconds {self.started:.3f}',
+                '# HELP process_threads Threads in the server process.',
+                '# TYPE process_threads gauge',
+                f'process_threads {threading.active_count()}']
+        return '\n'.join(out) + '\n'
+
+
+# ==============================================================================
+# Profiler
+# ==============================================================================
+
+class Profiler:
+    """
+    cProfile over a random `rate` share of requests, merged across workers.
+
+    cProfile only sees the thread that enabled it, so each sampled request
+    gets its own profile, which is added to the totals when it finishes.
+    Only one profile may be enabled at a time (Python 3.12+ refuses a second
+    one), so a request is not sampled while another is being profiled.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.rate = PROFILE_RATE
+        self.requests = 0           # requests profiled since the last reset
+        self.started = None
+        self._stats = None
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()     # held while a request is profiled
+
+    def start(self, rate=PROFILE_RATE):
+        if not 0 < rate <= 1:
+            raise ValueError(f"rate must be in (0, 1], got {rate}")
+        self.rate = rate
+        if not self.active:
+            self.started = time.time()
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def toggle(self):
+        if self.active:
+            self.stop()
+        else:
+            self.start(self.rate)
+
+    def reset(self):
+        with self._lock:
+            self._stats = None
+            self.requests = 0
+
+    def begin(self):
+        """A running profile if this request is sampled, else None; pass it to end()."""
+        if not self.active or random.random() >= self.rate:
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:          # another profiler (e.g. python -m cProfile) is active
+            self._profiling.release()
+            return None
+        return profile
+
+    def end(self, profile):
+        profile.disable()
+        self._profiling.release()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.requests += 1
+
+    def report(self, sort='cumulative', limit=PROFILE_LIMIT):
+        """The top `limit` functions by `sort` (a pstats sort key) as text."""
+        state = 'on' if self.active else 'off'
+        header = f"profiler {state}, rate {self.rate:g}, {self.requests} requests profiled\n\n"
+        with self._lock:
+            if self._stats is None:
+                return header + "no samples yet\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+        return header + out.getvalue()
+
+
+# ==============================================================================
+# Access log
+# ==============================================================================
+
+class AccessLog:
+    """
+    JSON lines written by a background thread. Workers only append a tuple
+    to a bounded deque; the writer wakes every FLUSH_INTERVAL seconds, then
+    formats and writes everything pending at once.
+    """
+
+    def __init__(self, path=None, max_queue=LOG_QUEUE, interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_queue = max_queue
+        self.interval = interval
+        self.dropped = 0
+        self._pending = deque()
+        self._stream = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='access-log', daemon=True)
+
+    def start(self):
+        self._stream = open(self.path, 'a', encoding='utf-8') if self.path else sys.stderr
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Write what is pending and stop the writer."""
+        self._stopped.set()
+        self._thread.join()
+        if self.path:
+            self._stream.close()
+
+    def log(self, level, message, fields):
+        if len(self._pending) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), level, message, fields))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._write()
+        self._write()
+
+    def _write(self):
+        pending = self._pending
+        lines = []
+        while pending:
+            stamp, level, message, fields = pending.popleft()
+            entry = {'time': datetime.fromtimestamp(stamp).isoformat(timespec='milliseconds'),
+                     'level': level, 'message': message, **fields}
+            lines.append(json.dumps(entry, ensure_ascii=False, default=str))
+        if lines:
+            self._stream.write('\n'.join(lines) + '\n')
+            self._stream.flush()
+
+
+_access_log = None   # the AccessLog of this process, once started
+
+
+def start_access_log(metrics=None, path=None):
+    """
+    Start writing the access log to `path` (default: stderr); until then
+    log() discards everything. Call .stop() on the result at shutdown.
+    """
+    global _access_log
+    _access_log = AccessLog(path).start()
+    if metrics is not None:
+        metrics.access_log = _access_log
+    return _access_log
+
+
+def log(message, level='info', **fields):
+    """Queue one access-log entry with structured `fields`."""
+    if _access_log is not None:
+        _access_log.log(level, message, fields)
+
+
+def install_toggle_signal(profiler):
+    """Toggle the profiler on SIGUSR1 (POSIX only); returns whether the signal is available."""
+    if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def toggle(signum, frame):
+        profiler.toggle()
+        log('profiler toggled', active=profiler.active, rate=profiler.rate, pid=os.getpid())
+
+    signal.signal(signal.SIGUSR1, toggle)
+    return True
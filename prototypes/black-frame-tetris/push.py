@@ -0,0 +1,250 @@
+"""
+Server-Sent Events hub for the always-on displays
+
+Instead of every screen polling department-data.json every few seconds, the
+displays open one EventSource connection and the hub pushes a message only
+when the data behind a topic actually changes:
+
+  departments   Magic Mirror department metrics (department-data.json)
+  forest        Digital Forest tree health per department (derived from it)
+  leaderboard   leaderboard deltas, published by whoever maintains the board
+
+Updates are coalesced: everything published within COALESCE seconds goes out
+as one message per topic, containing only the keys whose value changed, and
+the message is encoded once for all subscribers.
+
+Connections are asyncio protocols on one event loop thread, so an idle screen
+costs a socket and a few hundred bytes rather than a worker thread; thousands
+per process are fine. server.py hands the socket of a GET /events request
+over with attach() and its worker thread is free again immediately.
+
+Wire format (one event per topic, `id` is the hub's sequence number):
+
+  event: departments
+  id: 42
+  data: {"snapshot": {...}}            first message, or after missed updates
+  data: {"changes": {"it": {...}}}     later messages; null means removed
+  data: {"event": {...}}               one-off news (announce()), not part of the state
+"""
+import asyncio
+import json
+import os
+import threading
+
+from metrics import log
+
+COALESCE = 0.5          # seconds updates are collected before being sent
+HEARTBEAT = 20          # seconds between keep-alive comments (proxies drop silent connections)
+WATCH_INTERVAL = 1.0    # seconds between stat() calls on watched files
+MAX_BUFFER = 256 * 1024  # bytes queued for a client before it is dropped as too slow
+RETRY_MS = 5000         # browser reconnect delay
+
+RESPONSE_HEAD = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream; charset=utf-8\r\n'
+    b'Cache-Control: no-store\r\n'
+    b'X-Accel-Buffering: no\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+    b'retry: ' + str(RETRY_MS).encode() + b'\n\n'
+)
+PING = b': ping\n\n'
+
+
+def encode_event(topic, sequence, payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f'event: {topic}\nid: {sequence}\ndata: {data}\n\n'.encode('utf-8')
+
+
+def forest_health(departments):
+    """departments topic -> forest topic: only name and score, so energy changes don't wake the forest."""
+    return {
+        key: {'name': department.get('name', key), 'health': department.get('score', 0)}
+        for key, department in departments.items()
+    }
+
+
+class Subscriber(asyncio.Protocol):
+    """One open EventSource connection."""
+
+    def __init__(self, hub, topics, last_event_id):
+        self.hub = hub
+        self.topics = topics
+        self.last_event_id = last_event_id
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.write(RESPONSE_HEAD)
+        # a client that saw the latest message missed nothing; anyone else gets the full state
+        if self.last_event_id != str(self.hub.sequence):
+            for topic in self.topics:
+                self.send(encode_event(topic, self.hub.sequence, {'snapshot': self.hub.state.get(topic, {})}))
+        for topic in self.topics:
+            self.hub.subscribers.setdefault(topic, set()).add(self)
+        self.hub.connections += 1
+
+    def data_received(self, data):
+        pass  # nothing is expected after the request
+
+    def connection_lost(self, exc):
+        for topic in self.topics:
+            self.hub.subscribers.get(topic, set()).discard(self)
+        self.hub.connections -= 1
+
+    def send(self, message):
+        if self.transport.is_closing():
+            return
+        if self.transport.get_write_buffer_size() > MAX_BUFFER:
+            self.transport.abort()  # it reconnects and gets a snapshot
+            self.hub.dropped += 1
+            return
+        self.transport.write(message)
+
+
+class PushHub:
+    """
+    Latest state per topic plus the connections subscribed to it.
+
+    publish(), replace(), announce(), watch() and attach() may be called from any thread;
+    everything else runs on the hub's event loop thread.
+    """
+
+    def __init__(self, coalesce=COALESCE, heartbeat=HEARTBEAT):
+        self.coalesce = coalesce
+        self.heartbeat = heartbeat
+        self.state = {}          # topic -> {key: value}
+        self.subscribers = {}    # topic -> set of Subscriber
+        self.connections = 0     # open subscribers (counted on the loop, read from any thread)
+        self.sequence = 0        # id of the newest message
+        self.sent = 0            # messages written (one per subscriber)
+        self.dropped = 0         # clients dropped for not reading
+        self.loop = None
+        self._pending = {}       # topic -> {key: value} not sent yet
+        self._flush_handle = None
+        self._thread = None
+
+    # --------------------------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------------------------
+
+    def start(self):
+        """Run the event loop in a daemon thread."""
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name='push-hub', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self._heartbeat())
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self.loop = None
+
+    # --------------------------------------------------------------------------
+    # Thread-safe entry points
+    # --------------------------------------------------------------------------
+
+    def publish(self, topic, changes):
+        """Merge {key: value} changes into `topic` (value None removes the key)."""
+        self.loop.call_soon_threadsafe(self._queue, topic, dict(changes))
+
+    def replace(self, topic, data):
+        """Make `data` the whole state of `topic`; only the differences are sent."""
+        self.loop.call_soon_threadsafe(self._replace, topic, dict(data))
+
+    def announce(self, topic, event):
+        """Send `event` once to the current subscribers of `topic`; it is not kept in the state."""
+        self.loop.call_soon_threadsafe(self._announce, topic, dict(event))
+
+    def watch(self, path, topic, transform=None, interval=WATCH_INTERVAL):
+        """Replace `topic` with the JSON in `path` whenever the file changes."""
+        self.loop.call_soon_threadsafe(self.loop.create_task, self._watch(path, topic, transform, interval))
+
+    def attach(self, sock, topics, last_event_id=None):
+        """Take over a connected socket whose GET request has been read, and stream `topics` to it."""
+        def connect():
+            factory = lambda: Subscriber(self, tuple(topics), last_event_id)
+            self.loop.create_task(self.loop.connect_accepted_socket(factory, sock))
+        self.loop.call_soon_threadsafe(connect)
+
+    # --------------------------------------------------------------------------
+    # Event loop side
+    # --------------------------------------------------------------------------
+
+    def _queue(self, topic, changes):
+        self._pending.setdefault(topic, {}).update(changes)
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(self.coalesce, self._flush)
+
+    def _replace(self, topic, data):
+        # keys queued by an earlier change but not flushed yet are part of the state being replaced
+        current = {**self.state.get(topic, {}), **self._pending.get(topic, {})}
+        removed = {key: None for key, value in current.items() if value is not None and key not in data}
+        self._queue(topic, {**removed, **data})
+
+    def _announce(self, topic, event):
+        # the id stays the newest state message's, so a reconnect is not sent a snapshot it doesn't need
+        message = encode_event(topic, self.sequence, {'event': event})
+        for subscriber in list(self.subscribers.get(topic, ())):
+            subscriber.send(message)
+            self.sent += 1
+
+    def _flush(self):
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for topic, changes in pending.items():
+            state = self.state.setdefault(topic, {})
+            changed = {key: value for key, value in changes.items() if _differs(state, key, value)}
+            if not changed:
+                continue
+            for key, value in changed.items():
+                if value is None:
+                    del state[key]
+                else:
+                    state[key] = value
+            self.sequence += 1
+            message = encode_event(topic, self.sequence, {'changes': changed})
+            for subscriber in list(self.subscribers.get(topic, ())):
+                subscriber.send(message)
+                self.sent += 1
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscriber in set().union(*self.subscribers.values()):
+                subscriber.send(PING)
+
+    async def _watch(self, path, topic, transform, interval):
+        seen = None
+        while True:
+            try:
+                st = os.stat(path)
+                if (st.st_mtime_ns, st.st_size) != seen:
+                    data = await self.loop.run_in_executor(None, _read_json, path)
+                    seen = (st.st_mtime_ns, st.st_size)
+                    try:
+                        self._replace(topic, transform(data) if transform else data)
+                    except Exception as exc:  # a bad file must not end the watch; it is read again once it changes
+                        log('push watch failed', 'error', path=path, topic=topic, error=repr(exc))
+            except (OSError, ValueError):
+                pass  # not written yet, or caught mid-write: try again next time
+            await asyncio.sleep(interval)
+
+
+def _differs(state, key, value):
+    return key in state if value is None else state.get(key) != value
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -3,25 +3,841 @@
 Simple HTTP server to test the Tetris game locally
 Run: python3 server.py
 Then open: http://localhost:8000
+
+Run: python3 server.py --all
+to serve every prototype from one process:
+  http://localhost:8000/                          docs/ (project site)
+  http://localhost:8000/black-frame-tetris/       ... and one prefix per prototype
+
+Options:
+  --port N       port to listen on (default 8000)
+  --all          mount docs/ and every prototype under its folder name
+  --mount P=DIR  mount DIR at URL prefix P (repeatable, e.g. /forest/=../digital-forest)
+  --workers N    maximum number of connections served at once (default 32)
+  --single       original one-connection-at-a-time server (for comparison)
+  --production   send ETag/Last-Modified, answer conditional GETs with 304 and
+                 cache content-hashed assets (e.g. tetris.3f2a9c1b.js) forever;
+                 HTML entry points stay no-store
+  --cache-mb N   (production) keep up to N MB of file bytes and their gzip/brotli
+                 variants in memory, least recently used evicted first (default 64, 0 = off)
+  --push         serve Server-Sent Events at /events?topics=departments,forest,leaderboard:
+                 displays get department-data.json changes pushed instead of polling
+  --department-data FILE
+                 (push) rollup file to watch (default: magic-mirror-department/department-data.json)
+  --forest-data FILE
+                 (push) forest view to watch for the forest topic, e.g. from
+                 python3 -m ecosmart.privacy (default: derived from --department-data)
+  --leaderboard-data FILE
+                 (push) leaderboard snapshot to watch for the leaderboard topic, written
+                 from an ecosmart.leaderboard.Leaderboard (default: leaderboard-data.json here)
+  --forest-behaviors
+                 (push) grow the forest topic from behaviors instead of a file: loopback
+                 clients POST JSON lines {"behavior", "user", "department"} to
+                 /forest/behaviors, an ecosmart.forest.ForestEngine applies them and
+                 pushes what changed, with newly planted trees sent once
+  --access-log FILE
+                 write the JSON-lines access log to FILE instead of stderr
+  --profile RATE start with the request profiler sampling RATE of requests (see metrics.py)
+  --no-metrics   do not time requests or serve /metrics
+
+Unless --single or --no-metrics is given, GET /metrics returns request counts,
+latency histograms per route, bytes served, cache hit rates and active
+connections in the Prometheus text format; /metrics/profile controls a
+cProfile sampler at runtime (see metrics.py). Both answer clients on this
+host only.
 """
+import argparse
+import email.utils
+import gzip
+import hashlib
 import http.server
-import socketserver
+import io
+import ipaddress
+import json
 import os
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from metrics import CONTENT_TYPE, Metrics, install_toggle_signal, log, start_access_log
+from push import PushHub, forest_health
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
 
 PORT = 8000
+WORKERS = 32
+KEEPALIVE_TIMEOUT = 15  # seconds an idle keep-alive connection may hold a worker
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+PROTOTYPES = os.path.join(ROOT, 'prototypes')
+DEFAULT_MOUNTS = {
+    '/': os.path.join(ROOT, 'docs'),
+    '/black-frame-tetris/': HERE,
+    '/digital-forest/': os.path.join(PROTOTYPES, 'digital-forest'),
+    '/magic-mirror-department/': os.path.join(PROTOTYPES, 'magic-mirror-department'),
+    '/prompt-coach-dashboard/': os.path.join(PROTOTYPES, 'prompt-coach-dashboard'),
+    '/ecoprompt-coach/': os.path.join(PROTOTYPES, 'ecoprompt-coach'),
+}
+
+NO_STORE = 'no-store, no-cache, must-revalidate'
+REVALIDATE = 'no-cache'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# name.<8+ hex digits>.ext - the content hash is part of the URL, so it never changes
+HASHED_ASSET = re.compile(r'\.[0-9a-f]{8,64}\.[A-Za-z0-9]+$')
+
+CACHE_MB = 64
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# preferred order when the client accepts several encodings equally
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+UNSATISFIABLE = object()  # requested_range() result that calls for a 416
+
+EVENTS_PATH = '/events'
+METRICS_PATH = '/metrics'
+PROFILE_PATH = '/metrics/profile'
+FOREST_PATH = '/forest/behaviors'
+MAX_BEHAVIOR_BODY = 1024 * 1024   # bytes of behaviors per POST
+TOPICS = ('departments', 'forest', 'leaderboard')
+DEPARTMENT_DATA = os.path.join(PROTOTYPES, 'magic-mirror-department', 'department-data.json')
+LEADERBOARD_DATA = os.path.join(HERE, 'leaderboard-data.json')
+
+_etags = {}  # file path -> (mtime_ns, size, etag)
+
+
+def normalize_mounts(mounts):
+    """[(prefix, absolute directory)] from a {prefix: directory} mapping, longest prefix first."""
+    normalized = []
+    for prefix, directory in mounts.items():
+        prefix = '/' + prefix.strip('/') + '/' if prefix.strip('/') else '/'
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            raise ValueError(f"mount {prefix}: {directory} is not a directory")
+        normalized.append((prefix, directory))
+    return sorted(normalized, key=lambda mount: len(mount[0]), reverse=True)
+
+
+def file_etag(path, st):
+    """Strong ETag from the file contents, recomputed only when mtime or size change."""
+    cached = _etags.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    digest = hashlib.sha1(usedforsecurity=False)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:20]}"'
+    _etags[path] = (st.st_mtime_ns, st.st_size, etag)
+    return etag
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Pick the best of `available` encodings allowed by an Accept-Encoding header."""
+    if not accept_encoding or not available:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in ENCODINGS:
+        if name not in available:
+            continue
+        q = weights.get(name, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CachedAsset:
+    """One file version held in memory: raw bytes plus compressed variants."""
+    __slots__ = ('mtime_ns', 'size', 'etag', 'body', 'encodings', 'nbytes')
+
+    def __init__(self, st, body, content_type):
+        self.mtime_ns = st.st_mtime_ns
+        self.size = st.st_size
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body, usedforsecurity=False).hexdigest()[:20]}"'
+        self.encodings = {}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli:
+                variants['br'] = brotli.compress(body)
+            # only keep variants that actually save bytes
+            self.encodings = {name: data for name, data in variants.items() if len(data) < len(body)}
+        self.nbytes = len(body) + sum(len(data) for data in self.encodings.values())
+
+    def is_current(self, st):
+        return self.mtime_ns == st.st_mtime_ns and self.size == st.st_size
+
+    def representation(self, encoding):
+        """(body, etag) for `encoding`; each encoded variant gets its own strong ETag."""
+        if encoding is None:
+            return self.body, self.etag
+        return self.encodings[encoding], f'{self.etag[:-1]}-{encoding}"'
+
+
+class AssetCache:
+    """
+    Size-bounded LRU cache of CachedAsset, keyed by path.
+
+    Entries are checked against the file's mtime and size on every lookup, so an
+    edited file is reloaded on the next request. Files larger than a quarter of
+    the budget are not cached and keep being streamed from disk.
+    """
+
+    def __init__(self, max_bytes=CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_bytes // 4
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, st, content_type):
+        """The cached asset for `path`, loading it on a miss; None if it is too large."""
+        with self._lock:
+            asset = self._entries.get(path)
+            if asset is not None and asset.is_current(st):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return asset
+            self.misses += 1
+        if st.st_size > self.max_file_bytes:
+            return None
+        with open(path, 'rb') as f:
+            body = f.read()
+        # compression happens outside the lock; a concurrent load of the same
+        # file just replaces an identical entry
+        asset = CachedAsset(st, body, content_type)
+        if len(body) != st.st_size:
+            return asset  # file changed while reading: serve it, cache it next time
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[path] = asset
+            self.nbytes += asset.nbytes
+            while self.nbytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return asset
+
 
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
-        self.send_header('Expires', '0')
+        self.send_cache_headers()
         super().end_headers()
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    def send_cache_headers(self):
+        self.send_header('Cache-Control', NO_STORE)
+        self.send_header('Expires', '0')
+
+    def translate_path(self, path):
+        """Map the URL onto the directory of the longest matching mount."""
+        url_path = path.split('?', 1)[0].split('#', 1)[0]
+        for prefix, directory in getattr(self.server, 'mounts', ()):
+            # '/digital-forest' matches too, so it can be redirected to '/digital-forest/'
+            if url_path.startswith(prefix) or url_path + '/' == prefix:
+                self.directory = directory
+                return super().translate_path('/' + path[len(prefix):])
+        if not getattr(self.server, 'mounts', None):
+            return super().translate_path(path)
+        return ''  # outside every mount: 404
+
+
+class KeepAliveHTTPRequestHandler(MyHTTPRequestHandler):
+    """
+    HTTP/1.1 handler: browsers reuse one connection for the page, JS and CSS.
+
+    File bodies are handed to the kernel with sendfile(2) instead of being
+    copied through Python buffers, and single byte ranges are answered with 206.
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # body waits ~40 ms on the client's delayed ACK for every reused connection.
+    disable_nagle_algorithm = True
+
+    etag = None
+    body_range = None  # (offset, length) of the body selected by send_head
+    status = None
+    body_bytes = 0
+    started = None
+    profile = None
+
+    def handle_one_request(self):
+        # the handler instance is reused across keep-alive requests
+        self.etag = None
+        self.body_range = None
+        self.command = None
+        self.status = None
+        self.body_bytes = 0
+        self.started = None
+        self.profile = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.profile is not None:
+                self.server.metrics.profiler.end(self.profile)
+        if self.command and self.started is not None:
+            self.record_request(time.perf_counter() - self.started)
+
+    def parse_request(self):
+        # the clock starts once the request line is in, not while an idle keep-alive connection waits
+        self.started = time.perf_counter()
+        metrics = getattr(self.server, 'metrics', None)
+        if metrics is not None:
+            self.profile = metrics.profiler.begin()
+        return super().parse_request()
+
+    def record_request(self, seconds):
+        status = self.status or 0
+        path = urllib.parse.urlsplit(self.path).path
+        metrics = getattr(self.server, 'metrics', None)
+        if metrics is not None:
+            metrics.record(path, self.command, status, seconds, self.body_bytes)
+        log('request', client=self.client_address[0], method=self.command, path=self.path, status=status,
+            bytes=self.body_bytes, ms=round(seconds * 1000, 3), agent=self.headers.get('User-Agent'))
+
+    def log_request(self, code='-', size='-'):
+        # one structured line per request is written by record_request, with timing and size
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        self.status = code if isinstance(code, int) else None
+
+    def log_error(self, format, *args):
+        log(format % args, 'warning', client=self.client_address[0])
+
+    def log_message(self, format, *args):
+        log(format % args, client=self.client_address[0])
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        hub = getattr(self.server, 'push_hub', None)
+        metrics = getattr(self.server, 'metrics', None)
+        if hub is not None and path == EVENTS_PATH:
+            self.start_event_stream(hub)
+        elif metrics is not None and path == METRICS_PATH:
+            if self.require_loopback("Metrics can only be read from this host"):
+                self.send_text(metrics.render(getattr(self.server, 'asset_cache', None), hub), CONTENT_TYPE)
+        elif metrics is not None and path == PROFILE_PATH:
+            if not self.require_loopback("The profiler can only be read from this host"):
+                return
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            try:
+                self.send_text(metrics.profiler.report(query.get('sort', ['cumulative'])[0]))
+            except KeyError as exc:
+                self.send_error(HTTPStatus.BAD_REQUEST, f"Unknown sort key: {exc}")
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        """
+        POST /metrics/profile?action=start[&rate=R]|stop|reset and POST /forest/behaviors,
+        from loopback clients only.
+        """
+        metrics = getattr(self.server, 'metrics', None)
+        split = urllib.parse.urlsplit(self.path)
+        if split.path == FOREST_PATH and getattr(self.server, 'forest', None) is not None:
+            if self.require_loopback("Behaviors can only be recorded from this host"):
+                self.record_behaviors()
+            return
+        if metrics is None or split.path != PROFILE_PATH:
+            self.send_error(HTTPStatus.NOT_IMPLEMENTED, f"Unsupported method ({self.command!r})")
+            return
+        if not self.require_loopback("The profiler can only be controlled from this host"):
+            return
+        query = urllib.parse.parse_qs(split.query)
+        action = query.get('action', [''])[0]
+        profiler = metrics.profiler
+        try:
+            if action == 'start':
+                profiler.start(float(query.get('rate', [profiler.rate])[0]))
+            elif action == 'stop':
+                profiler.stop()
+            elif action == 'reset':
+                profiler.reset()
+            else:
+                raise ValueError(f"unknown action {action!r} (start, stop or reset)")
+        except ValueError as exc:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(exc))
+            return
+        log('profiler', action=action, active=profiler.active, rate=profiler.rate, client=self.client_address[0])
+        self.send_text(f"profiler {'on' if profiler.active else 'off'}, rate {profiler.rate:g}\n")
+
+    def require_loopback(self, message):
+        """True for a client on this host; anyone else is sent a 403 with `message`."""
+        if ipaddress.ip_address(self.client_address[0]).is_loopback:
+            return True
+        self.send_error(HTTPStatus.FORBIDDEN, message)
+        return False
+
+    def record_behaviors(self):
+        """Apply the JSON-lines behaviors in the body to the forest engine and push what changed."""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BEHAVIOR_BODY:
+            self.send_error(HTTPStatus.BAD_REQUEST, f"Content-Length must be 0 to {MAX_BEHAVIOR_BODY}")
+            return
+        try:
+            events = []
+            for line in self.rfile.read(length).splitlines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if not isinstance(event, dict):
+                    raise ValueError("each line must be a JSON object")
+                events.append((event.get('behavior'), event.get('user'), event.get('department')))
+            with self.server.forest_lock:
+                planted = self.server.forest.record_many(events)    # all or nothing
+                self.server.forest.publish(self.server.push_hub)
+        except ValueError as exc:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(exc))
+            return
+        log('forest behaviors', count=len(events), planted=planted, client=self.client_address[0])
+        self.send_text(f"{len(events)} behaviors, {planted} trees planted\n")
+
+    def send_text(self, text, content_type='text/plain; charset=utf-8'):
+        body = text.encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+            self.body_bytes += len(body)
+
+    def start_event_stream(self, hub):
+        """Hand the connection over to the push hub; this worker is free for the next request."""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        topics = [topic for value in query.get('topics', [','.join(TOPICS)]) for topic in value.split(',') if topic]
+        unknown = sorted(set(topics) - set(TOPICS))
+        if unknown or not topics:
+            self.send_error(HTTPStatus.NOT_FOUND, f"Unknown topic: {', '.join(unknown)}")
+            return
+        self.log_request(HTTPStatus.OK)
+        self.close_connection = True
+        # detach() leaves the socket open when socketserver closes the request
+        sock = socket.socket(fileno=self.connection.detach())
+        hub.attach(sock, topics, self.headers.get('Last-Event-ID'))
+
+    def send_head(self):
+        path = self.resolve_file(self.translate_path(self.path))
+        if path is None:
+            return super().send_head()  # directory listings, redirects, 404s
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            if self.not_modified(st):
+                f.close()
+                self.send_not_modified(st)
+                return None
+            if not self.send_content_headers(st.st_size, self.guess_type(path), st.st_mtime):
+                f.close()
+                return None
+            return f
+        except:
+            f.close()
+            raise
+
+    def resolve_file(self, path):
+        """The file that send_head would serve for `path`, or None."""
+        url_path = self.path.split('?', 1)[0]
+        if os.path.isdir(path):
+            if not url_path.endswith('/'):
+                return None  # send_head answers with a redirect
+            for index in ('index.html', 'index.htm'):
+                candidate = os.path.join(path, index)
+                if os.path.isfile(candidate):
+                    return candidate
+            return None
+        if url_path.endswith('/') or not os.path.isfile(path):
+            return None
+        return path
+
+    def not_modified(self, st):
+        """True when If-Modified-Since shows the client already has this version."""
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if not if_modified_since or 'If-None-Match' in self.headers:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        return since.tzinfo is not None and int(st.st_mtime) <= since.timestamp()
+
+    def send_not_modified(self, st, vary=False):
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header('Last-Modified', self.date_time_string(st.st_mtime))
+        if vary:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+
+    def send_content_headers(self, size, content_type, mtime, encoding=None, vary=False):
+        """
+        Send the status line and entity headers for a `size`-byte body.
+
+        Honours a Range header (identity encoding only) by answering 206 and
+        recording the slice in self.body_range. Returns False when it already
+        answered 416 and no body must follow.
+        """
+        byte_range = self.requested_range(size, mtime) if encoding is None else None
+        if byte_range is UNSATISFIABLE:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return False
+        if byte_range is None:
+            self.send_response(HTTPStatus.OK)
+            length = size
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            self.body_range = (start, length)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Type', content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if vary:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Last-Modified', self.date_time_string(mtime))
+        self.end_headers()
+        return True
+
+    def requested_range(self, size, mtime):
+        """(first, last) byte positions from a single-range Range header, None or UNSATISFIABLE."""
+        header = self.headers.get('Range')
+        if not header or self.command != 'GET':
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() not in (self.etag, self.date_time_string(mtime)):
+            return None  # the client's copy is stale: send the whole file
+        unit, _, spec = header.partition('=')
+        if unit.strip().lower() != 'bytes' or ',' in spec:
+            return None  # multipart ranges are not supported; a full 200 is always valid
+        first, dash, last = spec.strip().partition('-')
+        if not dash or not (first or last):
+            return None
+        if not all(part == '' or (part.isascii() and part.isdigit()) for part in (first, last)):
+            return None  # malformed (e.g. bytes=abc-5): ignored
+        if not first:
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                return UNSATISFIABLE
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        if last and int(last) < start:
+            return None  # invalid range: ignored
+        if start >= size:
+            return UNSATISFIABLE
+        end = int(last) if last else size - 1
+        return start, min(end, size - 1)
+
+    def copyfile(self, source, outputfile):
+        offset, length = self.body_range or (0, None)
+        if isinstance(source, io.BytesIO):
+            with source.getbuffer() as view:
+                body = view[offset:] if length is None else view[offset:offset + length]
+                outputfile.write(body)
+                self.body_bytes += len(body)
+            return
+        # zero-copy: the kernel moves pages from the file straight to the socket
+        outputfile.flush()
+        self.body_bytes += self.connection.sendfile(source, offset, length)
+
+
+class CachingHTTPRequestHandler(KeepAliveHTTPRequestHandler):
+    """
+    Production handler: validators on every file, 304 for unchanged ones.
+
+    HTML entry points remain no-store so displays always pick up new releases;
+    content-hashed assets are immutable; everything else is revalidated with
+    If-None-Match / If-Modified-Since and normally costs a body-less 304.
+    """
+
+    def send_head(self):
+        path = self.resolve_file(self.translate_path(self.path))
+        if path is None:
+            return super().send_head()
+        cache = getattr(self.server, 'asset_cache', None)
+        content_type = self.guess_type(path)
+        try:
+            st = os.stat(path)
+            asset = cache.get(path, st, content_type) if cache else None
+            if asset is None:
+                self.etag = file_etag(path, st)
+        except OSError:
+            return super().send_head()
+
+        encoding = None
+        if asset is not None:
+            if 'Range' not in self.headers:
+                encoding = negotiate_encoding(self.headers.get('Accept-Encoding'), asset.encodings)
+            body, self.etag = asset.representation(encoding)
+
+        if self.not_modified(st):
+            self.send_not_modified(st, vary=asset is not None and bool(asset.encodings))
+            return None
+        if asset is None:
+            return super().send_head()  # too large for the cache: sendfile from disk
+
+        if not self.send_content_headers(len(body), content_type, st.st_mtime,
+                                         encoding, vary=bool(asset.encodings)):
+            return None
+        return io.BytesIO(body)
+
+    def not_modified(self, st):
+        """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            return self.etag_matches(if_none_match)
+        return super().not_modified(st)
+
+    def etag_matches(self, header):
+        if header.strip() == '*':
+            return True
+        tags = (tag.strip() for tag in header.split(','))
+        return any(tag.removeprefix('W/') == self.etag for tag in tags)
+
+    def send_cache_headers(self):
+        if self.etag is None:
+            # errors, redirects and directory listings
+            super().send_cache_headers()
+            return
+        self.send_header('ETag', self.etag)
+        url_path = self.path.split('?', 1)[0]
+        if url_path.endswith('/') or self.guess_type(url_path) == 'text/html':
+            self.send_header('Cache-Control', NO_STORE)
+        elif HASHED_ASSET.search(url_path):
+            self.send_header('Cache-Control', IMMUTABLE)
+        else:
+            self.send_header('Cache-Control', REVALIDATE)
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """
+    HTTP server that hands every accepted connection to a fixed-size thread pool.
+
+    Unlike socketserver.TCPServer, a slow client only occupies one worker;
+    unlike ThreadingHTTPServer, the number of threads is bounded by `workers`.
+    Connections beyond the limit wait in the pool queue until a worker frees up.
+    """
+    allow_reuse_address = True
+    # room for a building's worth of screens reconnecting at once after a restart;
+    # a full backlog drops SYNs and each dropped client waits a second to retry
+    request_queue_size = 1024
+
+    def __init__(self, server_address, handler_class, workers=WORKERS, asset_cache=None, push_hub=None,
+                 metrics=None):
+        self.workers = workers
+        self.asset_cache = asset_cache
+        self.push_hub = push_hub
+        self.metrics = metrics
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-worker')
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._serve_connection, request, client_address)
+
+    def _serve_connection(self, request, client_address):
+        if self.metrics is not None:
+            self.metrics.connection_opened()
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            if self.metrics is not None:
+                self.metrics.connection_closed()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.push_hub:
+            self.push_hub.stop()
+
+
+class SingleHTTPServer(socketserver.TCPServer):
+    """The original server: one connection at a time, HTTP/1.0."""
+    allow_reuse_address = True
+
+
+def make_server(port=PORT, workers=WORKERS, single=False, handler_class=None, production=False,
+                cache_mb=CACHE_MB, mounts=None, push=False, department_data=DEPARTMENT_DATA, forest_data=None,
+                leaderboard_data=LEADERBOARD_DATA, forest_behaviors=False, metrics=True):
+    """
+    Create (but do not start) a server bound to `port`.
+
+    `mounts` maps URL prefixes to directories; by default the Tetris folder is
+    served at '/', as before. With `push`, /events streams `department_data`
+    to the displays, `forest_data` (if given) as the forest topic and
+    `leaderboard_data` as the leaderboard topic; with `forest_behaviors` the
+    forest topic comes from POST /forest/behaviors instead. With `metrics`,
+    requests are timed and /metrics serves the counters (neither is available
+    with `single`).
+    """
+    if single:
+        httpd = SingleHTTPServer(("", port), handler_class or MyHTTPRequestHandler)
+    else:
+        if handler_class is None:
+            handler_class = CachingHTTPRequestHandler if production else KeepAliveHTTPRequestHandler
+        asset_cache = AssetCache(int(cache_mb * 1024 * 1024)) if production and cache_mb > 0 else None
+        httpd = PooledHTTPServer(("", port), handler_class, workers=workers, asset_cache=asset_cache,
+                                 metrics=Metrics() if metrics else None)
+        if push:
+            httpd.push_hub = PushHub().start()
+            httpd.push_hub.watch(department_data, 'departments')
+            if forest_behaviors:
+                httpd.forest = forest_engine()
+                httpd.forest_lock = threading.Lock()
+            elif forest_data:
+                httpd.push_hub.watch(forest_data, 'forest')
+            else:
+                httpd.push_hub.watch(department_data, 'forest', forest_health)
+            httpd.push_hub.watch(leaderboard_data, 'leaderboard')
+    httpd.mounts = normalize_mounts(mounts or {'/': HERE})
+    return httpd
+
+
+def forest_engine():
+    """An ecosmart.forest.ForestEngine with the rollup's department names (needs the repository's ecosmart)."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from ecosmart.forest import ForestEngine
+    from ecosmart.ingest import DEPARTMENT_NAMES
+    return ForestEngine(DEPARTMENT_NAMES)
+
+
+def parse_mount(value):
+    prefix, sep, directory = value.partition('=')
+    if not sep or not prefix.startswith('/') or not directory:
+        raise argparse.ArgumentTypeError(f"expected PREFIX=DIR, got {value!r}")
+    return prefix, directory
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Tetris prototype locally")
+    parser.add_argument('--port', type=int, default=PORT, help="port to listen on")
+    parser.add_argument('--all', action='store_true',
+                        help="serve docs/ at / and every prototype under /<folder>/")
+    parser.add_argument('--mount', action='append', type=parse_mount, default=[], metavar='PREFIX=DIR',
+                        help="serve DIR under the URL prefix PREFIX (repeatable)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="maximum number of connections served concurrently")
+    parser.add_argument('--single', action='store_true',
+                        help="use the original single-threaded server")
+    parser.add_argument('--production', action='store_true',
+                        help="send validators and long-lived caching headers")
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB,
+                        help="in-memory asset cache size in production mode (0 disables)")
+    parser.add_argument('--push', action='store_true',
+                        help="push display updates over Server-Sent Events at /events")
+    parser.add_argument('--department-data', default=DEPARTMENT_DATA,
+                        help="department rollup JSON to watch for --push")
+    parser.add_argument('--forest-data', metavar='FILE',
+                        help="forest view JSON to watch for --push (default: derived from --department-data)")
+    parser.add_argument('--leaderboard-data', default=LEADERBOARD_DATA, metavar='FILE',
+                        help="leaderboard snapshot JSON to watch for --push")
+    parser.add_argument('--forest-behaviors', action='store_true',
+                        help=f"grow the forest topic from behaviors POSTed to {FOREST_PATH} (with --push)")
+    parser.add_argument('--access-log', metavar='FILE', help="JSON-lines access log file (default: stderr)")
+    parser.add_argument('--profile', type=float, metavar='RATE',
+                        help="profile this share of requests from the start (0-1)")
+    parser.add_argument('--no-metrics', action='store_true', help="do not time requests or serve /metrics")
+    args = parser.parse_args(argv)
+    if args.push and args.single:
+        parser.error("--push needs the pooled server (drop --single)")
+    if args.forest_behaviors and (not args.push or args.forest_data):
+        parser.error("--forest-behaviors needs --push and replaces --forest-data")
+    if args.profile is not None and (args.single or args.no_metrics):
+        parser.error("--profile needs the metrics of the pooled server")
+    if args.profile is not None and not 0 < args.profile <= 1:
+        parser.error("--profile must be in (0, 1]")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mounts = dict(DEFAULT_MOUNTS) if args.all else {}
+    mounts.update(args.mount)
+
+    try:
+        httpd = make_server(args.port, args.workers, args.single, production=args.production,
+                            cache_mb=args.cache_mb, mounts=mounts, push=args.push,
+                            department_data=args.department_data, forest_data=args.forest_data,
+                            leaderboard_data=args.leaderboard_data, forest_behaviors=args.forest_behaviors,
+                            metrics=not args.no_metrics)
+    except ValueError as exc:
+        raise SystemExit(f"❌ {exc}")
+    metrics = getattr(httpd, 'metrics', None)
+    access_log = None if args.single else start_access_log(metrics, args.access_log)
+    if args.profile is not None:
+        metrics.profiler.start(args.profile)
+    with httpd:
+        print(f"🎮 Tetris Game Server Running!")
+        for prefix, directory in sorted(httpd.mounts):
+            print(f"📂 Serving {prefix:<28} from: {directory}")
+        if args.single:
+            print(f"🐢 Mode: single connection (HTTP/1.0)")
+        else:
+            print(f"🧵 Mode: {args.workers} workers, HTTP/1.1 keep-alive")
+        if args.production and not args.single:
+            print(f"📦 Caching: ETag + 304, immutable hashed assets")
+            if httpd.asset_cache:
+                print(f"🗜️  Memory cache: {args.cache_mb:g} MB, encodings: {', '.join(ENCODINGS)}")
+        if args.push:
+            watched = ', '.join(path for path in (args.department_data, args.forest_data, args.leaderboard_data)
+                                if path)
+            print(f"📡 Push: {EVENTS_PATH} ({', '.join(TOPICS)}) watching {watched}")
+            if args.forest_behaviors:
+                print(f"🌳 Forest: behaviors from loopback POSTs to {FOREST_PATH}")
+        if metrics is not None:
+            toggle = ", kill -USR1 toggles" if install_toggle_signal(metrics.profiler) else ""
+            profiling = f"on ({args.profile:g} of requests)" if args.profile else "off"
+            print(f"📈 Metrics: {METRICS_PATH}, profiler {profiling} at {PROFILE_PATH}{toggle}")
+        if access_log is not None:
+            print(f"📝 Access log: {args.access_log or 'stderr'} (JSON lines)")
+        print(f"🌐 Open in browser: http://localhost:{args.port}")
+        print(f"⏹️  Press Ctrl+C to stop")
+        print()
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Server stopped")
+        finally:
+            if access_log is not None:
+                access_log.stop()
+
 
-with socketserver.TCPServer(("", PORT), MyHTTPRequestHandler) as httpd:
-    print(f"🎮 Tetris Game Server Running!")
-    print(f"📂 Serving from: {os.getcwd()}")
-    print(f"🌐 Open in browser: http://localhost:{PORT}")
-    print(f"⏹️  Press Ctrl+C to stop")
-    print()
-    httpd.serve_forever()
+if __name__ == '__main__':
+    main()
@@ -68,6 +68,11 @@ let leaderboard = [
     { name: 'Mttldel L.', score: 424, rank: 6 }
 ];
 
+// Ministry-wide top entries pushed by `server.py --push` ('leaderboard' topic, from the
+// leaderboard-data.json an ecosmart.leaderboard.Leaderboard writes); the list above is shown until then
+const LEADERBOARD_EVENTS_URL = '/events?topics=leaderboard';
+const remoteLeaderboard = {};
+
 // Canvas contexts
 let usageChartCtx = null;
 let co2ChartCtx = null;
@@ -81,6 +86,7 @@ document.addEventListener('DOMContentLoaded', () => {
     initializeCharts();
     updateUI();
     updateLeaderboard();
+    subscribeToLeaderboard();
     updateRecommendations();
     addActivity('info', 'Welcome! Press SPACE to start the game');
     showInstructions();
@@ -279,6 +285,34 @@ function drawCO2Chart() {
     }
 }
 
+// Replace the sample entries with the server's ranking as it changes
+function subscribeToLeaderboard() {
+    if (!window.EventSource) return;
+    const source = new EventSource(LEADERBOARD_EVENTS_URL);
+    source.addEventListener('leaderboard', (event) => {
+        const message = JSON.parse(event.data);
+        if (message.snapshot) {
+            // the whole ranking (on connect or reconnect): drop what was kept from before
+            Object.keys(remoteLeaderboard).forEach(user => delete remoteLeaderboard[user]);
+        }
+        const changes = message.snapshot || message.changes;
+        Object.keys(changes).forEach(user => {
+            if (changes[user] === null) {
+                delete remoteLeaderboard[user];
+            } else {
+                remoteLeaderboard[user] = changes[user];
+            }
+        });
+        const entries = Object.values(remoteLeaderboard);
+        if (entries.length === 0) return; // nothing published yet
+
+        const userEntry = leaderboard.find(entry => entry.isUser);
+        leaderboard = entries.map(entry => ({ name: entry.name, score: entry.score, rank: entry.rank }));
+        if (userEntry) leaderboard.push(userEntry);
+        updateLeaderboard();
+    });
+}
+
 // Update leaderboard display
 function updateLeaderboard() {
     const leaderboardEl = document.getElementById('leaderboard');
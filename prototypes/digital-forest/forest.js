@@ -1,5 +1,12 @@
 // Digital Carbon Forest - JavaScript
 
+// Tree health pushed by `python3 server.py --all --push` when department scores change
+// (from ecosmart/forest.py's ForestEngine with --forest-behaviors, which also announces
+// newly planted trees once); without a push server the forest simulates activity on its own
+const FOREST_EVENTS_URL = '/events?topics=forest';
+const MAX_PLANTED_PER_MESSAGE = 5;
+const FOREST_DEPARTMENTS = { it: 'IT', finance: 'Finance', hr: 'HR', policy: 'Policy', operations: 'Operations' };
+
 class Tree {
   constructor(x, y, department, health = 100) {
     this.x = x;
@@ -85,6 +92,7 @@ class DigitalForest {
     this.trees = [];
     this.time = 0;
     this.hoveredTree = null;
+    this.live = false; // true once real department health has arrived
 
     this.init();
     this.setupEventListeners();
@@ -105,7 +113,7 @@ class DigitalForest {
   }
 
   generateForest() {
-    const departments = ['IT', 'Finance', 'HR', 'Legal', 'Operations'];
+    const departments = ['IT', 'Finance', 'HR', 'Policy', 'Operations'];
     const healthLevels = [85, 78, 65, 45, 72];
 
     const width = this.canvas.width;
@@ -182,13 +190,22 @@ class DigitalForest {
     this.trees.forEach(tree => tree.update(this.time));
 
     // Randomly update tree health (simulate activity)
-    if (Math.random() < 0.01) {
+    if (!this.live && Math.random() < 0.01) {
       const randomTree = this.trees[Math.floor(Math.random() * this.trees.length)];
       randomTree.health = Math.min(100, randomTree.health + (Math.random() - 0.3) * 2);
       randomTree.generateLeaves();
+      updateWeather(this.getForestHealth());
     }
   }
 
+  setDepartmentHealth(department, health) {
+    this.live = true;
+    this.trees.filter(tree => tree.department === department).forEach(tree => {
+      tree.health = Math.max(0, Math.min(100, health));
+      tree.generateLeaves();
+    });
+  }
+
   draw() {
     // Clear canvas with gradient sky
     const gradient = this.ctx.createLinearGradient(0, 0, 0, this.canvas.height);
@@ -254,6 +271,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const x = Math.random() * forest.canvas.width;
         const y = forest.canvas.height - 100 - Math.random() * 200;
         forest.plantTree('New', x, y, 100);
+        updateWeather(forest.getForestHealth());
         showNotification('Tree planted! 🌱', 'success');
       } else if (text.includes('Take Quiz')) {
         showNotification('Quiz coming soon!', 'info');
@@ -264,32 +282,72 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   });
 
-  // Update weather based on overall forest health
-  setInterval(() => {
-    const health = forest.getForestHealth();
-    const weatherDiv = document.getElementById('weather');
-    const icon = weatherDiv.querySelector('.weather-icon');
-    const text = weatherDiv.querySelector('.weather-text');
-
-    if (health > 80) {
-      icon.textContent = '☀️';
-      text.textContent = 'Thriving Forest';
-      weatherDiv.style.background = 'rgba(232, 245, 224, 0.9)';
-    } else if (health > 60) {
-      icon.textContent = '⛅';
-      text.textContent = 'Healthy Forest';
-      weatherDiv.style.background = 'rgba(255, 249, 230, 0.9)';
-    } else if (health > 40) {
-      icon.textContent = '🌧️';
-      text.textContent = 'Needs Care';
-      weatherDiv.style.background = 'rgba(255, 230, 230, 0.9)';
+  updateWeather(forest.getForestHealth());
+  subscribeToForestHealth();
+});
+
+// Apply department health as the server pushes it (no polling)
+function subscribeToForestHealth() {
+  if (!window.EventSource) return;
+  const source = new EventSource(FOREST_EVENTS_URL);
+  const healthByKey = {};
+  source.addEventListener('forest', (event) => {
+    const message = JSON.parse(event.data);
+    if (message.event) {
+      // one-off: trees planted since the last announcement (never part of a snapshot)
+      Object.entries(message.event.planted || {}).forEach(([key, count]) => {
+        const department = FOREST_DEPARTMENTS[key];
+        if (!department) return;
+        for (let i = 0; i < Math.min(count, MAX_PLANTED_PER_MESSAGE); i++) {
+          forest.plantTree(department, null, null, healthByKey[key] ?? 100);
+        }
+      });
     } else {
-      icon.textContent = '⛈️';
-      text.textContent = 'Critical';
-      weatherDiv.style.background = 'rgba(255, 200, 200, 0.9)';
+      if (message.snapshot) {
+        // the whole state (on connect or reconnect): forget health kept from before
+        Object.keys(healthByKey).forEach(key => delete healthByKey[key]);
+      }
+      const changes = message.snapshot || message.changes;
+      Object.entries(changes).forEach(([key, value]) => {
+        const department = FOREST_DEPARTMENTS[key];
+        if (!department || !value) return;
+        healthByKey[key] = value.health;
+        forest.setDepartmentHealth(department, value.health);
+      });
     }
-  }, 5000);
-});
+    updateWeather(forest.getForestHealth());
+  });
+}
+
+// Update weather based on overall forest health; the DOM is only touched when the band changes
+let weatherBand = null;
+function updateWeather(health) {
+  const band = health > 80 ? 'thriving' : health > 60 ? 'healthy' : health > 40 ? 'care' : 'critical';
+  if (band === weatherBand) return;
+  weatherBand = band;
+
+  const weatherDiv = document.getElementById('weather');
+  const icon = weatherDiv.querySelector('.weather-icon');
+  const text = weatherDiv.querySelector('.weather-text');
+
+  if (band === 'thriving') {
+    icon.textContent = '☀️';
+    text.textContent = 'Thriving Forest';
+    weatherDiv.style.background = 'rgba(232, 245, 224, 0.9)';
+  } else if (band === 'healthy') {
+    icon.textContent = '⛅';
+    text.textContent = 'Healthy Forest';
+    weatherDiv.style.background = 'rgba(255, 249, 230, 0.9)';
+  } else if (band === 'care') {
+    icon.textContent = '🌧️';
+    text.textContent = 'Needs Care';
+    weatherDiv.style.background = 'rgba(255, 230, 230, 0.9)';
+  } else {
+    icon.textContent = '⛈️';
+    text.textContent = 'Critical';
+    weatherDiv.style.background = 'rgba(255, 200, 200, 0.9)';
+  }
+}
 
 // Utility function for notifications
 function showNotification(message, type = 'info') {
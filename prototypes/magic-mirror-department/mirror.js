@@ -142,15 +142,21 @@ const tipsDatabase = [
 
 let currentDepartment = 'it';
 
+// Live department data written by `python3 -m ecosmart.ingest` (see README).
+// The values above are shown until the file is available.
+const DEPARTMENT_DATA_URL = 'department-data.json';
+// Pushed by `python3 server.py --all --push` whenever the file changes
+const DEPARTMENT_EVENTS_URL = '/events?topics=departments';
+const POLL_INTERVAL = 30000;
+
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
     initDepartmentSelector();
     updateDepartmentData();
     createWeeklyChart();
     updateTime();
-
-    // Auto-refresh every 30 seconds
-    setInterval(updateDepartmentData, 30000);
+    refreshDepartmentData();
+    subscribeToDepartmentData();
     setInterval(updateTime, 60000);
 });
 
@@ -164,18 +170,62 @@ function initDepartmentSelector() {
     });
 }
 
+// Receive changes as they happen; poll every 30 seconds without a push server
+function subscribeToDepartmentData() {
+    if (!window.EventSource) {
+        setInterval(refreshDepartmentData, POLL_INTERVAL);
+        return;
+    }
+    const source = new EventSource(DEPARTMENT_EVENTS_URL);
+    source.addEventListener('departments', (event) => {
+        const message = JSON.parse(event.data);
+        if (message.snapshot) {
+            // the whole rollup (on connect or reconnect): it replaces the sample data and earlier changes
+            Object.keys(departmentData).forEach(key => delete departmentData[key]);
+        }
+        const changes = message.snapshot || message.changes;
+        Object.keys(changes).forEach(key => {
+            // departments that disappear from the rollup keep their last values
+            if (changes[key] !== null) departmentData[key] = changes[key];
+        });
+        updateDepartmentData();
+        createWeeklyChart();
+    });
+    source.addEventListener('error', () => {
+        // EventSource retries dropped connections itself; CLOSED means no /events here
+        if (source.readyState === EventSource.CLOSED) {
+            setInterval(refreshDepartmentData, POLL_INTERVAL);
+        }
+    });
+}
+
+// Fetch the latest rollup, then redraw
+async function refreshDepartmentData() {
+    try {
+        const response = await fetch(DEPARTMENT_DATA_URL, { cache: 'no-cache' });
+        if (response.ok) {
+            Object.assign(departmentData, await response.json());
+        }
+    } catch (error) {
+        // No export yet or offline: keep showing the last known data
+    }
+    updateDepartmentData();
+    createWeeklyChart();
+}
+
 // Update department data
 function updateDepartmentData() {
     const dept = departmentData[currentDepartment];
+    if (!dept) return; // not in the rollup
 
     // Update health score
     updateHealthScore(dept.score);
 
     // Update metrics
-    document.getElementById('prompt-efficiency').textContent = dept.promptEfficiency.toFixed(1);
-    document.getElementById('energy-usage').textContent = dept.energyUsage.toFixed(1);
+    document.getElementById('prompt-efficiency').textContent = formatMetric(dept.promptEfficiency);
+    document.getElementById('energy-usage').textContent = formatMetric(dept.energyUsage);
     document.getElementById('tool-diversity').textContent = dept.toolDiversity;
-    document.getElementById('co2-impact').textContent = dept.co2Impact.toFixed(1);
+    document.getElementById('co2-impact').textContent = formatMetric(dept.co2Impact);
 
     // Update trends
     updateTrends(dept.trends);
@@ -184,6 +234,11 @@ function updateDepartmentData() {
     generateTips(dept);
 }
 
+// One decimal, or a dash for a figure withheld by ecosmart.privacy (null)
+function formatMetric(value) {
+    return value === null ? '—' : value.toFixed(1);
+}
+
 // Update health score and visual
 function updateHealthScore(score) {
     const circle = document.getElementById('health-progress');
@@ -250,6 +305,13 @@ function updateTrends(trends) {
     co2Trend.textContent = `${trends.co2Impact > 0 ? '↑' : '↓'} ${Math.abs(trends.co2Impact)} kg`;
     cards[3].querySelector('.metric-trend').className =
         trends.co2Impact < 0 ? 'metric-trend success' : 'metric-trend warning';
+
+    // null: withheld by ecosmart.privacy (too few people in the period before, or on a day this week)
+    ['promptEfficiency', 'energyUsage', 'toolDiversity', 'co2Impact'].forEach((key, index) => {
+        if (trends[key] !== null) return;
+        cards[index].querySelector('.metric-trend span').textContent = '—';
+        cards[index].querySelector('.metric-trend').className = 'metric-trend';
+    });
 }
 
 // Generate relevant tips
@@ -289,11 +351,21 @@ function createWeeklyChart() {
     canvas.height = 300;
 
     const dept = departmentData[currentDepartment];
-
-    // Weekly data (simulated)
-    const days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'];
-    const efficiencyData = [1.8, 1.6, 1.5, 1.4, 1.3, 1.5, 1.4];
-    const co2Data = [4.2, 3.9, 3.7, 3.5, 3.2, 3.0, 3.4];
+    if (!dept) return;
+
+    // Last 7 days from the usage-log rollup, or simulated data without one
+    const weekly = dept.weekly || {
+        days: ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
+        promptEfficiency: [1.8, 1.6, 1.5, 1.4, 1.3, 1.5, 1.4],
+        co2Impact: [4.2, 3.9, 3.7, 3.5, 3.2, 3.0, 3.4]
+    };
+    const days = weekly.days;
+    const efficiencyData = weekly.promptEfficiency;
+    const co2Data = weekly.co2Impact;
+
+    // CO2 axis: 1-5 kg for the simulated week, 0 to the daily peak for real data
+    const co2Low = dept.weekly ? 0 : 1;
+    const co2Span = dept.weekly ? (Math.max(...co2Data) || 1) : 4;
 
     const padding = 60;
     const chartWidth = canvas.width - padding * 2;
@@ -328,12 +400,19 @@ function createWeeklyChart() {
     ctx.strokeStyle = '#10b981';
     ctx.lineWidth = 3;
 
+    // Days withheld by ecosmart.privacy (null) leave a gap in the line
+    let drawing = false;
     efficiencyData.forEach((value, index) => {
+        if (value === null) {
+            drawing = false;
+            return;
+        }
         const x = padding + (index / (days.length - 1)) * chartWidth;
         const y = canvas.height - padding - ((value - 1) / 1) * chartHeight;
 
-        if (index === 0) {
+        if (!drawing) {
             ctx.moveTo(x, y);
+            drawing = true;
         } else {
             ctx.lineTo(x, y);
         }
@@ -358,12 +437,18 @@ function createWeeklyChart() {
     ctx.strokeStyle = '#3b82f6';
     ctx.lineWidth = 3;
 
+    drawing = false;
     co2Data.forEach((value, index) => {
+        if (value === null) {
+            drawing = false;
+            return;
+        }
         const x = padding + (index / (days.length - 1)) * chartWidth;
-        const y = canvas.height - padding - ((value - 1) / 4) * chartHeight;
+        const y = canvas.height - padding - ((value - co2Low) / co2Span) * chartHeight;
 
-        if (index === 0) {
+        if (!drawing) {
             ctx.moveTo(x, y);
+            drawing = true;
         } else {
             ctx.lineTo(x, y);
         }
@@ -412,9 +497,9 @@ function createWeeklyChart() {
     // Y-axis labels (right) for CO2
     ctx.textAlign = 'left';
     for (let i = 0; i <= 4; i++) {
-        const value = 1 + i;
-        const y = canvas.height - padding - ((value - 1) / 4) * chartHeight;
-        ctx.fillText(value.toFixed(1) + ' kg', canvas.width - padding + 10, y + 4);
+        const value = co2Low + (i / 4) * co2Span;
+        const y = canvas.height - padding - ((value - co2Low) / co2Span) * chartHeight;
+        ctx.fillText(value.toFixed(co2Span < 4 ? 2 : 1) + ' kg', canvas.width - padding + 10, y + 4);
     }
 
     // Target line